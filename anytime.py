@@ -0,0 +1,75 @@
+import json
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+ANYTIME_CHECKPOINTS_MINS = (1, 5, 15)
+
+
+def incumbent_curve(evaluations: List[List[float]]) -> List[List[float]]:
+    """
+    Turns the [elapsed_secs, score] pairs of the evaluated candidates into the steps of the incumbent curve.
+    The scores are oriented so that higher is better.
+    """
+    steps = []
+    for elapsed_secs, score in sorted(evaluations):
+        if not np.isfinite(score):
+            continue
+        if not steps or score > steps[-1][1]:
+            steps.append([round(float(elapsed_secs), 3), float(score)])
+    return steps
+
+
+def _step_area(steps: List[List[float]], budget_secs: float) -> float:
+    # the incumbent does not exist before the first step, so the area starts there
+    area = 0.0
+    for (start, score), (end, _) in zip(steps, steps[1:] + [[budget_secs, None]]):
+        area += score * max(min(end, budget_secs) - min(start, budget_secs), 0.0)
+    return area
+
+
+def summarise_anytime_curve(evaluations: List[List[float]], budget_secs: float,
+                            checkpoints_mins: Sequence[float] = ANYTIME_CHECKPOINTS_MINS) -> Optional[dict]:
+    """
+    Summarises the incumbent curve: the incumbent score at the checkpoints, the mean incumbent score from
+    the first evaluation to the end of the budget and the curve normalised to the budget by time and between
+    the first and the best score by quality, so its area shows how fast the framework converges
+    regardless of the metric scale.
+    """
+    steps = incumbent_curve(evaluations)
+    if not steps:
+        return None
+    budget_secs = max(budget_secs, steps[-1][0])
+    first_score, best_score = steps[0][1], steps[-1][1]
+    score_range = best_score - first_score
+    normalised = [[round(elapsed_secs / budget_secs, 4),
+                   round((score - first_score) / score_range, 4) if score_range else 1.0]
+                  for elapsed_secs, score in steps]
+
+    at_checkpoints = {}
+    for checkpoint_mins in checkpoints_mins:
+        reached = [score for elapsed_secs, score in steps if elapsed_secs <= checkpoint_mins * 60]
+        at_checkpoints[f'{checkpoint_mins}_min'] = round(reached[-1], 4) if reached else None
+
+    return {'points': steps,
+            'normalised': normalised,
+            'at_checkpoints': at_checkpoints,
+            'time_to_best_secs': steps[-1][0],
+            'mean_score': round(_step_area(steps, budget_secs) / (budget_secs - steps[0][0]), 4)
+            if budget_secs > steps[0][0] else first_score,
+            'normalised_auc': round(_step_area(normalised, 1.0), 4),
+            'budget_secs': round(budget_secs, 1)}
+
+
+def save_evaluations(file_path: str, evaluations: List[List[float]]):
+    # the curve is kept next to the cached model to report it when the model is not fitted again
+    with open(file_path, 'w') as file:
+        json.dump(evaluations, file)
+
+
+def load_evaluations(file_path: str) -> Optional[List[List[float]]]:
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r') as file:
+        return json.load(file)
@@ -2,29 +2,40 @@ import xgboost as xgb
 
 from fedot.core.data.data import InputData
 from fedot.core.repository.tasks import TaskTypesEnum
+from instrumentation import DATA_LOADING, FITTING, PREDICTION, report_fitted_model, timed_phase
 
 
 def run_xgboost(params: 'ExecutionParams'):
     train_file_path = params.train_file
     test_file_path = params.test_file
     task = params.task
+    seed = 0 if params.seed is None else params.seed
 
-    train_data = InputData.from_csv(train_file_path)
-    test_data = InputData.from_csv(test_file_path)
+    with timed_phase(DATA_LOADING):
+        train_data = InputData.from_csv(train_file_path)
+        test_data = InputData.from_csv(test_file_path)
 
     if task == TaskTypesEnum.classification:
-        model = xgb.XGBClassifier(max_depth=2, learning_rate=1.0, objective='binary:logistic')
-        model.fit(train_data.features, train_data.target)
-        predicted = model.predict_proba(test_data.features)[:, 1]
-        predicted_labels = model.predict(test_data.features)
-
+        model = xgb.XGBClassifier(max_depth=2, learning_rate=1.0, objective='binary:logistic', random_state=seed,
+                                  n_jobs=params.n_cores)
     elif task == TaskTypesEnum.regression:
-        xgbr = xgb.XGBRegressor(max_depth=3, learning_rate=0.3, n_estimators=300,
-                                objective='reg:squarederror')
-        xgbr.fit(train_data.features, train_data.target)
-        predicted = xgbr.predict(test_data.features)
-        predicted_labels = None
-
+        model = xgb.XGBRegressor(max_depth=3, learning_rate=0.3, n_estimators=300,
+                                 objective='reg:squarederror', random_state=seed, n_jobs=params.n_cores)
     else:
         raise NotImplementedError()
+
+    with timed_phase(FITTING):
+        model.fit(train_data.features, train_data.target)
+
+    with timed_phase(PREDICTION):
+        if task == TaskTypesEnum.classification:
+            predicted = model.predict_proba(test_data.features)[:, 1]
+            predicted_labels = model.predict(test_data.features)
+        else:
+            predicted = model.predict(test_data.features)
+            predicted_labels = None
+
+    predict_func = model.predict_proba if task == TaskTypesEnum.classification else model.predict
+    report_fitted_model(predict_func, test_data.features, model=model)
+
     return test_data.target, predicted, predicted_labels
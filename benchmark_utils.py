@@ -1,12 +1,15 @@
-import gc
 import json
 import os
+import tempfile
+from copy import deepcopy
+from functools import lru_cache
 from typing import Tuple
 
 import pandas as pd
 from pmlb import fetch_data
 from pathlib import Path
 
+from event_log import emit
 from fedot.core.utils import ensure_directory_exists, get_split_data_paths, \
     save_file_to_csv, split_data
 
@@ -62,6 +65,51 @@ def get_penn_case_data_paths(name_of_dataset: str) -> Tuple[str, str]:
     return full_train_file_path, full_test_file_path
 
 
+# the subsamples are drawn with the same seed, so every seed repeat of the unit fits on the same subsample
+SUBSAMPLE_SEED = 1
+
+
+def get_subsample_path(file_path: str, fraction: float, target_name: str = 'target', stratify: bool = True) -> str:
+    """
+    Returns the path to the csv-file with the subsample of the dataset.
+    The subsample is stratified by the target if required and cached next to the dataset. The parallel workers
+    share the cache: the file is written under a temporary name and renamed, so it is never read half-written.
+    """
+    if fraction >= 1:
+        return file_path
+
+    dataset_dir, file_name = os.path.split(file_path)
+    subsample_dir = os.path.join(dataset_dir, 'subsamples')
+    subsample_path = os.path.join(subsample_dir, f'{os.path.splitext(file_name)[0]}_f{fraction}.csv')
+    if os.path.exists(subsample_path) and os.path.getmtime(subsample_path) >= os.path.getmtime(file_path):
+        emit('cache_hit', model='subsample', key=subsample_path)
+        return subsample_path
+    emit('cache_miss', model='subsample', key=subsample_path)
+
+    dataframe = pd.read_csv(file_path)
+    if stratify:
+        # every class keeps at least two rows to make the metrics computable
+        subsample_index = [idx for _, group in dataframe.groupby(target_name)
+                           for idx in group.sample(n=min(len(group), max(2, int(round(len(group) * fraction)))),
+                                                   random_state=SUBSAMPLE_SEED).index]
+        subsample = dataframe.loc[sorted(subsample_index)]
+    else:
+        subsample = dataframe.sample(n=max(2, int(round(len(dataframe) * fraction))),
+                                      random_state=SUBSAMPLE_SEED).sort_index()
+
+    os.makedirs(subsample_dir, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=subsample_dir, suffix='.csv.tmp')
+    os.close(file_descriptor)
+    try:
+        subsample.to_csv(temp_path, index=False)
+        os.replace(temp_path, subsample_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return subsample_path
+
+
 def convert_json_stats_to_csv(dataset: list, include_hyper: bool = True):
     list_of_df = []
     new_col = []
@@ -92,48 +140,120 @@ def save_metrics_result_file(data: dict, file_name: str):
         json.dump(data, file, indent=4)
 
 
-def get_models_hyperparameters(timedelta: int = 30) -> dict:
+BENCHMARK_CONFIG_FILE = 'benchmark_config.json'
+_REQUIRED_FRAMEWORKS = ['TPOT', 'FEDOT', 'H2O', 'autokeras', 'MLBox']
+_TIME_UNITS_IN_MINS = {'mins': 1, 'secs': 1 / 60}
+
+
+def _validate_benchmark_config(config: dict):
+    scaling = config.get('scaling')
+    if not isinstance(scaling, dict) or scaling.get('reference_size', 0) <= 0 or 'exponent' not in scaling:
+        raise ValueError('Benchmark config must define scaling with positive reference_size and exponent')
+
+    for framework_name, runtime_mins in config.get('runtime_estimates_mins', {}).items():
+        if not isinstance(runtime_mins, (int, float)) or runtime_mins <= 0:
+            raise ValueError(f'runtime_estimates_mins.{framework_name} must be a positive number of minutes')
+
+    frameworks = config.get('frameworks', {})
+    missing = [name for name in _REQUIRED_FRAMEWORKS if name not in frameworks]
+    if missing:
+        raise ValueError(f'Benchmark config has no settings for {missing}')
+
+    for framework_name, framework_config in frameworks.items():
+        for budget_name, budget in framework_config.get('budgets', {}).items():
+            missing_keys = [key for key in ('base', 'min', 'max') if key not in budget]
+            if missing_keys:
+                raise ValueError(f'{framework_name}.{budget_name}: budget has no {missing_keys}')
+            if not budget['min'] <= budget['base'] <= budget['max']:
+                raise ValueError(f'{framework_name}.{budget_name}: base budget must lie between min and max')
+            if budget.get('unit', 'mins') not in _TIME_UNITS_IN_MINS:
+                raise ValueError(f'{framework_name}.{budget_name}: unknown time unit {budget["unit"]}')
+            if budget_name in framework_config.get('params', {}):
+                raise ValueError(f'{framework_name}.{budget_name} is defined both as param and budget')
+
+
+@lru_cache(maxsize=None)
+def _load_benchmark_config(file_path: str) -> dict:
+    with open(file_path, 'r') as file:
+        config = json.load(file)
+    _validate_benchmark_config(config)
+
+    return config
+
+
+def load_benchmark_config(file_path: str = None) -> dict:
+    """Returns the copy of the validated config, the file is read once."""
+    if file_path is None:
+        file_path = os.path.join(str(project_root()), BENCHMARK_CONFIG_FILE)
+    # the cached config is shared by all the resolutions, so the callers get its copy to modify
+    return deepcopy(_load_benchmark_config(file_path))
+
+
+def get_budget_scale(n_rows: int = None, n_features: int = None) -> float:
+    if not n_rows or not n_features:
+        return 1.0
+    scaling = load_benchmark_config()['scaling']
+    return (n_rows * n_features / scaling['reference_size']) ** scaling['exponent']
+
+
+def get_runtime_estimate_mins(framework_name: str, n_rows: int = None, n_features: int = None) -> float:
+    """
+    Returns the expected runtime in minutes of the framework without a time budget: its configured runtime
+    on the dataset of the reference size scaled by the size of the dataset as the budgets are.
+    """
+    runtime_estimates = load_benchmark_config().get('runtime_estimates_mins', {})
+    if framework_name not in runtime_estimates:
+        raise ValueError(f'Benchmark config has no runtime_estimates_mins for {framework_name}')
+    return runtime_estimates[framework_name] * get_budget_scale(n_rows, n_features)
+
+
+def get_models_hyperparameters(timedelta: int = None, n_rows: int = None, n_features: int = None,
+                               unscaled: bool = False) -> dict:
+    """
+    Resolves the hyperparameters of all the frameworks from the benchmark config.
+    The budgets are scaled by the size (rows x features) of the dataset and clipped to the configured bounds.
+    The timedelta (in minutes) replaces the base value of the time budgets if passed,
+    with unscaled=True it is the absolute time budget which is neither scaled nor clipped.
+    """
     # MAX_RUNTIME_MINS should be equivalent to MAX_RUNTIME_SECS
+    scale = get_budget_scale(n_rows, n_features)
+
+    config_dictionary = {}
+    for framework_name, framework_config in load_benchmark_config()['frameworks'].items():
+        resolved = deepcopy(framework_config.get('params', {}))
+        for budget_name, budget in framework_config.get('budgets', {}).items():
+            base = budget['base']
+            if timedelta is not None and 'unit' in budget:
+                base = timedelta / _TIME_UNITS_IN_MINS[budget['unit']]
+                if unscaled:
+                    resolved[budget_name] = max(1, int(round(base)))
+                    continue
+            resolved[budget_name] = max(1, int(round(min(max(base * scale, budget['min']), budget['max']))))
+        config_dictionary[framework_name] = resolved
 
-    tpot_config = {'MAX_RUNTIME_MINS': timedelta,
-                   'GENERATIONS': 100,
-                   'POPULATION_SIZE': 20
-                   }
-
-    fedot_config = {'MAX_RUNTIME_MINS': timedelta,
-                    'GENERATIONS': 100,
-                    'POPULATION_SIZE': 20
-                    }
-
-    h2o_config = {'MAX_MODELS': 20,
-                  'MAX_RUNTIME_SECS': timedelta * 60}
-
-    autokeras_config = {'MAX_TRIAL': 10,
-                        'EPOCH': 100}
-
-    space_for_mlbox = {
-
-        'ne__numerical_strategy': {"space": [0, 'mean']},
-
-        'ce__strategy': {"space": ["label_encoding", "random_projection", "entity_embedding"]},
-
-        'fs__strategy': {"space": ["variance", "rf_feature_importance"]},
-        'fs__threshold': {"search": "choice", "space": [0.1, 0.2, 0.3, 0.4, 0.5]},
-
-        'est__strategy': {"space": ["LightGBM"]},
-        'est__max_depth': {"search": "choice", "space": [5, 6]},
-        'est__subsample': {"search": "uniform", "space": [0.6, 0.9]},
-        'est__learning_rate': {"search": "choice", "space": [0.07]}
-
-    }
-
-    mlbox_config = {'space': space_for_mlbox, 'max_evals': 40}
+    return config_dictionary
 
-    config_dictionary = {'TPOT': tpot_config, 'FEDOT': fedot_config, 'H2O': h2o_config,
-                         'autokeras': autokeras_config, 'MLBox': mlbox_config}
-    gc.collect()
 
-    return config_dictionary
+def set_time_budgets(hyperparameters: dict, wall_mins: float) -> dict:
+    """Returns the copy of the resolved hyperparameters with all the time budgets set to the wall time."""
+    hyperparameters = deepcopy(hyperparameters)
+    for framework_name, framework_config in load_benchmark_config()['frameworks'].items():
+        for budget_name, budget in framework_config.get('budgets', {}).items():
+            if 'unit' in budget and framework_name in hyperparameters:
+                hyperparameters[framework_name][budget_name] = \
+                    max(1, int(round(wall_mins / _TIME_UNITS_IN_MINS[budget['unit']])))
+    return hyperparameters
+
+
+def get_dataset_shape(file_path: str) -> Tuple[int, int]:
+    """
+    Returns the number of rows and features of the csv-file.
+    The first column is the index and the last one is the target as InputData.from_csv expects.
+    """
+    with open(file_path, 'rb') as file:
+        n_columns = len(file.readline().split(b','))
+        n_rows = sum(1 for line in file if line.strip())
+    return n_rows, n_columns - 2
 
 
 def get_target_name(file_path: str) -> str:
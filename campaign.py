@@ -0,0 +1,219 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from benchmark_model_types import BenchmarkModelTypesEnum
+from benchmark_utils import get_models_hyperparameters, get_runtime_estimate_mins
+from executor import CaseExecutor, ExecutionParams
+from fedot.core.repository.tasks import TaskTypesEnum
+from metrics_direction import LOWER_IS_BETTER_METRICS
+from profiling import ProfilerTypeEnum
+from supervisor import FairnessBudget, ProcessTreeCpuMonitor
+
+
+@dataclass
+class CampaignDataset:
+    name: str
+    train_file: str
+    test_file: str
+    task: TaskTypesEnum
+    metric_list: List[str]
+    n_rows: int
+    n_features: int
+
+    @property
+    def case_label(self):
+        return f'penn_ml_{self.name}'
+
+
+@dataclass(frozen=True)
+class CampaignUnit:
+    dataset: str
+    framework: str
+    seed: Optional[int] = None
+    timedelta: Optional[int] = None
+
+
+def cpu_time() -> float:
+    """Returns the CPU time consumed by the process and its finished children."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def run_campaign_unit(dataset: CampaignDataset, model_type: BenchmarkModelTypesEnum,
+                      timedelta: Optional[int] = None, seed: Optional[int] = None,
+                      profiler: Optional[ProfilerTypeEnum] = None, executor_class: type = CaseExecutor,
+                      measure_inference: bool = False, fairness: Optional[FairnessBudget] = None,
+                      cores_per_strategy: Optional[int] = None, pin_cores: bool = False,
+                      heartbeat_timeout_secs: Optional[float] = None, results_db: Optional[str] = None,
+                      force_rerun: bool = False, unscaled_budget: bool = False) -> dict:
+    """
+    Runs a single framework on a single dataset. The timedelta (in minutes) overrides the base time budget,
+    with unscaled_budget it is the absolute time budget not scaled by the dataset size.
+    The subclass of CaseExecutor with other strategies can be passed to run the unit with them.
+    The result of the unit already in the results database is reused unless the rerun is forced.
+    """
+    hyperparameters = get_models_hyperparameters(timedelta, n_rows=dataset.n_rows, n_features=dataset.n_features,
+                                                 unscaled=unscaled_budget)
+    case_label = dataset.case_label if seed is None else f'{dataset.case_label}_s{seed}'
+    unit_result = {'dataset': dataset.name,
+                   'framework': model_type.name,
+                   'seed': seed,
+                   'timedelta': timedelta,
+                   'hyperparameters': hyperparameters,
+                   'metrics': None}
+
+    start_wall = time.perf_counter()
+    # the CPU of the whole process tree is measured, the H2O server is not a child waited for by the unit
+    with ProcessTreeCpuMonitor() as cpu_monitor:
+        try:
+            result = executor_class(params=ExecutionParams(train_file=dataset.train_file,
+                                                           test_file=dataset.test_file,
+                                                           task=dataset.task,
+                                                           target_name='target',
+                                                           case_label=case_label,
+                                                           hyperparameters=hyperparameters,
+                                                           seed=seed),
+                                    models=[model_type],
+                                    metric_list=dataset.metric_list,
+                                    profiler=profiler,
+                                    measure_inference=measure_inference,
+                                    fairness=fairness,
+                                    cores_per_strategy=cores_per_strategy,
+                                    pin_cores=pin_cores,
+                                    heartbeat_timeout_secs=heartbeat_timeout_secs,
+                                    results_db=results_db,
+                                    force_rerun=force_rerun).execute()
+            unit_result['metrics'] = result[f'{model_type.name}_metric']
+            unit_result['fidelity'] = result.get(f'{model_type.name}_fidelity')
+            unit_result['timings'] = result[f'{model_type.name}_timings']
+            unit_result['peak_rss_mb'] = result[f'{model_type.name}_memory']['peak_rss_mb']
+            unit_result['anytime'] = result.get(f'{model_type.name}_anytime')
+            unit_result['inference'] = result.get(f'{model_type.name}_inference')
+            unit_result['usage'] = result.get(f'{model_type.name}_usage')
+            unit_result['fingerprint'] = result.get(f'{model_type.name}_fingerprint')
+            unit_result['cached'] = result.get(f'{model_type.name}_cached', False)
+            if profiler is not None:
+                unit_result['profile'] = result[f'{model_type.name}_profile']
+        except Exception as ex:
+            print(f'Exception on {dataset.name} with {model_type.name}: {ex}')
+            unit_result['error'] = repr(ex)
+
+    unit_result['cpu_secs'] = round(cpu_monitor.cpu_secs, 3)
+    unit_result['wall_secs'] = round(time.perf_counter() - start_wall, 3)
+
+    return unit_result
+
+
+def unit_score(unit_result: dict, metric_name: str) -> float:
+    """Returns the metric of the unit oriented so that higher is better (-inf for the failed units)."""
+    if not unit_result['metrics'] or unit_result['metrics'].get(metric_name) is None:
+        return float('-inf')
+    value = unit_result['metrics'][metric_name]
+    return -value if metric_name in LOWER_IS_BETTER_METRICS else value
+
+
+# the sections of the benchmark config with the time budget of the frameworks
+_CONFIG_NAME_BY_TYPE = {
+    BenchmarkModelTypesEnum.tpot: 'TPOT',
+    BenchmarkModelTypesEnum.fedot: 'FEDOT',
+    BenchmarkModelTypesEnum.h2o: 'H2O'
+}
+
+
+def resolved_runtime_mins(model_type: BenchmarkModelTypesEnum, hyperparameters: dict) -> Optional[float]:
+    """Returns the resolved time budget of the time-limited framework in minutes, None for the others."""
+    config_name = _CONFIG_NAME_BY_TYPE.get(model_type)
+    if config_name is None:
+        return None
+    framework_hyperparameters = hyperparameters[config_name]
+    if 'MAX_RUNTIME_SECS' in framework_hyperparameters:
+        return framework_hyperparameters['MAX_RUNTIME_SECS'] / 60
+    return framework_hyperparameters['MAX_RUNTIME_MINS']
+
+
+def estimate_unit_cost(model_type: BenchmarkModelTypesEnum, n_rows: int, n_features: int,
+                       timedelta: Optional[int] = None) -> float:
+    """
+    Estimates the runtime of the unit in minutes from the size of the dataset.
+    The time-limited frameworks are expected to spend their whole resolved budget,
+    the others take the runtime estimate of the benchmark config scaled with the dataset size.
+    """
+    if model_type not in _CONFIG_NAME_BY_TYPE:
+        return get_runtime_estimate_mins(model_type.name, n_rows, n_features)
+    return resolved_runtime_mins(model_type, get_models_hyperparameters(timedelta, n_rows=n_rows,
+                                                                        n_features=n_features))
+
+
+def parse_shard_spec(shard_spec: str) -> Tuple[int, int]:
+    """Parses the 'i/N' specification of the shard i (starting from 1) of N into the zero-based index and N."""
+    try:
+        shard_num, n_shards = (int(part) for part in shard_spec.split('/'))
+    except ValueError:
+        raise ValueError(f'Shard specification must look like i/N, got {shard_spec}')
+    if not 1 <= shard_num <= n_shards:
+        raise ValueError(f'Shard number must be between 1 and {n_shards}, got {shard_num}')
+    return shard_num - 1, n_shards
+
+
+def assign_shards(units: List[CampaignUnit], costs: Dict[CampaignUnit, float],
+                  n_shards: int) -> List[List[CampaignUnit]]:
+    """
+    Splits the units between the shards greedily: the most expensive unit goes to the least loaded shard.
+    The ties are broken by the unit fields and the shard index, so every host gets the same assignment.
+    """
+    ordered_units = sorted(units, key=lambda unit: (-costs[unit], unit.dataset, unit.framework,
+                                                    -1 if unit.seed is None else unit.seed))
+    shards = [[] for _ in range(n_shards)]
+    loads = [0.0] * n_shards
+    for unit in ordered_units:
+        shard_index = min(range(n_shards), key=lambda index: (loads[index], index))
+        shards[shard_index].append(unit)
+        loads[shard_index] += costs[unit]
+    return shards
+
+
+def save_shard_results(unit_results: List[dict], file_name: str):
+    with open(file_name, 'w') as file:
+        json.dump(unit_results, file, indent=4)
+
+
+def merge_shard_results(file_names: List[str], leaderboard_file: str = 'penn_ml_leaderboard.csv') -> pd.DataFrame:
+    """Combines the unit results of the shards into the leaderboard with the metrics averaged over the seeds."""
+    unit_results = []
+    for file_name in file_names:
+        with open(file_name, 'r') as file:
+            unit_results.extend(json.load(file))
+
+    records = []
+    for unit_result in unit_results:
+        record = {'dataset': unit_result['dataset'], 'framework': unit_result['framework'],
+                  'seed': unit_result['seed'], 'failed': not unit_result['metrics'],
+                  'cpu_secs': unit_result['cpu_secs'], 'wall_secs': unit_result['wall_secs']}
+        record.update(unit_result['metrics'] or {})
+        if unit_result.get('timings'):
+            record.update({'strategy_wall_secs': unit_result['timings']['wall_secs'],
+                           'strategy_cpu_secs': unit_result['timings']['cpu_secs'],
+                           'time_to_predict_secs': unit_result['timings']['time_to_predict_secs'],
+                           'peak_rss_mb': unit_result['peak_rss_mb']})
+        if unit_result.get('anytime'):
+            record.update({'anytime_mean_score': unit_result['anytime']['mean_score'],
+                           'anytime_normalised_auc': unit_result['anytime']['normalised_auc']})
+        if unit_result.get('inference'):
+            record.update({'latency_p50_ms': unit_result['inference']['latency_ms']['p50'],
+                           'latency_p99_ms': unit_result['inference']['latency_ms']['p99'],
+                           'model_size_mb': unit_result['inference']['model_size_mb']})
+        records.append(record)
+
+    units_df = pd.DataFrame(records)
+    value_columns = [column for column in units_df.columns if column not in ('dataset', 'framework', 'seed')]
+    leaderboard = units_df.groupby(['dataset', 'framework'])[value_columns].mean().reset_index()
+    leaderboard = leaderboard.rename(columns={'failed': 'failure_rate'})
+    leaderboard['n_seeds'] = units_df.groupby(['dataset', 'framework']).size().values
+    leaderboard.to_csv(leaderboard_file, index=False)
+
+    return leaderboard
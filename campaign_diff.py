@@ -0,0 +1,112 @@
+import argparse
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.stats import ttest_ind_from_stats
+
+from metrics_direction import LOWER_IS_BETTER_METRICS
+from leaderboard import LEADERBOARD_METRICS
+from results_store import RESULTS_DB_FILE, ResultsStore
+
+UNIT_COLUMNS = ['dataset', 'framework', 'seed']
+
+
+def campaign_units(store: ResultsStore, campaign: str,
+                   metric_names: Sequence[str] = LEADERBOARD_METRICS) -> pd.DataFrame:
+    """
+    Returns the last run of every (dataset, framework, seed) unit of the campaign with its status, resources
+    and the score by the first of the metrics computed for the dataset oriented so that higher is better.
+    """
+    runs = store.runs(campaign, full_fidelity=True)
+    # the rerun unit replaces the previous one
+    runs = runs.sort_values('run_id').drop_duplicates(UNIT_COLUMNS, keep='last')
+    runs['seed'] = runs['seed'].fillna(-1).astype(int)
+    runs['wall_secs'] = runs['strategy_wall_secs'].fillna(runs['wall_secs'])
+    runs['score'], runs['metric'] = np.nan, None
+    for metric_name in reversed(metric_names):
+        values = store.metric_values(metric_name, campaign, full_fidelity=True).set_index('run_id')['value']
+        if metric_name in LOWER_IS_BETTER_METRICS:
+            values = -values
+        has_value = runs['run_id'].isin(values.index)
+        runs.loc[has_value, 'score'] = runs.loc[has_value, 'run_id'].map(values)
+        runs.loc[has_value, 'metric'] = metric_name
+    return runs[UNIT_COLUMNS + ['status', 'error', 'metric', 'score', 'wall_secs', 'peak_rss_mb']]
+
+
+def _ratio_changes(aligned: pd.DataFrame, column: str, tolerance: float) -> pd.DataFrame:
+    pairs = aligned.dropna(subset=[f'{column}_before', f'{column}_after'])
+    pairs = pairs[pairs[f'{column}_before'] > 0]
+    changes = pairs.groupby(['dataset', 'framework']).agg(before=(f'{column}_before', 'mean'),
+                                                         after=(f'{column}_after', 'mean'),
+                                                         n_seeds=('seed', 'size')).reset_index()
+    changes['ratio'] = changes['after'] / changes['before']
+    regressions = changes[changes['ratio'] > 1 + tolerance]
+    return regressions.sort_values('ratio', ascending=False).reset_index(drop=True)
+
+
+def diff_campaigns(store: ResultsStore, before: str, after: str, metric_names: Sequence[str] = LEADERBOARD_METRICS,
+                   alpha: float = 0.05, min_effect_size: float = 0.5, min_relative_change: float = 0.01,
+                   time_tolerance: float = 0.2, memory_tolerance: float = 0.2) -> Dict[str, pd.DataFrame]:
+    """
+    Compares two campaigns unit by unit. The metric change of the framework on the dataset is significant
+    if the Welch t-test of the seeds rejects the equal means at alpha and the difference exceeds min_effect_size
+    of the pooled standard deviation (Cohen's d), or if it exceeds min_relative_change of the previous score
+    when there is a single seed. The runtime and memory regressions are the growths of the mean strategy
+    wall time and peak memory above the tolerances.
+    """
+    aligned = campaign_units(store, before, metric_names).merge(campaign_units(store, after, metric_names),
+                                                                on=UNIT_COLUMNS, suffixes=('_before', '_after'))
+
+    scored = aligned.dropna(subset=['score_before', 'score_after'])
+    changes = scored.groupby(['dataset', 'framework']).agg(metric=('metric_after', 'first'),
+                                                          before=('score_before', 'mean'),
+                                                          after=('score_after', 'mean'),
+                                                          before_std=('score_before', 'std'),
+                                                          after_std=('score_after', 'std'),
+                                                          n_seeds=('seed', 'size')).reset_index()
+    changes['difference'] = changes['after'] - changes['before']
+    changes['relative_change'] = changes['difference'] / changes['before'].abs().replace(0, np.nan)
+    pooled_std = np.sqrt((changes['before_std'] ** 2 + changes['after_std'] ** 2) / 2)
+    changes['effect_size'] = changes['difference'] / pooled_std.replace(0, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        changes['p_value'] = ttest_ind_from_stats(*changes[['after', 'after_std', 'n_seeds',
+                                                            'before', 'before_std', 'n_seeds']].values.T.astype(float),
+                                                  equal_var=False).pvalue
+    changes['significant'] = np.where(changes['n_seeds'] > 1,
+                                      (changes['p_value'] < alpha) & (changes['effect_size'].abs() >= min_effect_size),
+                                      changes['relative_change'].abs() >= min_relative_change)
+    # the single-seed changes have no effect size and are ranked after the others by the relative change
+    metric_changes = changes.assign(abs_effect=changes['effect_size'].abs(),
+                                    abs_relative=changes['relative_change'].abs())[changes['significant']]
+    metric_changes = metric_changes.sort_values(['abs_effect', 'abs_relative'], ascending=False, na_position='last')
+
+    new_failures = aligned[(aligned['status_before'] == 'ok') & (aligned['status_after'] == 'failed')]
+    fixed_failures = aligned[(aligned['status_before'] == 'failed') & (aligned['status_after'] == 'ok')]
+    return {'metric_changes': metric_changes.drop(columns=['abs_effect', 'abs_relative']).reset_index(drop=True),
+            'runtime_regressions': _ratio_changes(aligned, 'wall_secs', time_tolerance),
+            'memory_regressions': _ratio_changes(aligned, 'peak_rss_mb', memory_tolerance),
+            'new_failures': new_failures[UNIT_COLUMNS + ['error_after']].reset_index(drop=True),
+            'fixed_failures': fixed_failures[UNIT_COLUMNS].reset_index(drop=True),
+            'n_aligned_units': len(aligned)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Differences between two campaigns in the results database')
+    parser.add_argument('before', help='name of the previous campaign')
+    parser.add_argument('after', help='name of the new campaign')
+    parser.add_argument('--db', default=RESULTS_DB_FILE, help='results database file')
+    parser.add_argument('--alpha', type=float, default=0.05, help='significance level of the metric changes')
+    parser.add_argument('--min-effect-size', type=float, default=0.5, help='significant Cohen\'s d over the seeds')
+    parser.add_argument('--time-tolerance', type=float, default=0.2, help='allowed share of the runtime growth')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help='allowed share of the memory growth')
+    args = parser.parse_args()
+
+    diff = diff_campaigns(ResultsStore(args.db), args.before, args.after, alpha=args.alpha,
+                          min_effect_size=args.min_effect_size, time_tolerance=args.time_tolerance,
+                          memory_tolerance=args.memory_tolerance)
+    print(f'{diff.pop("n_aligned_units")} units of {args.before} and {args.after} aligned')
+    for section, table in diff.items():
+        print(f'\n{section}: {len(table)}')
+        if not table.empty:
+            print(table.to_string(index=False))
@@ -0,0 +1,57 @@
+import os
+from contextlib import contextmanager
+from typing import List, Optional
+
+from threadpoolctl import threadpool_limits
+
+# the thread pools of the native libraries and of the processes started by the strategies read these variables
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS',
+                   'VECLIB_MAXIMUM_THREADS', 'TF_NUM_INTRAOP_THREADS']
+# every TensorFlow op already uses the whole intra-op pool, the parallel ops would multiply the threads
+TF_INTEROP_ENV_VAR = 'TF_NUM_INTEROP_THREADS'
+
+_worker_slot = 0
+
+
+def init_worker_slot(slot_counter):
+    """Initializer of the pool workers: every worker takes the next slot to pin its strategies to its own cores."""
+    global _worker_slot
+    with slot_counter.get_lock():
+        _worker_slot = slot_counter.value
+        slot_counter.value += 1
+
+
+def get_worker_slot() -> int:
+    return _worker_slot
+
+
+def allotted_cores(slot: int, n_cores: int) -> List[int]:
+    available_cores = sorted(os.sched_getaffinity(0))
+    n_slots = max(len(available_cores) // n_cores, 1)
+    first_core = (slot % n_slots) * n_cores
+    return available_cores[first_core:first_core + n_cores]
+
+
+@contextmanager
+def limited_threads(n_cores: int, cores: Optional[List[int]] = None):
+    """
+    Limits the native thread pools of the process and the ones of the processes started inside the block
+    to the core allotment and optionally pins them to the cores.
+    """
+    previous_env = {name: os.environ.get(name) for name in THREAD_ENV_VARS + [TF_INTEROP_ENV_VAR]}
+    previous_affinity = os.sched_getaffinity(0) if cores else None
+    os.environ.update({name: str(n_cores) for name in THREAD_ENV_VARS})
+    os.environ[TF_INTEROP_ENV_VAR] = '1'
+    if cores:
+        os.sched_setaffinity(0, cores)
+    try:
+        with threadpool_limits(limits=n_cores):
+            yield
+    finally:
+        for name, value in previous_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        if previous_affinity:
+            os.sched_setaffinity(0, previous_affinity)
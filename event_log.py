@@ -0,0 +1,139 @@
+"""
+Structured trace of the benchmark runs. Every process writes the buffered events to its own jsonl-file
+in the trace directory, the aggregate_traces function summarises the files of all the workers.
+
+    python event_log.py <trace_dir>
+"""
+import atexit
+import glob
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from instrumentation import PhaseHook, register_phase_hook
+
+TRACE_DIR_ENV = 'BENCHMARK_TRACE_DIR'
+
+
+class EventLog:
+    def __init__(self, directory: str, buffer_size: int = 100, flush_interval_secs: float = 5.0):
+        self.file_path = os.path.join(directory, f'events_{socket.gethostname()}_{os.getpid()}.jsonl')
+        self.buffer_size = buffer_size
+        self.flush_interval_secs = flush_interval_secs
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def emit(self, event: str, **fields):
+        record = {'ts': time.time(), 'host': socket.gethostname(), 'pid': os.getpid(), 'event': event}
+        record.update(fields)
+        with self._lock:
+            self._buffer.append(json.dumps(record, default=str))
+            is_flush_time = (len(self._buffer) >= self.buffer_size or
+                             time.monotonic() - self._last_flush > self.flush_interval_secs)
+        if is_flush_time:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._buffer:
+                with open(self.file_path, 'a') as file:
+                    file.write('\n'.join(self._buffer) + '\n')
+                self._buffer = []
+            self._last_flush = time.monotonic()
+
+    def flush_at_exit(self):
+        # the forked workers inherit the exit handlers of the parent along with a copy of its buffer
+        if os.getpid() == self._pid:
+            self.flush()
+
+
+class EventLogPhaseHook(PhaseHook):
+    def on_phase_end(self, phase_name: str, timing: Dict[str, float]):
+        emit('phase', phase=phase_name, wall_secs=round(timing['wall_secs'], 4),
+             cpu_secs=round(timing['cpu_secs'], 4))
+
+
+_event_log: Optional[EventLog] = None
+_is_hook_registered = False
+
+
+def configure_event_log(directory: str):
+    """Enables the trace for the process and the workers started by it."""
+    os.makedirs(directory, exist_ok=True)
+    os.environ[TRACE_DIR_ENV] = directory
+    get_event_log()
+
+
+def get_event_log() -> Optional[EventLog]:
+    global _event_log, _is_hook_registered
+    directory = os.environ.get(TRACE_DIR_ENV)
+    if not directory:
+        return None
+    # the forked workers inherit the log of the parent, but have to write to their own files
+    if _event_log is None or not _event_log.file_path.endswith(f'_{os.getpid()}.jsonl'):
+        _event_log = EventLog(directory)
+        # the buffered events of the process are written on its normal exit too
+        atexit.register(_event_log.flush_at_exit)
+    if not _is_hook_registered:
+        register_phase_hook(EventLogPhaseHook())
+        _is_hook_registered = True
+    return _event_log
+
+
+def emit(event: str, flush: bool = False, **fields):
+    event_log = get_event_log()
+    if event_log is None:
+        return
+    event_log.emit(event, **fields)
+    if flush:
+        event_log.flush()
+
+
+def aggregate_traces(directory: str) -> dict:
+    """Summarises the traces of all the workers into the throughput and utilisation report."""
+    events = []
+    for file_path in glob.glob(os.path.join(directory, 'events_*.jsonl')):
+        with open(file_path, 'r') as file:
+            events.extend(json.loads(line) for line in file if line.strip())
+    if not events:
+        return {}
+
+    span_secs = max(event['ts'] for event in events) - min(event['ts'] for event in events)
+    unit_ends = [event for event in events if event['event'] == 'unit_end']
+    workers = {}
+    for event in unit_ends:
+        worker = workers.setdefault(f'{event["host"]}:{event["pid"]}', {'units': 0, 'busy_secs': 0.0})
+        worker['units'] += 1
+        worker['busy_secs'] += event.get('wall_secs', 0.0)
+
+    frameworks = {}
+    for event in unit_ends:
+        framework = frameworks.setdefault(event['model'], {'units': 0, 'failed': 0, 'wall_secs': 0.0})
+        framework['units'] += 1
+        framework['failed'] += event['status'] != 'ok'
+        framework['wall_secs'] += event.get('wall_secs', 0.0)
+
+    cache_hits = sum(event['event'] == 'cache_hit' for event in events)
+    cache_misses = sum(event['event'] == 'cache_miss' for event in events)
+    busy_secs = sum(worker['busy_secs'] for worker in workers.values())
+
+    return {'span_hours': round(span_secs / 3600, 3),
+            'units': len(unit_ends),
+            'failures': sum(event['event'] == 'failure' for event in events),
+            'skipped_units': sum(event['event'] == 'unit_skipped' for event in events),
+            'throughput_units_per_hour': round(len(unit_ends) / span_secs * 3600, 2) if span_secs else None,
+            'utilisation': round(busy_secs / (len(workers) * span_secs), 3) if workers and span_secs else None,
+            'cache_hit_rate': round(cache_hits / (cache_hits + cache_misses), 3) if cache_hits + cache_misses else None,
+            'workers': workers,
+            'frameworks': {name: dict(stats, mean_wall_secs=round(stats['wall_secs'] / stats['units'], 2))
+                           for name, stats in frameworks.items()}}
+
+
+if __name__ == '__main__':
+    print(json.dumps(aggregate_traces(sys.argv[1]), indent=4))
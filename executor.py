@@ -1,15 +1,33 @@
-from dataclasses import dataclass
-from typing import List
+import multiprocessing
+import random
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import List, Optional, Tuple
 
+import numpy as np
 from sklearn.metrics import f1_score, mean_squared_error, r2_score, roc_auc_score, balanced_accuracy_score
 
 from model.H2O.b_h2o import run_h2o
 from model.autokeras.b_autokeras import run_autokeras
 from baseline.b_xgboost import run_xgboost
+from anytime import summarise_anytime_curve
 from benchmark_model_types import BenchmarkModelTypesEnum
+from core_allotment import allotted_cores, get_worker_slot, init_worker_slot, limited_threads
+from benchmark_utils import get_budget_scale, get_dataset_shape, get_models_hyperparameters, get_subsample_path, \
+    set_time_budgets
 from model.fedot.b_fedot import run_fedot
 from model.tpot.b_tpot import run_tpot
 from fedot.core.repository.tasks import TaskTypesEnum
+from event_log import emit
+from fingerprint import unit_fingerprint
+from instrumentation import METRICS, MemoryMonitor, recording_phases, timed_phase
+from metrics_direction import LOWER_IS_BETTER_METRICS
+from profiling import ProfilerTypeEnum, profiled
+from results_store import ResultsStore
+from supervisor import FairnessBudget, run_supervised
 
 
 def calculate_metrics(metric_list: list, target: list, predicted_probs: list, predicted_labels: list):
@@ -33,6 +51,22 @@ def calculate_metrics(metric_list: list, target: list, predicted_probs: list, pr
     return result_dict
 
 
+def aggregate_seed_metrics(seed_metrics: List[dict]) -> dict:
+    stats = {}
+    for metric_name in seed_metrics[0]:
+        values = np.array([metrics[metric_name] for metrics in seed_metrics], dtype=float)
+        q25, q75 = np.percentile(values, [25, 75])
+        stats[metric_name] = {'mean': round(float(np.mean(values)), 4),
+                              'std': round(float(np.std(values, ddof=1)) if len(values) > 1 else 0.0, 4),
+                              'median': round(float(np.median(values)), 4),
+                              'iqr': round(float(q75 - q25), 4)}
+    return stats
+
+
+def _execute_single_run(case_executor: 'CaseExecutor') -> dict:
+    return case_executor.execute()
+
+
 @dataclass
 class ExecutionParams:
     train_file: str
@@ -40,6 +74,10 @@ class ExecutionParams:
     case_label: str
     target_name: str
     task: TaskTypesEnum
+    hyperparameters: Optional[dict] = None
+    seed: Optional[int] = None
+    # the number of threads the strategy gives to the framework, its default if not set
+    n_cores: Optional[int] = None
 
 
 @dataclass
@@ -47,6 +85,31 @@ class CaseExecutor:
     models: List[BenchmarkModelTypesEnum]
     metric_list: List[str]
     params: ExecutionParams
+    # fractions of the training split to fit on one after another, i.e. (0.01, 0.1, 1.0)
+    fidelities: Optional[Tuple[float, ...]] = None
+    # the fidelities loop stops if the first metric improves less than this value
+    early_stop_tolerance: Optional[float] = None
+    # every framework runs once per seed if the seeds are passed
+    seeds: Optional[List[int]] = None
+    n_workers: int = 1
+    memory_sample_interval: float = 1.0
+    # the strategies of the profiled models (all the models by default) run under the profiler
+    profiler: Optional[ProfilerTypeEnum] = None
+    profiled_models: Optional[List[BenchmarkModelTypesEnum]] = None
+    profile_top_n: int = 20
+    # the latency, throughput, load time and size of the fitted models are measured after the fitting
+    measure_inference: bool = False
+    # every strategy runs in the supervised process with the equal CPU time budget if it is set
+    fairness: Optional[FairnessBudget] = None
+    # the thread pools of every strategy are limited to the allotment (the fairness one by default),
+    # the concurrent strategies are pinned to the separate cores if required
+    cores_per_strategy: Optional[int] = None
+    pin_cores: bool = False
+    # the supervised strategy is killed if it sends no heartbeat for this time
+    heartbeat_timeout_secs: Optional[float] = None
+    # the units with the same fingerprint in the results database are not run again unless forced
+    results_db: Optional[str] = None
+    force_rerun: bool = False
 
     _strategy_by_type = {
         BenchmarkModelTypesEnum.tpot: run_tpot,
@@ -58,18 +121,198 @@ class CaseExecutor:
 
     def execute(self):
         print('START EXECUTION')
+        emit('case_start', case_label=self.params.case_label, models=[model.name for model in self.models])
 
         result = {'task': self.params.task.value}
 
+        n_rows, n_features = get_dataset_shape(self.params.train_file)
+        is_budget_resolved = self.params.hyperparameters is None
+        # the budget is resolved for this execution only, the params of the caller are not modified
+        params = self.params
+        if is_budget_resolved:
+            params = replace(self.params,
+                             hyperparameters=get_models_hyperparameters(n_rows=n_rows, n_features=n_features))
+        result['budget'] = {'n_rows': n_rows, 'n_features': n_features,
+                            'scale': round(get_budget_scale(n_rows, n_features), 3)}
+        result['hyperparameters'] = params.hyperparameters
+
+        if self.seeds:
+            result.update(self._execute_repeats(params))
+            return result
+
         strategies = {model_type: self._strategy_by_type[model_type] for
                       model_type in self.models}
 
         for model_type, strategy_func in strategies.items():
             print(f'---------\nRUN {model_type.name}\n---------')
-            target, predicted, predicted_labels = strategy_func(self.params)
-            result[f'{model_type.name}_metric'] = calculate_metrics(self.metric_list,
-                                                                    target=target,
-                                                                    predicted_probs=predicted,
-                                                                    predicted_labels=predicted_labels)
+            if self.fidelities:
+                learning_curve = self._execute_fidelities(model_type, strategy_func, params, is_budget_resolved)
+                result[f'{model_type.name}_learning_curve'] = learning_curve
+                result[f'{model_type.name}_metric'] = learning_curve[-1]['metrics']
+                # the metric is of the subsample if the learning curve has stopped early
+                result[f'{model_type.name}_fidelity'] = learning_curve[-1]['fraction']
+            else:
+                run_report = self._execute_strategy(model_type, strategy_func, params)
+                result.update({f'{model_type.name}_{key}': value for key, value in run_report.items()})
 
         return result
+
+    def _execute_repeats(self, params: ExecutionParams) -> dict:
+        # every (framework, seed) unit is a separate run, the seed is a part of the label for the models cache
+        runs = [replace(self, models=[model_type], seeds=None, n_workers=1,
+                        params=replace(params, seed=seed, case_label=f'{params.case_label}_s{seed}'))
+                for model_type in self.models for seed in self.seeds]
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=init_worker_slot,
+                                 initargs=(multiprocessing.Value('i', 0),)) as pool:
+            run_results = list(pool.map(_execute_single_run, runs))
+
+        result = {}
+        for model_type in self.models:
+            prefix = f'{model_type.name}_'
+            seed_results = []
+            for run, run_result in zip(runs, run_results):
+                if run.models[0] != model_type:
+                    continue
+                seed_result = {'seed': run.params.seed}
+                seed_result.update({key[len(prefix):]: value for key, value in run_result.items()
+                                    if key.startswith(prefix)})
+                seed_results.append(seed_result)
+
+            metric_stats = aggregate_seed_metrics([seed_result['metric'] for seed_result in seed_results])
+            result[f'{prefix}seeds'] = seed_results
+            result[f'{prefix}metric'] = {metric_name: stats['mean'] for metric_name, stats in metric_stats.items()}
+            result[f'{prefix}metric_stats'] = metric_stats
+
+        return result
+
+    def _is_profiled(self, model_type: BenchmarkModelTypesEnum) -> bool:
+        return self.profiler is not None and model_type in (self.profiled_models or self.models)
+
+    def _cached_report(self, model_type: BenchmarkModelTypesEnum, fingerprint: str) -> Optional[dict]:
+        store = ResultsStore(self.results_db)
+        try:
+            report = store.cached_report(fingerprint)
+        finally:
+            store.close()
+        # the stored run is not reused if it lacks the reports requested now
+        if report is None or (self._is_profiled(model_type) and 'profile' not in report) or \
+                (self.measure_inference and 'inference' not in report):
+            return None
+        return dict(report, fingerprint=fingerprint, cached=True)
+
+    def _run_recorded(self, model_type: BenchmarkModelTypesEnum, strategy_func, params: ExecutionParams) -> dict:
+        is_profiled = self._is_profiled(model_type)
+        profiling = profiled(self.profiler, f'{params.case_label}_{model_type.name}',
+                             top_n=self.profile_top_n) if is_profiled else nullcontext()
+        with recording_phases(self.measure_inference) as recorder:
+            with profiling as profile_report:
+                target, predicted, predicted_labels = strategy_func(params)
+            with timed_phase(METRICS):
+                metrics = calculate_metrics(self.metric_list,
+                                            target=target,
+                                            predicted_probs=predicted,
+                                            predicted_labels=predicted_labels)
+
+        run_report = {'metric': metrics,
+                      'timings': recorder.summary()}
+        if is_profiled:
+            run_report['profile'] = profile_report
+        if recorder.inference:
+            run_report['inference'] = recorder.inference
+        if recorder.anytime_evaluations:
+            run_report['anytime'] = summarise_anytime_curve(recorder.anytime_evaluations,
+                                                            recorder.anytime_budget_secs)
+        return run_report
+
+    def _execute_strategy(self, model_type: BenchmarkModelTypesEnum, strategy_func,
+                          params: ExecutionParams) -> dict:
+        if params.seed is not None:
+            random.seed(params.seed)
+            np.random.seed(params.seed)
+        unit_fields = {'model': model_type.name, 'case_label': params.case_label, 'seed': params.seed}
+        n_cores = self.cores_per_strategy or (self.fairness.n_cores if self.fairness else None)
+
+        fingerprint = None
+        if self.results_db is not None:
+            fingerprint = unit_fingerprint(model_type, params.train_file, params.test_file, params.target_name,
+                                           params.task.value, self.metric_list, params.hyperparameters, params.seed,
+                                           n_cores, self.fairness.cpu_secs if self.fairness else None)
+            cached_report = None if self.force_rerun else self._cached_report(model_type, fingerprint)
+            if cached_report is not None:
+                print(f'{model_type.name} result is already in the results database')
+                emit('unit_skipped', fingerprint=fingerprint, **unit_fields)
+                return cached_report
+
+        emit('unit_start', **unit_fields)
+
+        def _emit_memory_sample(rss_mb: float):
+            emit('resource_sample', model=model_type.name, rss_mb=round(rss_mb, 1))
+
+        thread_limits = nullcontext()
+        if n_cores:
+            params = replace(params, n_cores=n_cores)
+            cores = allotted_cores(get_worker_slot(), n_cores) if self.pin_cores else None
+            thread_limits = limited_threads(n_cores, cores)
+
+        try:
+            with thread_limits, \
+                    MemoryMonitor(self.memory_sample_interval, on_sample=_emit_memory_sample) as memory_monitor:
+                if self.fairness is None and self.heartbeat_timeout_secs is None:
+                    run_report = self._run_recorded(model_type, strategy_func, params)
+                else:
+                    if self.fairness is not None:
+                        # the supervised strategy gets the wall time its cores need to spend the CPU budget
+                        params = replace(params, hyperparameters=set_time_budgets(params.hyperparameters,
+                                                                                  self.fairness.wall_mins))
+                    run_report, usage = run_supervised(partial(self._run_recorded, model_type, strategy_func, params),
+                                                       self.fairness, self.heartbeat_timeout_secs)
+                    run_report['usage'] = usage
+        except Exception as ex:
+            emit('failure', error=repr(ex), traceback=traceback.format_exc(), **unit_fields)
+            emit('unit_end', status='failed', flush=True, **unit_fields)
+            raise
+
+        run_report['memory'] = memory_monitor.summary()
+        if fingerprint is not None:
+            run_report['fingerprint'] = fingerprint
+        emit('unit_end', status='ok', metrics=run_report['metric'], wall_secs=run_report['timings']['wall_secs'],
+             cpu_secs=run_report['timings']['cpu_secs'], peak_rss_mb=run_report['memory']['peak_rss_mb'],
+             flush=True, **unit_fields)
+        return run_report
+
+    def _execute_fidelities(self, model_type: BenchmarkModelTypesEnum, strategy_func, params: ExecutionParams,
+                            is_budget_resolved: bool) -> List[dict]:
+        learning_curve = []
+        main_metric = self.metric_list[0]
+        for fraction in sorted(self.fidelities):
+            print(f'FIDELITY {fraction}')
+            train_file = get_subsample_path(params.train_file, fraction,
+                                            target_name=params.target_name,
+                                            stratify=params.task == TaskTypesEnum.classification)
+            n_rows, n_features = get_dataset_shape(train_file)
+            hyperparameters = params.hyperparameters
+            if is_budget_resolved:
+                hyperparameters = get_models_hyperparameters(n_rows=n_rows, n_features=n_features)
+            # the fraction is a part of the label to keep the cached models of the fidelities apart
+            case_label = params.case_label if fraction >= 1 else f'{params.case_label}_fid{fraction}'
+            fidelity_params = replace(params, train_file=train_file, case_label=case_label,
+                                      hyperparameters=hyperparameters)
+
+            run_report = self._execute_strategy(model_type, strategy_func, fidelity_params)
+            metrics = run_report['metric']
+            learning_curve.append({'fraction': fraction,
+                                   'n_rows': n_rows,
+                                   'metrics': metrics,
+                                   'wall_secs': run_report['timings']['wall_secs'],
+                                   'timings': run_report['timings'],
+                                   'memory': run_report['memory']})
+
+            if self.early_stop_tolerance is not None and len(learning_curve) > 1:
+                improvement = metrics[main_metric] - learning_curve[-2]['metrics'][main_metric]
+                if main_metric in LOWER_IS_BETTER_METRICS:
+                    improvement = -improvement
+                if improvement < self.early_stop_tolerance:
+                    print(f'Learning curve has flattened on fidelity {fraction}')
+                    break
+
+        return learning_curve
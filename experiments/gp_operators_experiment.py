@@ -1,6 +1,5 @@
 import csv
 import datetime
-import gc
 import os
 from pathlib import Path
 from experiments.credit_scoring_experiment import run_credit_scoring_problem
@@ -11,6 +10,7 @@ from fedot.core.composer.optimisers.gp_optimiser import GPChainOptimiserParamete
 from fedot.core.composer.optimisers.mutation import MutationTypesEnum
 from fedot.core.composer.optimisers.regularization import RegularizationTypesEnum
 from fedot.core.composer.optimisers.selection import SelectionTypesEnum
+from worker_pool import RecyclingWorkerPool
 
 
 def proj_root():
@@ -33,6 +33,25 @@ def add_result_to_csv(f, t_opt, regular, auc, n_models, n_layers):
         writer.writerow([t_opt, regular, auc, n_models, n_layers])
 
 
+def run_operators_experiment(experiment: dict) -> dict:
+    """Runs the composer in the worker process and returns only the plain results, not the composer."""
+    optimiser_parameters = GPChainOptimiserParameters(selection_types=[SelectionTypesEnum.tournament],
+                                                      crossover_types=experiment['crossover_types'],
+                                                      mutation_types=[MutationTypesEnum.simple,
+                                                                      MutationTypesEnum.growth,
+                                                                      MutationTypesEnum.reduce],
+                                                      regularization_type=experiment['regular_type'],
+                                                      genetic_scheme_type=GeneticSchemeTypesEnum.steady_state)
+    roc_auc, chain, composer = run_credit_scoring_problem(experiment['train_path'], experiment['test_path'],
+                                                          max_lead_time=datetime.timedelta(
+                                                              minutes=experiment['time_amount']),
+                                                          gp_optimiser_params=optimiser_parameters,
+                                                          pop_size=experiment['pop_size'],
+                                                          generations=experiment['iterations'])
+    return {'roc_auc': roc_auc, 'n_models': len(chain.nodes), 'depth': chain.depth,
+            'historical_fitness': [[-chain.fitness for chain in pop] for pop in composer.history.individuals]}
+
+
 if __name__ == '__main__':
     max_amount_of_time = 400
     step = 400
@@ -50,31 +69,23 @@ if __name__ == '__main__':
     pop_size = 4
     iterations = 3
     runs = 4
+    regular_type = RegularizationTypesEnum.decremental
+    experiments = []
     while time_amount <= max_amount_of_time:
         for type_num, crossover_type in enumerate(crossover_types_set):
             for run in range(runs):
-                gc.collect()
-                selection_types = [SelectionTypesEnum.tournament]
-                crossover_types = crossover_type
-                mutation_types = [MutationTypesEnum.simple, MutationTypesEnum.growth, MutationTypesEnum.reduce]
-                regular_type = RegularizationTypesEnum.decremental
-                genetic_scheme_type = GeneticSchemeTypesEnum.steady_state
-                optimiser_parameters = GPChainOptimiserParameters(selection_types=selection_types,
-                                                                  crossover_types=crossover_types,
-                                                                  mutation_types=mutation_types,
-                                                                  regularization_type=regular_type,
-                                                                  genetic_scheme_type=genetic_scheme_type)
-                roc_auc, chain, composer = run_credit_scoring_problem(full_path_train, full_path_test,
-                                                                      max_lead_time=datetime.timedelta(
-                                                                          minutes=time_amount),
-                                                                      gp_optimiser_params=optimiser_parameters,
-                                                                      pop_size=pop_size, generations=iterations)
-
-                is_regular = regular_type == RegularizationTypesEnum.decremental
-                add_result_to_csv(file_path_result, time_amount, is_regular, round(roc_auc, 4), len(chain.nodes),
-                                  chain.depth)
-                historical_fitness = [[-chain.fitness for chain in pop] for pop in composer.history.individuals]
-                history_gp[type_num].append(historical_fitness)
+                experiments.append({'type_num': type_num, 'time_amount': time_amount,
+                                    'crossover_types': crossover_type, 'regular_type': regular_type,
+                                    'pop_size': pop_size, 'iterations': iterations,
+                                    'train_path': full_path_train, 'test_path': full_path_test})
         time_amount += step
+
+    # every run gets the fresh process, so the memory leaked by the composer does not pile up
+    pool = RecyclingWorkerPool(run_operators_experiment, max_tasks_per_worker=1)
+    for experiment, result in zip(experiments, pool.imap(experiments)):
+        is_regular = regular_type == RegularizationTypesEnum.decremental
+        add_result_to_csv(file_path_result, experiment['time_amount'], is_regular, round(result['roc_auc'], 4),
+                          result['n_models'], result['depth'])
+        history_gp[experiment['type_num']].append(result['historical_fitness'])
     labels = ['Subtree crossover', 'One-point crossover', 'All crossover types', 'Without crossover']
     results_preprocess_and_quality_visualisation(history_gp=history_gp, labels=labels, iterations=iterations)
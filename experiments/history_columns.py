@@ -0,0 +1,164 @@
+import argparse
+import os
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from experiments.history_log import composer_generations, read_history_log
+from fedot.core.repository.tasks import Task, TaskTypesEnum
+
+# the column dtypes, the objectives are the 2d column of the fitness vectors padded with nan
+HISTORY_COLUMNS = {'run': np.int32, 'generation': np.int32, 'individual': np.int32, 'archive': np.bool_,
+                   'objectives': np.float64, 'hash': 'S16', 'depth': np.int16, 'n_models': np.int16,
+                   'computation_time': np.float64}
+
+
+def export_history_columns(directory: str, runs: Iterable[Tuple[int, Iterable[dict]]]):
+    """
+    Writes the generations of the runs as a npy file per column. The runs are the (run number, generations) pairs
+    in the ascending order of the numbers, the generations are the records of the history log. Every individual
+    of the population and of the archive is a row, the rows of the archive have the archive flag set.
+    """
+    columns = {name: [] for name in HISTORY_COLUMNS}
+    last_run = None
+    for run, generations in runs:
+        if last_run is not None and run <= last_run:
+            raise ValueError(f'Run {run} is exported after run {last_run}')
+        last_run = run
+        for generation in generations:
+            for is_archive, key in ((False, 'individuals'), (True, 'archive')):
+                for individual, record in enumerate(generation[key]):
+                    columns['run'].append(run)
+                    columns['generation'].append(generation['generation'])
+                    columns['individual'].append(individual)
+                    columns['archive'].append(is_archive)
+                    columns['objectives'].append(record['fitness'])
+                    columns['hash'].append(record['hash'])
+                    columns['depth'].append(record['depth'])
+                    columns['n_models'].append(record['n_models'])
+                    columns['computation_time'].append(np.nan if record['computation_time'] is None
+                                                       else record['computation_time'])
+
+    n_objectives = max((len(fitness) for fitness in columns['objectives']), default=1)
+    objectives = np.full((len(columns['objectives']), n_objectives), np.nan)
+    for row, fitness in enumerate(columns['objectives']):
+        objectives[row, :len(fitness)] = fitness
+    columns['objectives'] = objectives
+
+    os.makedirs(directory, exist_ok=True)
+    for name, dtype in HISTORY_COLUMNS.items():
+        np.save(os.path.join(directory, f'{name}.npy'), np.asarray(columns[name], dtype=dtype))
+
+
+def history_dir_path(name_of_dataset: str, history_dir: Optional[str] = None) -> str:
+    """The directory of the history logs and the columns of the multi-objective experiment on the dataset."""
+    return history_dir or f'{name_of_dataset}_multiobj_history'
+
+
+def history_columns_dir(name_of_dataset: str, label: str, history_dir: Optional[str] = None) -> str:
+    return os.path.join(history_dir_path(name_of_dataset, history_dir), f'{name_of_dataset}_{label}_history_columns')
+
+
+@dataclass
+class RunHistory:
+    """The history of a single run as the slices of the columns in the order of the generations."""
+    generation: np.ndarray
+    archive: np.ndarray
+    objectives: np.ndarray
+    computation_time: np.ndarray
+
+    @property
+    def is_multi_obj(self) -> bool:
+        return self.objectives.shape[1] > 1
+
+    @property
+    def has_archive(self) -> bool:
+        return bool(self.archive.any())
+
+    def _generation_bounds(self) -> np.ndarray:
+        n_generations = int(self.generation[-1]) + 1 if len(self.generation) else 0
+        return np.searchsorted(self.generation, np.arange(n_generations + 1))
+
+    def quality(self, task: Task) -> np.ndarray:
+        """The same as extract_quality_list but for all the rows of the run."""
+        sign = -1 if task.task_type == TaskTypesEnum.classification else 1
+        return sign * np.asarray(self.objectives[:, 0])
+
+    def quality_history(self, task: Task, with_archive: bool = False) -> List[List[float]]:
+        """Returns the quality of the population (and of the archive next to it) by the generations."""
+        quality = self.quality(task)
+        bounds = self._generation_bounds()
+        return [quality[start:end][np.logical_or(with_archive, ~self.archive[start:end])].tolist()
+                for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def archive_fitness(self) -> List[List[List[float]]]:
+        bounds = self._generation_bounds()
+        return [np.asarray(self.objectives[start:end][self.archive[start:end]]).tolist()
+                for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def last_pareto_front(self, task: Task) -> List[List[float]]:
+        """Returns the quality and the complexity lists of the archive of the last generation."""
+        # the run without the rows has no generations, so its front is empty
+        if not len(self.generation):
+            return [[], []]
+        bounds = self._generation_bounds()
+        rows = slice(bounds[-2], bounds[-1])
+        archive = self.archive[rows]
+        # the single-objective runs have no complexity objective, so the computation time stands for it
+        complexity = self.objectives[rows, 1] if self.is_multi_obj else self.computation_time[rows]
+        return [self.quality(task)[rows][archive].tolist(), np.asarray(complexity)[archive].tolist()]
+
+
+class HistoryColumns:
+    """Reads the columns of the exported history lazily as the memory-mapped arrays."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._columns = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.directory, f'{name}.npy'), mmap_mode='r')
+        return self._columns[name]
+
+    @property
+    def runs(self) -> List[int]:
+        return np.unique(self['run']).tolist()
+
+    def run_history(self, run: int) -> RunHistory:
+        # the rows are exported in the ascending order of the runs
+        rows = slice(*np.searchsorted(self['run'], [run, run + 1]))
+        return RunHistory(generation=self['generation'][rows], archive=self['archive'][rows],
+                          objectives=self['objectives'][rows], computation_time=self['computation_time'][rows])
+
+
+_opened_columns = {}
+
+
+def columns_mtime(directory: str) -> int:
+    return os.stat(os.path.join(directory, 'run.npy')).st_mtime_ns
+
+
+def open_history_columns(directory: str) -> HistoryColumns:
+    """Returns the columns of the directory, they are opened again only if the columns are exported again."""
+    key = (os.path.abspath(directory), columns_mtime(directory))
+    if key not in _opened_columns:
+        _opened_columns[key] = HistoryColumns(directory)
+    return _opened_columns[key]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export of the composer histories to the columnar format')
+    parser.add_argument('output', help='directory of the columns')
+    parser.add_argument('files', nargs='+', help='history logs or pickled composers (npy) in the order of the runs')
+    args = parser.parse_args()
+
+    def generations(file_path: str):
+        if file_path.endswith('.npy'):
+            return composer_generations(np.load(file_path, allow_pickle=True)[0])
+        return read_history_log(file_path)
+
+    export_history_columns(args.output, ((run, generations(file_path))
+                                         for run, file_path in enumerate(args.files, start=1)))
+    print(f'{len(args.files)} runs exported to {args.output}')
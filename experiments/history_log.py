@@ -0,0 +1,91 @@
+import hashlib
+import json
+import time
+from typing import Iterator, List, Optional
+
+from fedot.core.composer.optimisers.multi_objective_fitness import MultiObjFitness
+from fedot.core.repository.tasks import Task, TaskTypesEnum
+
+
+def chain_structure_hash(chain) -> str:
+    """Returns the hash of the models and the edges of the chain, the same for the chains of the same structure."""
+
+    def node_descriptor(node) -> str:
+        parents = sorted(node_descriptor(parent) for parent in (node.nodes_from or []))
+        return f'{node.model.model_type}({",".join(parents)})'
+
+    return hashlib.sha1(node_descriptor(chain.root_node).encode()).hexdigest()[:16]
+
+
+def fitness_values(individual) -> List[float]:
+    if type(individual.fitness) is MultiObjFitness:
+        return [float(value) for value in individual.fitness.values]
+    return [float(individual.fitness)]
+
+
+def individual_record(individual) -> dict:
+    return {'fitness': fitness_values(individual), 'hash': chain_structure_hash(individual),
+            'depth': individual.depth, 'n_models': len(individual.nodes),
+            'computation_time': getattr(individual, 'computation_time', None)}
+
+
+def composer_generations(composer) -> Iterator[dict]:
+    """Yields the generations of the composer history as the records of the history log."""
+    history = composer.history
+    for generation, population in enumerate(history.individuals):
+        archive = history.archive_history[generation] if generation < len(history.archive_history) else []
+        yield {'generation': generation,
+               'individuals': [individual_record(ind) for ind in population],
+               'archive': [individual_record(ind) for ind in archive]}
+
+
+def write_history_log(file_path: str, composer, started_at: float, finished_at: Optional[float] = None):
+    """
+    Writes the history of the composer run as json lines: the run header with its timestamps, then a record
+    per generation with the fitness vectors, the structure hashes, the sizes and the computation times
+    of the population and the archive. The log is post-hoc: it is written once compose_chain has returned,
+    so the whole history is in memory by then and the crashed or killed run leaves no log. The log only
+    spares the readers from unpickling the composer.
+    """
+    with open(file_path, 'w') as file:
+        file.write(json.dumps({'started_at': started_at, 'finished_at': finished_at or time.time(),
+                               'n_generations': len(composer.history.individuals)}) + '\n')
+        for generation in composer_generations(composer):
+            file.write(json.dumps(generation) + '\n')
+
+
+def read_history_log(file_path: str) -> Iterator[dict]:
+    """Yields the generation records of the history log one by one."""
+    with open(file_path) as file:
+        next(file)
+        for line in file:
+            yield json.loads(line)
+
+
+def history_log_header(file_path: str) -> dict:
+    with open(file_path) as file:
+        return json.loads(next(file))
+
+
+def records_quality(records: List[dict], task: Task) -> List[float]:
+    """The same as extract_quality_list but for the records of the history log."""
+    sign = -1 if task.task_type == TaskTypesEnum.classification else 1
+    return [sign * record['fitness'][0] for record in records]
+
+
+def quality_history(file_path: str, task: Task, with_archive: bool = False) -> List[List[float]]:
+    return [records_quality(generation['individuals'], task) +
+            (records_quality(generation['archive'], task) if with_archive else [])
+            for generation in read_history_log(file_path)]
+
+
+def archive_fitness_history(file_path: str) -> List[List[List[float]]]:
+    return [[record['fitness'] for record in generation['archive']] for generation in read_history_log(file_path)]
+
+
+def last_pareto_front(file_path: str, task: Task) -> List[List[float]]:
+    """Returns the quality and the complexity lists of the archive of the last generation."""
+    archive = []
+    for generation in read_history_log(file_path):
+        archive = generation['archive']
+    return [records_quality(archive, task), [record['fitness'][1] for record in archive]]
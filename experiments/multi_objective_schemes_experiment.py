@@ -1,6 +1,7 @@
 import datetime
-import gc
+import json
 import os
+import time
 
 import numpy as np
 from pathlib import Path
@@ -8,7 +9,10 @@ from pathlib import Path
 from experiments.credit_scoring_experiment import run_credit_scoring_problem
 from experiments.gp_schemes_experiment import write_header_to_csv, add_result_to_csv, \
     results_preprocess_and_quality_visualisation
-from experiments.viz import viz_pareto_fronts_comparison, viz_hv_comparison
+from experiments.history_columns import export_history_columns, history_columns_dir, history_dir_path
+from experiments.history_log import archive_fitness_history, individual_record, last_pareto_front, \
+    quality_history, read_history_log, write_history_log
+from experiments.viz import viz_pareto_fronts_comparison, viz_hv_by_archive_fitness
 
 from fedot.core.composer.optimisers.crossover import CrossoverTypesEnum
 from fedot.core.composer.optimisers.inheritance import GeneticSchemeTypesEnum
@@ -20,6 +24,7 @@ from fedot.core.composer.optimisers.multi_objective_fitness import MultiObjFitne
 from fedot.core.repository.quality_metrics_repository import ClassificationMetricsEnum, ComplexityMetricsEnum, \
     MetricsRepository, RegressionMetricsEnum
 from fedot.core.repository.tasks import TaskTypesEnum, Task
+from worker_pool import RecyclingWorkerPool
 
 all_results_chains_file = 'all_result_chains.csv'
 
@@ -31,15 +36,13 @@ def proj_root():
 def save_composer_history(experiment_path: str,
                           name_of_experiment: str,
                           metrics: list,
-                          chains: list,
-                          history_save_flag: bool = False):
+                          chains: list):
+    """Saves the validation metrics and the compact records of the best chains without pickling the chains."""
     metric_save = os.path.join(str(experiment_path), name_of_experiment + '_best_metric')
-    chain_save = os.path.join(str(experiment_path), name_of_experiment + '_best_chains')
-    if history_save_flag:
-        metric_save = os.path.join(str(experiment_path), name_of_experiment + '_history_of_quality')
-        chain_save = os.path.join(str(experiment_path), name_of_experiment + '_history_of_individuals')
-    np.save(metric_save, metrics, allow_pickle=True)
-    np.save(chain_save, chains, allow_pickle=True)
+    chain_save = os.path.join(str(experiment_path), name_of_experiment + '_best_chains.json')
+    np.save(metric_save, np.array(metrics, dtype=float))
+    with open(chain_save, 'w') as file:
+        json.dump([individual_record(chain) for chain in chains], file)
     return
 
 
@@ -52,132 +55,148 @@ def extract_quality_list(task, pop):
                 ind.fitness for ind in pop]
 
 
+def run_multi_obj_run(experiment: dict) -> dict:
+    """
+    Runs the composer in the worker process, writes its history to the history log and returns only
+    the plain results, so the composer is released right after the run.
+    """
+    task, metric, run = experiment['task'], experiment['metric'], experiment['run']
+    optimiser_parameters = GPChainOptimiserParameters(selection_types=experiment['selection_type'],
+                                                      crossover_types=experiment['crossover_types'],
+                                                      mutation_types=experiment['mutation_types'],
+                                                      regularization_type=experiment['regular_type'],
+                                                      genetic_scheme_type=experiment['scheme_type'],
+                                                      with_auto_depth_configuration=
+                                                      experiment['with_auto_depth_configuration'])
+
+    started_at = time.time()
+    calculated_metrics, chains, composer = run_credit_scoring_problem(experiment['train_path'],
+                                                                      experiment['test_path'],
+                                                                      max_lead_time=datetime.timedelta(
+                                                                          minutes=experiment['time_amount']),
+                                                                      gp_optimiser_params=optimiser_parameters,
+                                                                      pop_size=experiment['pop_size'],
+                                                                      generations=experiment['iterations'],
+                                                                      max_depth=experiment['max_depth'],
+                                                                      start_depth=experiment['start_depth'],
+                                                                      metrics=metric, task=task)
+    try:
+        write_history_log(experiment['history_log'], composer, started_at=started_at)
+    except Exception as ex:
+        print(ex)
+        # the partial log is not read by the analyses of the experiment
+        if os.path.exists(experiment['history_log']):
+            os.remove(experiment['history_log'])
+    del composer
+
+    name_of_dataset = experiment['name_of_dataset']
+    try:
+        tmp_folder = str(run + 1) + '_experiment'
+        experiment_path = f'D:\результаты экспериментов\{name_of_dataset}\{tmp_folder}'
+        if not os.path.isdir(experiment_path):
+            os.makedirs(experiment_path)
+        name_of_experiment = name_of_dataset + '_' + experiment['label'] + '_run_number_' + str(run + 1)
+        save_composer_history(experiment_path, name_of_experiment, calculated_metrics, chains)
+    except Exception as ex:
+        print(ex)
+
+    if type(metric) is list:
+        roc_auc_metrics = calculated_metrics[0]
+        complexity_metrics = calculated_metrics[1]
+    else:
+        roc_auc_metrics = calculated_metrics
+        complexity_metrics = [MetricsRepository().metric_by_id(ComplexityMetricsEnum.computation_time)(chain)
+                              for chain in chains]
+
+    return {'chains': [{'quality': quality, 'complexity': complexity, 'n_models': len(chain.nodes),
+                        'depth': chain.depth}
+                       for quality, complexity, chain in zip(roc_auc_metrics, complexity_metrics, chains)]}
+
+
 def run_multi_obj_exp(selection_types, history_file='history.csv', labels=None, genetic_schemes_set=None,
                       depth_config=None, iterations=30,
                       runs=1, pop_sizes=(20, 20, 20, 20), crossover_types=None, metrics=None, mutation_types=None,
                       regular_type=RegularizationTypesEnum.decremental, train_path=None, test_path=None,
                       name_of_dataset=None, visualize_pareto=False, visualize_hv=False,
-                      objectives_names=('ROC-AUC metric', 'Computation time'), task=Task(TaskTypesEnum.classification)):
+                      objectives_names=('ROC-AUC metric', 'Computation time'), task=Task(TaskTypesEnum.classification),
+                      n_workers=1, max_tasks_per_worker=1, max_rss_mb=None, history_dir=None):
     max_amount_of_time = 800
     step = 800
     full_path_train = train_path
     full_path_test = test_path
-    all_history = [[] for _ in range(len(labels))]
     file_path_best = name_of_dataset + '_multiobj_exp_best.csv'
     row = ['exp_number', 'exp_type', 'iteration', 'complexity', 't_opt', 'regular', 'AUC', 'n_models', 'n_layers']
     write_header_to_csv(file_path_best, row=row)
+    # the histories of the runs are streamed to the files of the history logs instead of the memory
+    history_dir = history_dir_path(name_of_dataset, history_dir)
+    if not os.path.isdir(history_dir):
+        os.makedirs(history_dir)
     time_amount = step
     if not metrics:
         metrics = [ClassificationMetricsEnum.ROCAUC, ComplexityMetricsEnum.computation_time]
+    if not crossover_types:
+        crossover_types = [CrossoverTypesEnum.one_point, CrossoverTypesEnum.subtree]
+    if not mutation_types:
+        mutation_types = [MutationTypesEnum.simple, MutationTypesEnum.growth, MutationTypesEnum.reduce]
     max_depths = [3, 3, 3, 3]
     start_depth = [2, 2, 2, 2]  # starting depth for 1st population initialization
-    history_quality_gp = [[] for _ in range(len(labels))]
-    inds_history_gp = [[] for _ in range(len(labels))]
-    pareto_fronts_metrics = []
+    history_logs = [[] for _ in range(len(labels))]
+    is_multi_obj = [False for _ in range(len(labels))]
+    experiments = []
     n = 0
     while time_amount <= max_amount_of_time:
         for type_num, scheme_type in enumerate(genetic_schemes_set):
             for run in range(runs):
                 n += 1
-                gc.collect()
-                if not crossover_types:
-                    crossover_types = [CrossoverTypesEnum.one_point, CrossoverTypesEnum.subtree]
-                if not mutation_types:
-                    mutation_types = [MutationTypesEnum.simple, MutationTypesEnum.growth, MutationTypesEnum.reduce]
-                genetic_scheme_type = scheme_type
-                with_auto_depth_configuration = depth_config[type_num]
-                max_depth_in_exp = max_depths[type_num]
-                start_depth_in_exp = start_depth[type_num]
-
                 if any([type(m) is list for m in metrics]):
                     metric = metrics[type_num]
                 else:
                     metric = metrics
-                selection_type = selection_types[type_num]
-                optimiser_parameters = GPChainOptimiserParameters(selection_types=selection_type,
-                                                                  crossover_types=crossover_types,
-                                                                  mutation_types=mutation_types,
-                                                                  regularization_type=regular_type,
-                                                                  genetic_scheme_type=genetic_scheme_type,
-                                                                  with_auto_depth_configuration=
-                                                                  with_auto_depth_configuration)
-
-                calculated_metrics, chains, composer = run_credit_scoring_problem(full_path_train, full_path_test,
-                                                                                  max_lead_time=datetime.timedelta(
-                                                                                      minutes=time_amount),
-                                                                                  gp_optimiser_params=optimiser_parameters,
-                                                                                  pop_size=pop_sizes[type_num],
-                                                                                  generations=iterations,
-                                                                                  max_depth=max_depth_in_exp,
-                                                                                  start_depth=start_depth_in_exp,
-                                                                                  metrics=metric, task=task)
-
-                is_regular = regular_type == RegularizationTypesEnum.decremental
-                all_history[type_num].append(composer)
-                try:
-                    tmp_folder = str(run + 1) + '_experiment'
-                    experiment_path = f'D:\результаты экспериментов\{name_of_dataset}\{tmp_folder}'
-                    if not os.path.isdir(experiment_path):
-                        os.makedirs(experiment_path)
-                    name_of_experiment = name_of_dataset + '_' + labels[type_num] + '_run_number_' + str(run + 1)
-                    save_composer_history(experiment_path, name_of_experiment, calculated_metrics, chains, composer)
-                except Exception as ex:
-                    print(ex)
-
-                if type(metric) is list:
-                    roc_auc_metrics = calculated_metrics[0]
-                    complexity_metrics = calculated_metrics[1]
-                else:
-                    roc_auc_metrics = calculated_metrics
-
-                if visualize_pareto:
-                    archive_len = len(composer.history.archive_history)
-                    pareto_front = composer.history.archive_history[archive_len - 1]
-                    quality_list = extract_quality_list(task=task, pop=pareto_front)
-                    complexity_list = [ind.fitness.values[1] for ind in pareto_front]
-
-                    pareto_fronts_metrics.append([quality_list, complexity_list])
-
-                if type(metric) is list:
-                    historical_quality = [
-                        extract_quality_list(task=task, pop=pop) + extract_quality_list(task=task, pop=
-                        composer.history.archive_history[i]) for i, pop in enumerate(composer.history.individuals)]
-                    history_quality_gp[type_num].append(historical_quality)
-                else:
-                    historical_quality = [extract_quality_list(task=task, pop=pop) for pop in
-                                          composer.history.individuals]
-                    history_quality_gp[type_num].append(historical_quality)
-
-                for i, roc_auc in enumerate(roc_auc_metrics):
-                    if type(metric) is list:
-                        compl = complexity_metrics[i]
-                    else:
-                        compl = MetricsRepository().metric_by_id(ComplexityMetricsEnum.computation_time)(chains[i])
-
-                    add_result_to_csv(file_path_best, time_amount, is_regular, round(roc_auc, 4),
-                                      len(chains[i].nodes),
-                                      chains[i].depth, exp_type=labels[type_num], iteration=run,
-                                      complexity=compl, exp_number=type_num)
-                try:
-                    experiment_path = f'D:\результаты экспериментов\{name_of_dataset}'
-                    if not os.path.isdir(experiment_path):
-                        os.makedirs(experiment_path)
-                    name_of_experiment = name_of_dataset + '_' + labels[type_num] + '_run_number_' + str(run)
-                    save_composer_history(experiment_path, name_of_experiment, history_quality_gp, inds_history_gp,
-                                          history_save_flag=True)
-
-                except Exception as ex:
-                    print(ex)
-
+                is_multi_obj[type_num] = type(metric) is list
+                history_log = os.path.join(history_dir, f'{name_of_dataset}_{labels[type_num]}_{n}_history.jsonl')
+                history_logs[type_num].append(history_log)
+                experiments.append({'type_num': type_num, 'run': run, 'time_amount': time_amount, 'metric': metric,
+                                    'label': labels[type_num], 'scheme_type': scheme_type,
+                                    'selection_type': selection_types[type_num], 'crossover_types': crossover_types,
+                                    'mutation_types': mutation_types, 'regular_type': regular_type,
+                                    'with_auto_depth_configuration': depth_config[type_num],
+                                    'max_depth': max_depths[type_num], 'start_depth': start_depth[type_num],
+                                    'pop_size': pop_sizes[type_num], 'iterations': iterations, 'task': task,
+                                    'train_path': full_path_train, 'test_path': full_path_test,
+                                    'name_of_dataset': name_of_dataset, 'history_log': history_log})
         time_amount += step
 
+    # the runs are streamed back from the workers, which are replaced to free the memory leaked by the composer
+    pool = RecyclingWorkerPool(run_multi_obj_run, n_workers=n_workers, max_tasks_per_worker=max_tasks_per_worker,
+                               max_rss_mb=max_rss_mb)
+    is_regular = regular_type == RegularizationTypesEnum.decremental
+    for experiment, result in zip(experiments, pool.imap(experiments)):
+        type_num = experiment['type_num']
+        for chain in result['chains']:
+            add_result_to_csv(file_path_best, experiment['time_amount'], is_regular, round(chain['quality'], 4),
+                              chain['n_models'], chain['depth'], exp_type=labels[type_num],
+                              iteration=experiment['run'], complexity=chain['complexity'], exp_number=type_num)
+    # the runs that have failed to write their logs are left out of the analyses
+    history_logs = [[history_log for history_log in exp_logs if os.path.exists(history_log)]
+                    for exp_logs in history_logs]
+
+    # the columns of all the runs of the experiment are memory-mapped by the later analyses
+    for type_num, label in enumerate(labels):
+        export_history_columns(history_columns_dir(name_of_dataset, label, history_dir),
+                               ((run, read_history_log(history_log))
+                                for run, history_log in enumerate(history_logs[type_num], start=1)))
+
     if runs > 1:
         quality_label = 'ROC-AUC' if task.task_type == TaskTypesEnum.classification else 'RMSE'
         xy_labels = ('Generation, #', f'Best {quality_label}')
+        history_quality_gp = [[quality_history(history_log, task, with_archive=is_multi_obj[type_num])
+                               for history_log in history_logs[type_num]] for type_num in range(len(labels))]
         results_preprocess_and_quality_visualisation(history_gp=history_quality_gp, labels=labels,
                                                      iterations=iterations, name_of_dataset=name_of_dataset, task=task,
                                                      xy_labels=xy_labels)
     if visualize_pareto:
+        pareto_fronts_metrics = [last_pareto_front(history_log, task) for exp_logs in history_logs
+                                 for history_log in exp_logs]
         if runs == 1:
             pareto_metrics = pareto_fronts_metrics
         else:
@@ -191,8 +210,10 @@ def run_multi_obj_exp(selection_types, history_file='history.csv', labels=None,
         except Exception as ex:
             print(ex)
     if visualize_hv:
-        viz_hv_comparison(labels=labels, all_history_report=all_history, name_of_dataset=name_of_dataset,
-                          iterations=iterations)
+        archive_fitness = [[archive_fitness_history(history_log) for history_log in exp_logs]
+                           for exp_logs in history_logs]
+        viz_hv_by_archive_fitness(labels=labels, archive_fitness=archive_fitness, name_of_dataset=name_of_dataset,
+                                  iterations=iterations)
 
 
 def exp_self_config_vs_fix_params(train_path: str,
@@ -16,7 +16,9 @@ name_of_dataset = 'dis'
 # task = Task(TaskTypesEnum.regression)
 task = Task(TaskTypesEnum.classification)
 
-report = PMLB_report(labels=labels, runs=4, datasets=[name_of_dataset], task=task)
+# the histories are loaded once for all the reports, their summaries are kept in the cache directory
+report = PMLB_report(labels=labels, runs=4, datasets=[name_of_dataset], task=task,
+                     summary_cache_dir='saved_exp_summaries')
 
 # Hypervolume variability visualize
 chart_labels = ('GPComp@Free with NSGA2 selection', 'GPComp@Free with SPEA2 selection')
@@ -137,20 +137,23 @@ def viz_pareto_fronts_comparison(fronts, labels, objectives_order=(1, 0),
 
 def viz_hv_comparison(labels, iterations, all_history_report, name_of_dataset='None',
                       color_pallete=sns.color_palette("husl", 8), task: Task = Task(TaskTypesEnum.classification)):
-    all_history_report_transformed = [
-        [[front.items for front in comp_run.history.archive_history] for comp_run in hist] for hist in
-        all_history_report]
-    fitness_history_gp = [[[[[1 + it.fitness.values[0], it.fitness.values[1]] for it in front.items] for front in
-                            comp_run.history.archive_history] for comp_run in hist] for hist in all_history_report]
+    archive_fitness = [[[[list(it.fitness.values) for it in front.items] for front in
+                         comp_run.history.archive_history] for comp_run in hist] for hist in all_history_report]
+    viz_hv_by_archive_fitness(labels=labels, iterations=iterations, archive_fitness=archive_fitness,
+                              name_of_dataset=name_of_dataset, color_pallete=color_pallete, task=task)
 
-    inds_history_gp = all_history_report_transformed
 
+def viz_hv_by_archive_fitness(labels, iterations, archive_fitness, name_of_dataset='None',
+                              color_pallete=sns.color_palette("husl", 8),
+                              task: Task = Task(TaskTypesEnum.classification)):
+    """The archive fitness is the list of the fitness vectors by the generations of every run of every experiment."""
     ref = [[], []]
-    for exp_history in inds_history_gp:
+    for exp_history in archive_fitness:
         max_qual, max_compl = [], []
         for run_history in exp_history:
-            all_objectives = objectives_transform(run_history, objectives_numbers=(0, 1),
-                                                  transform_from_minimization=True)
+            all_objectives = np.array([fitness[:2] for front in run_history for fitness in front]).T
+            # the same transformation from the minimization as in objectives_transform
+            all_objectives = [obj_values if obj_values[0] > 0 else 1 + obj_values for obj_values in all_objectives]
             max_qual.append(max(all_objectives[0]) + 0.0001)
             max_compl.append(max(all_objectives[1]) + 0.0001)
         ref[0].append(max(max_qual))
@@ -158,11 +161,12 @@ def viz_hv_comparison(labels, iterations, all_history_report, name_of_dataset='N
     ref_point = (max(ref[0]), max(ref[1]))
 
     hv_set = []
-    for exp_num, exp_history in enumerate(fitness_history_gp):
+    for exp_num, exp_history in enumerate(archive_fitness):
         hv_set.append([])
         for run_num, run_history in enumerate(exp_history):
             hv_set[exp_num].append(
-                [hypervolume(pop).compute(ref_point) for pop in fitness_history_gp[exp_num][run_num]])
+                [hypervolume([[1 + fitness[0], fitness[1]] for fitness in front]).compute(ref_point)
+                 for front in run_history])
 
     show_history_optimization_comparison(optimisers_fitness_history=hv_set,
                                          iterations=[_ for _ in range(iterations)],
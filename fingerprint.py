@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+from typing import List, Optional
+
+import pkg_resources
+
+from benchmark_model_types import BenchmarkModelTypesEnum
+
+# the stored results of the older harness are not reused after a change of the strategies which affects them
+FINGERPRINT_VERSION = 1
+
+# the package of the framework and the section of its hyperparameters in the benchmark config
+FRAMEWORK_PACKAGES = {
+    BenchmarkModelTypesEnum.tpot: ('tpot', 'TPOT'),
+    BenchmarkModelTypesEnum.fedot: ('fedot', 'FEDOT'),
+    BenchmarkModelTypesEnum.h2o: ('h2o', 'H2O'),
+    BenchmarkModelTypesEnum.autokeras: ('autokeras', 'autokeras'),
+    BenchmarkModelTypesEnum.baseline: ('xgboost', None)
+}
+
+_file_digests = {}
+
+
+def file_digest(file_path: str) -> str:
+    """Returns the sha1 of the file content, the digest is recomputed only if the file is modified."""
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _file_digests:
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(2 ** 20), b''):
+                digest.update(chunk)
+        _file_digests[key] = digest.hexdigest()
+    return _file_digests[key]
+
+
+def framework_version(model_type: BenchmarkModelTypesEnum) -> str:
+    package_name, _ = FRAMEWORK_PACKAGES[model_type]
+    try:
+        return pkg_resources.get_distribution(package_name).version
+    except pkg_resources.DistributionNotFound:
+        return 'unknown'
+
+
+def unit_fingerprint(model_type: BenchmarkModelTypesEnum, train_file: str, test_file: str, target_name: str,
+                     task: str, metric_list: List[str], hyperparameters: Optional[dict], seed: Optional[int],
+                     n_cores: Optional[int] = None, cpu_budget_secs: Optional[float] = None) -> str:
+    """
+    Identifies the run of the framework by everything its result depends on: the content of the data files,
+    the version and the config of the framework, the seed, the metrics and the compute allotment.
+    """
+    _, config_name = FRAMEWORK_PACKAGES[model_type]
+    unit = {'version': FINGERPRINT_VERSION,
+            'train': file_digest(train_file), 'test': file_digest(test_file), 'target': target_name, 'task': task,
+            'framework': model_type.name, 'framework_version': framework_version(model_type),
+            'config': (hyperparameters or {}).get(config_name) if config_name else None,
+            'seed': seed, 'metrics': sorted(metric_list), 'n_cores': n_cores, 'cpu_budget_secs': cpu_budget_secs}
+    return hashlib.sha1(json.dumps(unit, sort_keys=True, default=str).encode()).hexdigest()
@@ -0,0 +1,185 @@
+"""
+Benchmark of the harness itself: CaseExecutor, the result files and the campaign runner drive
+the instant mock strategies over the synthetic datasets of growing size, so all the measured time,
+CPU and memory belong to the harness. Run it before and after the change and compare the reports:
+
+    python harness_benchmark.py --sizes 1000 100000 --output before.json
+    python harness_benchmark.py --sizes 1000 100000 --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmark_model_types import BenchmarkModelTypesEnum
+from benchmark_utils import convert_json_stats_to_csv, save_metrics_result_file
+from campaign import CampaignDataset, CampaignUnit, cpu_time, run_campaign_unit
+from executor import CaseExecutor, ExecutionParams
+from fedot.core.repository.tasks import TaskTypesEnum
+from instrumentation import DATA_LOADING, FITTING, METRICS, PREDICTION, MemoryMonitor, timed_phase
+from results_store import ResultsStore
+from scheduler import CampaignScheduler, RuntimeHistory
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+HARNESS_BENCHMARK_DIR = 'harness_benchmark'
+
+
+def run_mock_strategy(params: 'ExecutionParams'):
+    """Reloads the csv-files as the real strategies do and predicts with the fixed logistic of the first feature."""
+    with timed_phase(DATA_LOADING):
+        train_data = pd.read_csv(params.train_file, index_col=0)
+        test_data = pd.read_csv(params.test_file, index_col=0)
+
+    with timed_phase(FITTING):
+        prior = train_data[params.target_name].mean()
+
+    with timed_phase(PREDICTION):
+        predicted = 1 / (1 + np.exp(-test_data.iloc[:, 0].values))
+        predicted_labels = (predicted > 1 - prior).astype(int)
+
+    return test_data[params.target_name].values, predicted, predicted_labels
+
+
+class MockCaseExecutor(CaseExecutor):
+    _strategy_by_type = {model_type: run_mock_strategy for model_type in BenchmarkModelTypesEnum}
+
+
+def make_synthetic_dataset(n_rows: int, n_features: int, directory: str, seed: int = 1) -> CampaignDataset:
+    """Writes the binary classification dataset with n_rows in the train split and a quarter of it in the test one."""
+    train_file = os.path.join(directory, f'synthetic_{n_rows}_train.csv')
+    test_file = os.path.join(directory, f'synthetic_{n_rows}_test.csv')
+    if not (os.path.exists(train_file) and os.path.exists(test_file)):
+        os.makedirs(directory, exist_ok=True)
+        rng = np.random.RandomState(seed)
+        for file_path, size in ((train_file, n_rows), (test_file, max(n_rows // 4, 100))):
+            features = rng.randn(size, n_features)
+            dataframe = pd.DataFrame(features, columns=[f'feature_{num}' for num in range(n_features)])
+            dataframe['target'] = (features[:, 0] + rng.randn(size) > 0).astype(int)
+            dataframe.to_csv(file_path, float_format='%.4f')
+    return CampaignDataset(name=f'synthetic_{n_rows}', train_file=train_file, test_file=test_file,
+                           task=TaskTypesEnum.classification, metric_list=['roc_auc', 'f1'],
+                           n_rows=n_rows, n_features=n_features)
+
+
+@contextmanager
+def _working_directory(directory: str):
+    # the result files of the harness are written to the current directory
+    previous_directory = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(previous_directory)
+
+
+def _measure(func: Callable, repeats: int) -> Tuple[object, dict]:
+    """Runs the function several times and returns its last result with the median time and the peak memory."""
+    walls, cpus, peaks = [], [], []
+    result = None
+    for _ in range(repeats):
+        start_cpu, start_wall = cpu_time(), time.perf_counter()
+        with MemoryMonitor(interval_secs=0.05) as memory_monitor:
+            result = func()
+        walls.append(time.perf_counter() - start_wall)
+        cpus.append(cpu_time() - start_cpu)
+        peaks.append(memory_monitor.peak_rss_mb)
+    return result, {'wall_secs': round(float(np.median(walls)), 4),
+                    'cpu_secs': round(float(np.median(cpus)), 4),
+                    'peak_rss_mb': round(max(peaks), 1)}
+
+
+def _execute_mock_case(dataset: CampaignDataset, models: List[BenchmarkModelTypesEnum]) -> dict:
+    executor = MockCaseExecutor(params=ExecutionParams(train_file=dataset.train_file,
+                                                       test_file=dataset.test_file,
+                                                       task=dataset.task,
+                                                       target_name='target',
+                                                       case_label=dataset.case_label),
+                                models=models, metric_list=dataset.metric_list)
+    return executor.execute()
+
+
+def _run_mock_unit(campaign_datasets: dict, unit: CampaignUnit) -> dict:
+    return run_campaign_unit(campaign_datasets[unit.dataset], BenchmarkModelTypesEnum[unit.framework],
+                             seed=unit.seed, executor_class=MockCaseExecutor)
+
+
+def benchmark_harness(sizes: List[int] = None, n_features: int = 10, repeats: int = 3, n_workers: int = 2,
+                      directory: str = HARNESS_BENCHMARK_DIR) -> pd.DataFrame:
+    """Measures the latency, throughput and peak memory of every harness stage on every dataset size."""
+    models = list(BenchmarkModelTypesEnum)
+    os.makedirs(directory, exist_ok=True)
+    records = []
+    with _working_directory(directory):
+        for n_rows in sizes or DEFAULT_SIZES:
+            print(f'Harness benchmark on {n_rows} rows')
+            dataset = make_synthetic_dataset(n_rows, n_features, 'data')
+            # every repeat gets the fresh params, so all of them resolve the budget
+            result, case_stats = _measure(partial(_execute_mock_case, dataset, models), repeats)
+            # the time of the mock strategies is the harness overhead of the data reloading and the metrics
+            for phase_name in (DATA_LOADING, METRICS):
+                case_stats[f'{phase_name}_secs'] = round(sum(result[f'{model_type.name}_timings']['phases']
+                                                             [phase_name]['wall_secs'] for model_type in models), 4)
+            _, save_stats = _measure(partial(save_metrics_result_file, result,
+                                             file_name=f'penn_ml_metrics_for_{dataset.name}'), repeats)
+            _, convert_stats = _measure(partial(convert_json_stats_to_csv, [dataset.name]), repeats)
+            store = ResultsStore('harness_results.sqlite')
+            _, store_write_stats = _measure(partial(store.add_case_result, result, dataset.name), repeats)
+            _, store_export_stats = _measure(partial(store.export_csv, 'harness_combined.csv'), repeats)
+            store.close()
+
+            units = [CampaignUnit(dataset=dataset.name, framework=model_type.name) for model_type in models]
+            scheduler = CampaignScheduler(partial(_run_mock_unit, {dataset.name: dataset}),
+                                          {unit: (n_rows, n_features) for unit in units}, n_workers=n_workers,
+                                          history=RuntimeHistory('harness_runtime_history.json'),
+                                          status_file='harness_campaign_status.json')
+            _, campaign_stats = _measure(partial(scheduler.run, units), repeats)
+
+            for stage, stats in (('case', case_stats), ('save_json', save_stats),
+                                 ('convert_json_stats_to_csv', convert_stats), ('store_write', store_write_stats),
+                                 ('store_export_csv', store_export_stats), ('campaign', campaign_stats)):
+                records.append(dict(n_rows=n_rows, stage=stage,
+                                    rows_per_sec=round(n_rows / stats['wall_secs']) if stats['wall_secs'] else None,
+                                    **stats))
+
+    return pd.DataFrame(records)
+
+
+def compare_reports(before: pd.DataFrame, after: pd.DataFrame, tolerance: float = 0.1) -> pd.DataFrame:
+    """Joins two reports by the dataset size and the stage and flags the stages slower by more than the tolerance."""
+    comparison = before.merge(after, on=['n_rows', 'stage'], suffixes=('_before', '_after'))
+    for column in ('wall_secs', 'cpu_secs', 'peak_rss_mb'):
+        comparison[f'{column}_ratio'] = (comparison[f'{column}_after'] / comparison[f'{column}_before']).round(3)
+    comparison['regression'] = comparison['wall_secs_ratio'] > 1 + tolerance
+    return comparison[['n_rows', 'stage', 'wall_secs_before', 'wall_secs_after', 'wall_secs_ratio',
+                       'cpu_secs_ratio', 'peak_rss_mb_ratio', 'regression']]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the harness overhead with the mock frameworks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='rows in the train split')
+    parser.add_argument('--features', type=int, default=10, help='number of the synthetic features')
+    parser.add_argument('--repeats', type=int, default=3, help='runs of every stage, the median time is reported')
+    parser.add_argument('--workers', type=int, default=2, help='worker processes of the campaign stage')
+    parser.add_argument('--output', default='harness_benchmark.json', help='file for the report')
+    parser.add_argument('--compare', help='report of the previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative slowdown reported as regression')
+    args = parser.parse_args()
+
+    report = benchmark_harness(args.sizes, args.features, args.repeats, args.workers)
+    print(report.to_string(index=False))
+    with open(args.output, 'w') as file:
+        json.dump(report.to_dict(orient='records'), file, indent=4)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            previous_report = pd.DataFrame(json.load(file))
+        comparison = compare_reports(previous_report, report, args.tolerance)
+        print(comparison.to_string(index=False))
+        if comparison['regression'].any():
+            print('Harness regression detected')
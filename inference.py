@@ -0,0 +1,65 @@
+import os
+import pickle
+import time
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+INFERENCE_BATCH_SIZES = (10, 100, 1000, 10000)
+
+
+def _path_size_mb(path: str) -> float:
+    if os.path.isdir(path):
+        size = sum(os.path.getsize(os.path.join(root, file_name))
+                   for root, _, file_names in os.walk(path) for file_name in file_names)
+    else:
+        size = os.path.getsize(path)
+    return size / 2 ** 20
+
+
+def _timed_secs(func: Callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_inference(predict_func: Callable[[np.ndarray], object], features: np.ndarray, model=None,
+                        model_file: Optional[str] = None, load_func: Callable[[str], object] = None,
+                        batch_sizes: Sequence[int] = INFERENCE_BATCH_SIZES, n_single_rows: int = 200,
+                        n_batch_repeats: int = 3) -> dict:
+    """
+    Measures the single-row latency percentiles and the batch throughput of the fitted model on the test features,
+    the load time and the size of the exported model file or of the pickled model if there is no file.
+    """
+    features = np.asarray(features)
+    # the first calls warm the caches and the lazy initialisation of the frameworks up
+    for _ in range(3):
+        predict_func(features[:1])
+
+    row_nums = np.random.RandomState(0).randint(0, len(features), n_single_rows)
+    latencies_ms = [_timed_secs(predict_func, features[row_num:row_num + 1]) * 1000 for row_num in row_nums]
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        # the test features are repeated to fill the batches larger than the test split
+        batch = features[np.arange(batch_size) % len(features)]
+        batch_secs = np.median([_timed_secs(predict_func, batch) for _ in range(n_batch_repeats)])
+        throughput[str(batch_size)] = round(float(batch_size / batch_secs), 1)
+
+    model_size_mb, load_secs = None, None
+    if model_file is not None and load_func is not None:
+        model_size_mb = _path_size_mb(model_file)
+        load_secs = _timed_secs(load_func, model_file)
+    elif model is not None:
+        try:
+            serialised_model = pickle.dumps(model)
+            model_size_mb = len(serialised_model) / 2 ** 20
+            load_secs = _timed_secs(pickle.loads, serialised_model)
+        except (pickle.PicklingError, TypeError, AttributeError) as ex:
+            print(f'Model can not be pickled to measure its size: {ex}')
+
+    return {'latency_ms': {'p50': round(float(p50), 3), 'p95': round(float(p95), 3), 'p99': round(float(p99), 3)},
+            'throughput_rows_per_sec': throughput,
+            'model_load_secs': None if load_secs is None else round(load_secs, 4),
+            'model_size_mb': None if model_size_mb is None else round(model_size_mb, 3)}
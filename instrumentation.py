@@ -0,0 +1,169 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import psutil
+
+from inference import benchmark_inference
+
+DATA_LOADING = 'data_loading'
+FITTING = 'fitting'
+MODEL_EXPORT = 'model_export'
+MODEL_LOADING = 'model_loading'
+PREDICTION = 'prediction'
+METRICS = 'metrics'
+INFERENCE_BENCHMARK = 'inference_benchmark'
+
+
+class PhaseHook:
+    """Base class of the phase hooks. Subclass it to attach profilers or loggers to the strategy phases."""
+
+    def on_phase_start(self, phase_name: str):
+        pass
+
+    def on_phase_end(self, phase_name: str, timing: Dict[str, float]):
+        pass
+
+
+class PhaseRecorder:
+    """Accumulates the wall and CPU time of the phases of a single strategy run."""
+
+    def __init__(self, measure_inference: bool = False):
+        self.phases = {}
+        self.measure_inference = measure_inference
+        self.inference = None
+        # the [elapsed_secs, score] pairs of the candidates evaluated by the framework during the search
+        self.anytime_evaluations = None
+        self.anytime_budget_secs = None
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    def add(self, phase_name: str, timing: Dict[str, float]):
+        phase = self.phases.setdefault(phase_name, {'wall_secs': 0.0, 'cpu_secs': 0.0})
+        phase['wall_secs'] += timing['wall_secs']
+        phase['cpu_secs'] += timing['cpu_secs']
+
+    def summary(self) -> dict:
+        return {'phases': {phase_name: {key: round(value, 4) for key, value in phase.items()}
+                           for phase_name, phase in self.phases.items()},
+                'wall_secs': round(time.perf_counter() - self.start_wall, 4),
+                'cpu_secs': round(time.process_time() - self.start_cpu, 4),
+                'time_to_predict_secs': round(self.phases.get(PREDICTION, {}).get('wall_secs', 0.0), 4)}
+
+
+_phase_hooks: List[PhaseHook] = []
+_current_recorder: Optional[PhaseRecorder] = None
+
+
+def register_phase_hook(hook: PhaseHook):
+    _phase_hooks.append(hook)
+
+
+def unregister_phase_hook(hook: PhaseHook):
+    _phase_hooks.remove(hook)
+
+
+def report_anytime_evaluations(evaluations: List[List[float]], budget_secs: float):
+    """Passes the scores of the candidates over the search time (higher is better) to the current recorder."""
+    if _current_recorder is not None:
+        _current_recorder.anytime_evaluations = evaluations
+        _current_recorder.anytime_budget_secs = budget_secs
+
+
+def report_fitted_model(predict_func: Callable[[np.ndarray], object], features: np.ndarray, model=None,
+                        model_file: Optional[str] = None, load_func: Callable[[str], object] = None):
+    """
+    Benchmarks the inference of the fitted model right away if the current recorder asks for it,
+    so the frameworks with the servers (e.g. H2O) are measured before the shutdown.
+    """
+    if _current_recorder is None or not _current_recorder.measure_inference:
+        return
+    with timed_phase(INFERENCE_BENCHMARK):
+        _current_recorder.inference = benchmark_inference(predict_func, features, model=model,
+                                                          model_file=model_file, load_func=load_func)
+
+
+@contextmanager
+def timed_phase(phase_name: str):
+    """Times the phase with the monotonic clock and the CPU time of the process."""
+    for hook in _phase_hooks:
+        hook.on_phase_start(phase_name)
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        timing = {'wall_secs': time.perf_counter() - start_wall,
+                  'cpu_secs': time.process_time() - start_cpu}
+        if _current_recorder is not None:
+            _current_recorder.add(phase_name, timing)
+        for hook in _phase_hooks:
+            hook.on_phase_end(phase_name, timing)
+
+
+@contextmanager
+def recording_phases(measure_inference: bool = False):
+    """Collects the phases timed inside the block into the yielded recorder."""
+    global _current_recorder
+    previous_recorder = _current_recorder
+    _current_recorder = PhaseRecorder(measure_inference)
+    try:
+        yield _current_recorder
+    finally:
+        _current_recorder = previous_recorder
+
+
+class MemoryMonitor:
+    """
+    Samples the resident memory of the process and all its children (e.g. the H2O JVM or the TPOT workers)
+    in the background thread. Use it as the context manager around the monitored code.
+    """
+
+    def __init__(self, interval_secs: float = 1.0, on_sample: Callable[[float], None] = None):
+        self.interval_secs = interval_secs
+        self.on_sample = on_sample
+        self.timeline = []
+        self.peak_rss_mb = 0.0
+        self._process = psutil.Process()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._start_time = None
+
+    def _total_rss_mb(self) -> float:
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                # the child has exited between the listing and the sampling
+                pass
+        return rss / 2 ** 20
+
+    def _sample(self):
+        rss_mb = self._total_rss_mb()
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        self.timeline.append([round(time.perf_counter() - self._start_time, 2), round(rss_mb, 1)])
+        if self.on_sample:
+            self.on_sample(rss_mb)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_secs):
+            self._sample()
+
+    def __enter__(self):
+        self._start_time = time.perf_counter()
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop_event.set()
+        self._thread.join()
+        self._sample()
+
+    def summary(self) -> dict:
+        return {'peak_rss_mb': round(self.peak_rss_mb, 1),
+                'interval_secs': self.interval_secs,
+                'timeline': self.timeline}
@@ -0,0 +1,180 @@
+import argparse
+from collections import defaultdict
+from itertools import combinations
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from metrics_direction import LOWER_IS_BETTER_METRICS
+from results_store import RESULTS_DB_FILE, ResultsStore
+
+# the first of the metrics computed for the dataset ranks the frameworks on it
+LEADERBOARD_METRICS = ['roc_auc', 'balanced_accuracy', 'r2', 'mse']
+
+TABLE_COLUMNS = ['framework', 'average_rank', 'n_datasets', 'wins', 'ties', 'losses', 'normalised_score',
+                 'failure_rate']
+
+
+class Leaderboard:
+    """
+    Ranks of the frameworks over the campaign updated by every new result. Only the dataset of the result
+    is re-ranked: its old contribution to the average ranks, the win/tie/loss counts and the normalised scores
+    is subtracted and the new one is added, so the update costs the same for ten and for ten thousand results.
+    The score of the framework on the dataset is its metric averaged over the seeds, the failed runs
+    rank below all the others.
+    """
+
+    def __init__(self, metric_names: Sequence[str] = LEADERBOARD_METRICS, baseline: str = 'baseline',
+                 tie_tolerance: float = 1e-6):
+        self.metric_names = list(metric_names)
+        self.baseline = baseline
+        self.tie_tolerance = tie_tolerance
+        # dataset -> framework -> [sum of the oriented metric, number of the values, number of the failures]
+        self._scores = defaultdict(dict)
+        self._contributions = {}
+        self._rank_sums = defaultdict(float)
+        self._n_datasets = defaultdict(int)
+        self._outcomes = defaultdict(lambda: np.zeros(3, dtype=int))
+        self._normalised_sums = defaultdict(float)
+        self._n_normalised = defaultdict(int)
+        self._n_runs = defaultdict(int)
+        self._n_failures = defaultdict(int)
+        self._last_run_id = 0
+
+    def _oriented_score(self, metrics: Optional[dict]) -> Optional[float]:
+        for metric_name in self.metric_names:
+            if metrics and metrics.get(metric_name) is not None:
+                value = metrics[metric_name]
+                return -value if metric_name in LOWER_IS_BETTER_METRICS else value
+        return None
+
+    def _add_score(self, dataset: str, framework: str, metrics: Optional[dict]):
+        score = self._oriented_score(metrics)
+        totals = self._scores[dataset].setdefault(framework, [0.0, 0, 0])
+        self._n_runs[framework] += 1
+        if score is None:
+            totals[2] += 1
+            self._n_failures[framework] += 1
+        else:
+            totals[0] += score
+            totals[1] += 1
+
+    def add(self, dataset: str, framework: str, metrics: Optional[dict]):
+        self._add_score(dataset, framework, metrics)
+        self._update_dataset(dataset)
+
+    def add_unit_result(self, unit_result: dict):
+        if (unit_result.get('fidelity') or 1) < 1:
+            return
+        self.add(unit_result['dataset'], unit_result['framework'], unit_result.get('metrics'))
+
+    def _dataset_contribution(self, dataset: str) -> dict:
+        scores = {framework: totals[0] / totals[1] if totals[1] else float('-inf')
+                  for framework, totals in self._scores[dataset].items()}
+        frameworks = list(scores)
+        values = np.array([scores[framework] for framework in frameworks])
+        # the rank is one plus the number of the better frameworks and the half of the tied ones
+        with np.errstate(invalid='ignore'):
+            differences = values[:, None] - values[None, :]
+            failed = np.isinf(values)
+            ties = (np.abs(differences) <= self.tie_tolerance) | (failed[:, None] & failed[None, :])
+        better = (differences < 0) & ~ties
+        ranks = 1 + better.sum(axis=1) + (ties.sum(axis=1) - 1) / 2
+
+        outcomes = {}
+        for first, second in combinations(range(len(frameworks)), 2):
+            outcome = np.array([0, 1, 0]) if ties[first, second] else \
+                np.array([1, 0, 0]) if differences[first, second] > 0 else np.array([0, 0, 1])
+            outcomes[(frameworks[first], frameworks[second])] = outcome
+            outcomes[(frameworks[second], frameworks[first])] = outcome[::-1]
+
+        normalised = {}
+        baseline_score = scores.get(self.baseline)
+        if baseline_score is not None and np.isfinite(baseline_score) and baseline_score != 0:
+            normalised = {framework: (score - baseline_score) / abs(baseline_score)
+                          for framework, score in scores.items() if np.isfinite(score)}
+        return {'ranks': dict(zip(frameworks, ranks.tolist())), 'outcomes': outcomes, 'normalised': normalised}
+
+    def _apply(self, contribution: dict, sign: int):
+        for framework, rank in contribution['ranks'].items():
+            self._rank_sums[framework] += sign * rank
+            self._n_datasets[framework] += sign
+        for pair, outcome in contribution['outcomes'].items():
+            self._outcomes[pair] += sign * outcome
+        for framework, score in contribution['normalised'].items():
+            self._normalised_sums[framework] += sign * score
+            self._n_normalised[framework] += sign
+
+    def _update_dataset(self, dataset: str):
+        if dataset in self._contributions:
+            self._apply(self._contributions[dataset], -1)
+        self._contributions[dataset] = self._dataset_contribution(dataset)
+        self._apply(self._contributions[dataset], 1)
+
+    def refresh(self, store: ResultsStore, campaign: Optional[str] = None):
+        """Adds the runs written to the store since the previous refresh."""
+        runs = store.runs(campaign, since_run_id=self._last_run_id, full_fidelity=True)
+        if runs.empty:
+            return
+        metrics_by_run = defaultdict(dict)
+        for metric_name in self.metric_names:
+            values = store.metric_values(metric_name, campaign, since_run_id=self._last_run_id, full_fidelity=True)
+            for run_id, value in zip(values['run_id'], values['value']):
+                metrics_by_run[run_id][metric_name] = value
+        for run_id, dataset, framework in zip(runs['run_id'], runs['dataset'], runs['framework']):
+            self._add_score(dataset, framework, metrics_by_run.get(run_id))
+        # every dataset is re-ranked once however many of its runs have been added
+        for dataset in set(runs['dataset']):
+            self._update_dataset(dataset)
+        self._last_run_id = int(runs['run_id'].max())
+
+    def frameworks(self) -> List[str]:
+        return sorted(framework for framework, n_datasets in self._n_datasets.items() if n_datasets)
+
+    def table(self) -> pd.DataFrame:
+        """Returns the average rank, the total wins, ties and losses and the mean normalised score by framework."""
+        records = []
+        for framework in self.frameworks():
+            outcomes = sum((outcome for (first, _), outcome in self._outcomes.items() if first == framework),
+                           np.zeros(3, dtype=int))
+            records.append({'framework': framework,
+                            'average_rank': self._rank_sums[framework] / self._n_datasets[framework],
+                            'n_datasets': self._n_datasets[framework],
+                            'wins': outcomes[0], 'ties': outcomes[1], 'losses': outcomes[2],
+                            'normalised_score': self._normalised_sums[framework] / self._n_normalised[framework]
+                            if self._n_normalised[framework] else None,
+                            'failure_rate': self._n_failures[framework] / self._n_runs[framework]})
+        # the leaderboard without the results has the columns and no rows
+        return pd.DataFrame(records, columns=TABLE_COLUMNS).sort_values('average_rank').reset_index(drop=True)
+
+    def dataset_ranks(self) -> pd.DataFrame:
+        """Returns the rank of every framework (columns) on every dataset (rows)."""
+        return pd.DataFrame({dataset: contribution['ranks']
+                             for dataset, contribution in self._contributions.items()}).T.sort_index()
+
+    def win_tie_loss(self) -> pd.DataFrame:
+        """Returns the 'wins/ties/losses' of the framework in the row against the framework in the column."""
+        frameworks = self.frameworks()
+        matrix = pd.DataFrame('', index=frameworks, columns=frameworks)
+        for (first, second), outcome in self._outcomes.items():
+            if first in matrix.index and second in matrix.columns and outcome.any():
+                matrix.loc[first, second] = '/'.join(str(count) for count in outcome)
+        return matrix
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Leaderboard of the campaign from the results database')
+    parser.add_argument('--db', default=RESULTS_DB_FILE, help='results database file')
+    parser.add_argument('--campaign', help='name of the campaign, all the campaigns by default')
+    parser.add_argument('--metrics', nargs='+', default=LEADERBOARD_METRICS,
+                        help='metrics to rank by, the first one computed for the dataset is used')
+    args = parser.parse_args()
+
+    leaderboard = Leaderboard(args.metrics)
+    leaderboard.refresh(ResultsStore(args.db), args.campaign)
+    if not leaderboard.frameworks():
+        print(f'No results of the campaign {args.campaign}' if args.campaign else 'No results')
+    else:
+        print(leaderboard.table().to_string(index=False))
+        print(leaderboard.win_tie_loss())
@@ -0,0 +1,3 @@
+# the metrics ranked in the ascending order, the rest of the metrics are better when higher;
+# the module has no dependencies, so the reports import it without the frameworks of the executor
+LOWER_IS_BETTER_METRICS = ['mse']
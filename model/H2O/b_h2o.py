@@ -4,14 +4,85 @@ Link to download: https://www.oracle.com/java/technologies/javase-jdk8-downloads
 """
 
 import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
 
 import h2o
+import numpy as np
+from h2o.automl import H2OAutoML
 
-from benchmark_utils import (get_h2o_connect_config, get_models_hyperparameters)
+from anytime import load_evaluations, save_evaluations
+from benchmark_utils import get_h2o_connect_config
 from fedot.core.data.data import InputData
-from fedot.core.models.evaluation.automl_eval import fit_h2o, predict_h2o
+from fedot.core.models.evaluation.automl_eval import predict_h2o
+from fedot.core.repository.tasks import Task, TaskTypesEnum
+from event_log import emit
+from instrumentation import DATA_LOADING, FITTING, MODEL_EXPORT, MODEL_LOADING, PREDICTION, \
+    report_anytime_evaluations, report_fitted_model, timed_phase
+from supervisor import heartbeat
 
 CURRENT_PATH = str(os.path.dirname(__file__))
+LOWER_IS_BETTER_H2O_METRICS = ['mean_residual_deviance', 'rmse', 'mse', 'mae', 'rmsle', 'logloss',
+                               'mean_per_class_error']
+
+
+@contextmanager
+def h2o_progress_heartbeats(interval_secs: float = 10.0):
+    """Sends the heartbeats while the progress of the cluster jobs changes, so the stuck cluster is detected."""
+    stop_event = threading.Event()
+
+    def _poll_jobs():
+        last_progress = None
+        while not stop_event.wait(interval_secs):
+            try:
+                progress = [job['progress'] for job in h2o.api('GET /3/Jobs')['jobs']]
+            except Exception as ex:
+                print(f'H2O jobs are not available: {ex}')
+                continue
+            if progress != last_progress:
+                heartbeat('h2o_progress', n_jobs=len(progress))
+                last_progress = progress
+
+    thread = threading.Thread(target=_poll_jobs, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def fit_h2o(train_data: InputData, max_models: int, max_runtime_secs: int, seed: Optional[int],
+            n_cores: Optional[int] = None) -> H2OAutoML:
+    ip, port = get_h2o_connect_config()
+    # -1 gives all the cores to the cluster
+    h2o.init(ip=ip, port=port, name='h2o_server', nthreads=n_cores or -1)
+
+    # the columns get the default names as in the frames of predict_h2o
+    frame = h2o.H2OFrame(python_obj=np.concatenate((train_data.features, train_data.target.reshape(-1, 1)), 1))
+    target_name = frame.columns[-1]
+    if train_data.task.task_type == TaskTypesEnum.classification:
+        frame[target_name] = frame[target_name].asfactor()
+
+    automl = H2OAutoML(max_models=max_models, max_runtime_secs=max_runtime_secs, seed=seed)
+    with h2o_progress_heartbeats():
+        automl.train(x=frame.columns[:-1], y=target_name, training_frame=frame)
+    return automl
+
+
+def get_h2o_evaluations(automl: H2OAutoML, search_start: float) -> List[List[float]]:
+    """Returns the leaderboard scores of the models by the time they were finished since the search start."""
+    leaderboard = automl.leaderboard.as_data_frame()
+    # the leaderboard is sorted by its first metric
+    metric_name = leaderboard.columns[1]
+    sign = -1 if metric_name in LOWER_IS_BETTER_H2O_METRICS else 1
+    evaluations = []
+    for model_id, score in zip(leaderboard['model_id'], leaderboard[metric_name]):
+        end_time_ms = h2o.get_model(model_id)._model_json['output']['end_time']
+        evaluations.append([end_time_ms / 1000 - search_start, sign * score])
+    return evaluations
 
 
 def run_h2o(params: 'ExecutionParams'):
@@ -20,31 +91,56 @@ def run_h2o(params: 'ExecutionParams'):
     case_label = params.case_label
     task = params.task
 
-    config_data = get_models_hyperparameters()['H2O']
+    config_data = params.hyperparameters['H2O']
     max_models = config_data['MAX_MODELS']
     max_runtime_secs = config_data['MAX_RUNTIME_SECS']
 
     result_filename = f'{case_label}_m{max_models}_rs{max_runtime_secs}_{task.name}'
     exported_model_path = os.path.join(CURRENT_PATH, result_filename)
+    evaluations_file = f'{exported_model_path}_anytime.json'
 
     # TODO Regression
-    if result_filename not in os.listdir(CURRENT_PATH):
-        train_data = InputData.from_csv(train_file_path)
-        best_model = fit_h2o(train_data, round(max_runtime_secs / 60))
-        temp_exported_model_path = h2o.save_model(model=best_model, path=CURRENT_PATH)
-
-        os.renames(temp_exported_model_path, exported_model_path)
-
-    ip, port = get_h2o_connect_config()
-    h2o.init(ip=ip, port=port, name='h2o_server')
-
-    imported_model = h2o.load_model(exported_model_path)
-
-    test_frame = InputData.from_csv(test_file_path)
+    is_cached = result_filename in os.listdir(CURRENT_PATH)
+    emit('cache_hit' if is_cached else 'cache_miss', model='h2o', key=result_filename)
+    if not is_cached:
+        with timed_phase(DATA_LOADING):
+            train_data = InputData.from_csv(train_file_path, task=Task(task))
+        with timed_phase(FITTING):
+            search_start = time.time()
+            automl = fit_h2o(train_data, max_models, max_runtime_secs, params.seed, params.n_cores)
+            evaluations = get_h2o_evaluations(automl, search_start)
+        with timed_phase(MODEL_EXPORT):
+            temp_exported_model_path = h2o.save_model(model=automl.leader, path=CURRENT_PATH)
+
+            os.renames(temp_exported_model_path, exported_model_path)
+            save_evaluations(evaluations_file, evaluations)
+
+    evaluations = load_evaluations(evaluations_file)
+    if evaluations:
+        report_anytime_evaluations(evaluations, budget_secs=max_runtime_secs)
+
+    with timed_phase(MODEL_LOADING):
+        ip, port = get_h2o_connect_config()
+        h2o.init(ip=ip, port=port, name='h2o_server', nthreads=params.n_cores or -1)
+
+        imported_model = h2o.load_model(exported_model_path)
+
+    with timed_phase(DATA_LOADING):
+        test_frame = InputData.from_csv(test_file_path)
     true_target = test_frame.target
 
-    predicted = predict_h2o(imported_model, test_frame)
+    with timed_phase(PREDICTION):
+        predicted = predict_h2o(imported_model, test_frame)
+        if task == TaskTypesEnum.classification:
+            prediction_frame = imported_model.predict(h2o.H2OFrame(python_obj=test_frame.features))
+            predicted_labels = prediction_frame['predict'].as_data_frame().to_numpy().ravel()
+        else:
+            predicted_labels = predicted
+
+    # the served model gets the frames with the default column names as in predict_h2o
+    report_fitted_model(lambda features: imported_model.predict(h2o.H2OFrame(python_obj=features)),
+                        test_frame.features, model_file=exported_model_path, load_func=h2o.load_model)
 
     h2o.shutdown(prompt=False)
 
-    return true_target, predicted
+    return true_target, predicted, predicted_labels
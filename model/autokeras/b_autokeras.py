@@ -1,8 +1,31 @@
+import time
+
 import autokeras as ak
+import tensorflow as tf
 
-from benchmark_utils import get_models_hyperparameters
 from fedot.core.data.data import InputData
 from fedot.core.repository.tasks import TaskTypesEnum
+from instrumentation import DATA_LOADING, FITTING, PREDICTION, report_anytime_evaluations, timed_phase
+from supervisor import heartbeat
+
+
+class HeartbeatCallback(tf.keras.callbacks.Callback):
+    def on_epoch_end(self, epoch, logs=None):
+        heartbeat('autokeras_epoch', epoch=epoch)
+
+
+class TrialEvaluationsCallback(tf.keras.callbacks.Callback):
+    """Collects the validation loss of every trial by the time it was finished since the search start."""
+
+    def __init__(self, search_start: float):
+        super().__init__()
+        self.search_start = search_start
+        self.evaluations = []
+
+    def on_train_end(self, logs=None):
+        # the final fit of the best model has no validation data
+        if logs and 'val_loss' in logs:
+            self.evaluations.append([time.time() - self.search_start, -float(logs['val_loss'])])
 
 
 def run_autokeras(params: 'ExecutionParams'):
@@ -10,24 +33,50 @@ def run_autokeras(params: 'ExecutionParams'):
     test_file_path = params.test_file
     task = params.task
 
-    config_data = get_models_hyperparameters()['autokeras']
+    config_data = params.hyperparameters['autokeras']
     max_trial = config_data['MAX_TRIAL']
     epoch = config_data['EPOCH']
 
-    train_data = InputData.from_csv(train_file_path)
-    test_data = InputData.from_csv(test_file_path)
+    with timed_phase(DATA_LOADING):
+        train_data = InputData.from_csv(train_file_path)
+        test_data = InputData.from_csv(test_file_path)
 
     # TODO Save model to file
 
+    if params.n_cores:
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(params.n_cores)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError as ex:
+            # the threads can not be changed after TensorFlow has initialised its context in this process
+            print(f'TensorFlow threads are not limited: {ex}')
+
     if task == TaskTypesEnum.classification:
         estimator = ak.StructuredDataClassifier
     else:
         estimator = ak.StructuredDataRegressor
 
-    model = estimator(max_trials=max_trial)
+    model = estimator(max_trials=max_trial, seed=params.seed)
+
+    with timed_phase(FITTING):
+        search_start = time.time()
+        trial_evaluations = TrialEvaluationsCallback(search_start)
+        model.fit(train_data.features, train_data.target, epochs=epoch,
+                  callbacks=[HeartbeatCallback(), trial_evaluations])
+        search_secs = time.time() - search_start
 
-    model.fit(train_data.features, train_data.target, epochs=epoch)
+    # the search has no time budget, so the curve is normalised to the time it has taken
+    if trial_evaluations.evaluations:
+        report_anytime_evaluations(trial_evaluations.evaluations, budget_secs=search_secs)
 
-    predicted = model.predict(test_data.features)
+    with timed_phase(PREDICTION):
+        if task == TaskTypesEnum.classification:
+            # the exported keras model gives the probabilities, the classifier gives the decoded labels
+            predicted = model.export_model().predict(test_data.features)
+            predicted = predicted.ravel() if predicted.shape[1] == 1 else predicted
+            predicted_labels = model.predict(test_data.features).ravel()
+        else:
+            predicted = model.predict(test_data.features).ravel()
+            predicted_labels = predicted
 
-    return test_data.target, predicted
+    return test_data.target, predicted, predicted_labels
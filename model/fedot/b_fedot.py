@@ -1,23 +1,27 @@
 import datetime
 import os
 import random
+import time
 from pickle import dump, load
 
 import numpy as np
 from fedot.core.composer.gp_composer.gp_composer import GPComposerBuilder, GPComposerRequirements
 from fedot.core.composer.visualisation import ComposerVisualiser
 from fedot.core.data.data import InputData
+from fedot.core.repository.dataset_types import DataTypesEnum
 from fedot.core.repository.model_types_repository import ModelTypesRepository
 from fedot.core.repository.quality_metrics_repository import \
     (ClassificationMetricsEnum,
      MetricsRepository,
      RegressionMetricsEnum)
 from fedot.core.repository.tasks import Task, TaskTypesEnum
+from anytime import load_evaluations, save_evaluations
+from event_log import emit
+from instrumentation import DATA_LOADING, FITTING, MODEL_EXPORT, MODEL_LOADING, PREDICTION, \
+    report_anytime_evaluations, report_fitted_model, timed_phase
+from supervisor import heartbeat
 
-from benchmark_utils import get_models_hyperparameters
-
-random.seed(1)
-np.random.seed(1)
+DEFAULT_SEED = 1
 
 
 def save_fedot_model(chain, file_name: str):
@@ -43,6 +47,10 @@ def run_fedot(params: 'ExecutionParams'):
     test_file_path = params.test_file
     case_label = params.case_label
     task_type = params.task
+    seed = DEFAULT_SEED if params.seed is None else params.seed
+
+    random.seed(seed)
+    np.random.seed(seed)
 
     if task_type == TaskTypesEnum.classification:
         metric = ClassificationMetricsEnum.ROCAUC
@@ -54,15 +62,19 @@ def run_fedot(params: 'ExecutionParams'):
     metric_func = MetricsRepository().metric_by_id(metric)
 
     task = Task(task_type)
-    dataset_to_compose = InputData.from_csv(train_file_path, task=task)
-    dataset_to_validate = InputData.from_csv(test_file_path, task=task)
+    with timed_phase(DATA_LOADING):
+        dataset_to_compose = InputData.from_csv(train_file_path, task=task)
+        dataset_to_validate = InputData.from_csv(test_file_path, task=task)
 
-    models_hyperparameters = get_models_hyperparameters()['FEDOT']
+    models_hyperparameters = params.hyperparameters['FEDOT']
     cur_lead_time = models_hyperparameters['MAX_RUNTIME_MINS']
 
     saved_model_name = f'fedot_{case_label}_{task_type.name}_{cur_lead_time}_{metric.name}'
-    loaded_model = load_fedot_model(saved_model_name)
+    evaluations_file = os.path.join(os.path.dirname(__file__), f'{saved_model_name}_anytime.json')
+    with timed_phase(MODEL_LOADING):
+        loaded_model = load_fedot_model(saved_model_name)
 
+    emit('cache_hit' if loaded_model else 'cache_miss', model='fedot', key=saved_model_name)
     if not loaded_model:
         generations = models_hyperparameters['GENERATIONS']
         population_size = models_hyperparameters['POPULATION_SIZE']
@@ -82,18 +94,44 @@ def run_fedot(params: 'ExecutionParams'):
             crossover_prob=0.8, mutation_prob=0.8, max_lead_time=datetime.timedelta(minutes=cur_lead_time),
             add_single_model_chains=True)
 
+        evaluations = []
+        search_start = time.perf_counter()
+
+        def recorded_metric_func(*args, **kwargs):
+            value = metric_func(*args, **kwargs)
+            # the composer minimises the metric, so the negated value is higher-is-better
+            evaluations.append([round(time.perf_counter() - search_start, 3), -value])
+            heartbeat('fedot_evaluation', n_evaluations=len(evaluations))
+            return value
+
         # Create GP-based composer
-        builder = GPComposerBuilder(task).with_requirements(composer_requirements).with_metrics(metric_func)
+        builder = GPComposerBuilder(task).with_requirements(composer_requirements).with_metrics(recorded_metric_func)
         gp_composer = builder.build()
 
-        chain_gp_composed = gp_composer.compose_chain(data=dataset_to_compose)
+        with timed_phase(FITTING):
+            chain_gp_composed = gp_composer.compose_chain(data=dataset_to_compose)
 
-        chain_gp_composed.fit_from_scratch(input_data=dataset_to_compose)
-        save_fedot_model(chain_gp_composed, saved_model_name)
+            chain_gp_composed.fit_from_scratch(input_data=dataset_to_compose)
+        with timed_phase(MODEL_EXPORT):
+            save_fedot_model(chain_gp_composed, saved_model_name)
+            save_evaluations(evaluations_file, evaluations)
     else:
         chain_gp_composed = loaded_model
 
-    evo_predicted = chain_gp_composed.predict(dataset_to_validate)
-    evo_predicted_labels = chain_gp_composed.predict(dataset_to_validate, output_mode='labels')
+    evaluations = load_evaluations(evaluations_file)
+    if evaluations:
+        report_anytime_evaluations(evaluations, budget_secs=cur_lead_time * 60)
+
+    with timed_phase(PREDICTION):
+        evo_predicted = chain_gp_composed.predict(dataset_to_validate)
+        evo_predicted_labels = chain_gp_composed.predict(dataset_to_validate, output_mode='labels')
+
+    def predict_features(features: np.ndarray):
+        return chain_gp_composed.predict(InputData(idx=np.arange(len(features)), features=features, target=None,
+                                                   task=task, data_type=DataTypesEnum.table))
+
+    report_fitted_model(predict_features, dataset_to_validate.features,
+                        model_file=f'{os.path.dirname(__file__)}/{saved_model_name}.pkl',
+                        load_func=lambda _: load_fedot_model(saved_model_name))
 
     return dataset_to_validate.target, evo_predicted.predict, evo_predicted_labels.predict
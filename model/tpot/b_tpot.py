@@ -1,12 +1,67 @@
 import os
+import time
+from typing import List
 
 import joblib
-
-from benchmark_utils import get_models_hyperparameters
+from sklearn.metrics import get_scorer
+from tpot import TPOTClassifier, TPOTRegressor
 
 from fedot.core.data.data import InputData
-from fedot.core.models.evaluation.automl_eval import fit_tpot, predict_tpot_class, predict_tpot_reg
+from fedot.core.models.evaluation.automl_eval import predict_tpot_class, predict_tpot_reg
 from fedot.core.repository.tasks import Task, TaskTypesEnum
+from anytime import load_evaluations, save_evaluations
+from event_log import emit
+from instrumentation import DATA_LOADING, FITTING, MODEL_EXPORT, MODEL_LOADING, PREDICTION, \
+    report_anytime_evaluations, report_fitted_model, timed_phase
+from supervisor import heartbeat
+
+DEFAULT_SEED = 42
+
+
+class HeartbeatScorer:
+    """The default TPOT scorer that sends the heartbeat on every evaluated fold, picklable for the TPOT workers."""
+
+    def __init__(self, scoring: str):
+        self.scoring = scoring
+
+    def __call__(self, estimator, features, target):
+        score = get_scorer(self.scoring)(estimator, features, target)
+        heartbeat('tpot_evaluation')
+        return score
+
+
+def fit_tpot(data: InputData, models_hyperparameters: dict, seed: int, n_jobs: int = 1):
+    if data.task.task_type == TaskTypesEnum.classification:
+        estimator, target, scoring = TPOTClassifier, data.target.astype(int), 'accuracy'
+    elif data.task.task_type == TaskTypesEnum.regression:
+        estimator, target, scoring = TPOTRegressor, data.target.astype(float), 'neg_mean_squared_error'
+    else:
+        raise NotImplementedError()
+
+    model = estimator(generations=models_hyperparameters['GENERATIONS'],
+                      population_size=models_hyperparameters['POPULATION_SIZE'],
+                      max_time_mins=models_hyperparameters['MAX_RUNTIME_MINS'],
+                      scoring=HeartbeatScorer(scoring),
+                      verbosity=2,
+                      random_state=seed,
+                      n_jobs=n_jobs)
+
+    model.fit(data.features.astype(float), target)
+    return model
+
+
+def get_tpot_evaluations(model, search_secs: float) -> List[List[float]]:
+    """
+    Returns the internal CV scores of the evaluated individuals over the search time.
+    TPOT does not timestamp the individuals, so the generations are spread evenly over the search time.
+    """
+    individuals = [individual for individual in model.evaluated_individuals_.values()
+                   if isinstance(individual.get('generation'), int)]
+    if not individuals:
+        return []
+    n_generations = max(individual['generation'] for individual in individuals) + 1
+    return [[search_secs * (individual['generation'] + 1) / n_generations, individual['internal_cv_score']]
+            for individual in individuals]
 
 
 def run_tpot(params: 'ExecutionParams'):
@@ -15,39 +70,60 @@ def run_tpot(params: 'ExecutionParams'):
     case_label = params.case_label
     task = params.task
 
-    models_hyperparameters = get_models_hyperparameters()['TPOT']
+    models_hyperparameters = params.hyperparameters['TPOT']
     generations = models_hyperparameters['GENERATIONS']
     population_size = models_hyperparameters['POPULATION_SIZE']
 
+    max_runtime_mins = models_hyperparameters['MAX_RUNTIME_MINS']
+
     result_model_filename = f'{case_label}_g{generations}' \
-                            f'_p{population_size}_{task.name}.pkl'
+                            f'_p{population_size}_t{max_runtime_mins}_{task.name}.pkl'
     current_file_path = str(os.path.dirname(__file__))
     result_file_path = os.path.join(current_file_path, result_model_filename)
+    evaluations_file = f'{result_file_path[:-4]}_anytime.json'
 
-    train_data = InputData.from_csv(train_file_path, task=Task(task))
+    with timed_phase(DATA_LOADING):
+        train_data = InputData.from_csv(train_file_path, task=Task(task))
 
-    if result_model_filename not in os.listdir(current_file_path):
-        # TODO change hyperparameters to actual from variable
-        model = fit_tpot(train_data, models_hyperparameters['MAX_RUNTIME_MINS'])
+    is_cached = result_model_filename in os.listdir(current_file_path)
+    emit('cache_hit' if is_cached else 'cache_miss', model='tpot', key=result_model_filename)
+    if not is_cached:
+        seed = DEFAULT_SEED if params.seed is None else params.seed
+        with timed_phase(FITTING):
+            search_start = time.perf_counter()
+            model = fit_tpot(train_data, models_hyperparameters, seed, n_jobs=params.n_cores or 1)
+            evaluations = get_tpot_evaluations(model, time.perf_counter() - search_start)
 
-        model.export(output_file_name=f'{result_model_filename[:-4]}_pipeline.py')
+        with timed_phase(MODEL_EXPORT):
+            model.export(output_file_name=f'{result_model_filename[:-4]}_pipeline.py')
 
-        # sklearn pipeline object
-        fitted_model_config = model.fitted_pipeline_
-        joblib.dump(fitted_model_config, result_file_path, compress=1)
+            # sklearn pipeline object
+            fitted_model_config = model.fitted_pipeline_
+            joblib.dump(fitted_model_config, result_file_path, compress=1)
+            save_evaluations(evaluations_file, evaluations)
 
-    imported_model = joblib.load(result_file_path)
+    evaluations = load_evaluations(evaluations_file)
+    if evaluations:
+        report_anytime_evaluations(evaluations, budget_secs=max_runtime_mins * 60)
 
-    predict_data = InputData.from_csv(test_file_path, task=Task(task))
+    with timed_phase(MODEL_LOADING):
+        imported_model = joblib.load(result_file_path)
+
+    with timed_phase(DATA_LOADING):
+        predict_data = InputData.from_csv(test_file_path, task=Task(task))
     true_target = predict_data.target
-    if task == TaskTypesEnum.regression:
-        predicted = predict_tpot_reg(imported_model, predict_data)
-        predicted_labels = predicted
-    elif task == TaskTypesEnum.classification:
-        predicted, predicted_labels = predict_tpot_class(imported_model, predict_data)
-    else:
-        print('Incorrect type of ml task')
-        raise NotImplementedError()
+    with timed_phase(PREDICTION):
+        if task == TaskTypesEnum.regression:
+            predicted = predict_tpot_reg(imported_model, predict_data)
+            predicted_labels = predicted
+        elif task == TaskTypesEnum.classification:
+            predicted, predicted_labels = predict_tpot_class(imported_model, predict_data)
+        else:
+            print('Incorrect type of ml task')
+            raise NotImplementedError()
+
+    predict_func = imported_model.predict_proba if task == TaskTypesEnum.classification else imported_model.predict
+    report_fitted_model(predict_func, predict_data.features, model_file=result_file_path, load_func=joblib.load)
 
     print(f'BEST_model: {imported_model}')
 
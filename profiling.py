@@ -0,0 +1,126 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from enum import Enum
+from typing import List, Tuple
+
+PROFILES_DIR = 'profiles'
+
+
+class ProfilerTypeEnum(Enum):
+    # deterministic profiler of every call, slows the pure python code down noticeably
+    cprofile = 'cprofile'
+    # the stack of the profiled thread is sampled in the background thread with the low overhead
+    sampling = 'sampling'
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_filename}:{code.co_firstlineno}({code.co_name})'
+
+
+class SamplingProfiler:
+    """
+    Samples the call stack of the thread that started it with the fixed interval.
+    Only the python code of the process is visible: the time spent in the worker processes
+    (e.g. TPOT with n_jobs or the H2O JVM) shows up as the waiting in the calling function.
+    """
+
+    def __init__(self, interval_secs: float = 0.005):
+        self.interval_secs = interval_secs
+        self.stacks = Counter()
+        self._thread_id = None
+        self._outer_stack = ()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _stack(self, frame) -> Tuple[str, ...]:
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def _sample(self):
+        stack = self._stack(sys._current_frames().get(self._thread_id))
+        # the frames outside the profiled block are the same in every sample
+        n_outer = 0
+        while n_outer < min(len(stack), len(self._outer_stack)) and stack[n_outer] == self._outer_stack[n_outer]:
+            n_outer += 1
+        if stack[n_outer:]:
+            self.stacks[stack[n_outer:]] += 1
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_secs):
+            self._sample()
+
+    def enable(self):
+        self._thread_id = threading.get_ident()
+        self._outer_stack = self._stack(sys._getframe())
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def dump_stats(self, file_path: str):
+        # the collapsed stacks format is read by the flamegraph tools
+        with open(file_path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{";".join(stack)} {count}\n')
+
+    def top_functions(self, top_n: int) -> List[dict]:
+        n_samples = sum(self.stacks.values())
+        self_samples, total_samples = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            self_samples[stack[-1]] += count
+            # the recursive function is counted once per sample
+            for function in set(stack):
+                total_samples[function] += count
+        return [{'function': function,
+                 'self_secs': round(self_samples[function] * self.interval_secs, 4),
+                 'cumulative_secs': round(samples * self.interval_secs, 4),
+                 'cumulative_share': round(samples / n_samples, 4)}
+                for function, samples in total_samples.most_common(top_n)]
+
+
+def _cprofile_top_functions(profiler: cProfile.Profile, top_n: int) -> List[dict]:
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: -item[1][3])[:top_n]
+    return [{'function': f'{file_name}:{line}({function})',
+             'calls': calls,
+             'self_secs': round(self_secs, 4),
+             'cumulative_secs': round(cumulative_secs, 4)}
+            for (file_name, line, function), (_, calls, self_secs, cumulative_secs, _) in top]
+
+
+@contextmanager
+def profiled(profiler_type: ProfilerTypeEnum, artifact_name: str,
+             profiles_dir: str = PROFILES_DIR, top_n: int = 20):
+    """
+    Profiles the block and saves the artifact to the profiles directory: the pstats dump for cProfile
+    (open it with snakeviz or pstats) and the collapsed stacks for the sampling profiler.
+    The yielded dict is filled with the artifact path and the top-N functions by the cumulative time on exit.
+    """
+    os.makedirs(profiles_dir, exist_ok=True)
+    extension = 'prof' if profiler_type == ProfilerTypeEnum.cprofile else 'folded'
+    report = {'profiler': profiler_type.value,
+              'file': os.path.join(profiles_dir, f'{artifact_name}.{extension}')}
+    profiler = cProfile.Profile() if profiler_type == ProfilerTypeEnum.cprofile else SamplingProfiler()
+
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        profiler.dump_stats(report['file'])
+        if profiler_type == ProfilerTypeEnum.cprofile:
+            report['top_functions'] = _cprofile_top_functions(profiler, top_n)
+        else:
+            report['top_functions'] = profiler.top_functions(top_n)
+
@@ -0,0 +1,129 @@
+import math
+from typing import Dict, List
+
+import numpy as np
+from scipy.stats import rankdata, wilcoxon
+
+from benchmark_model_types import BenchmarkModelTypesEnum
+from benchmark_utils import get_models_hyperparameters
+from campaign import CampaignDataset, resolved_runtime_mins, run_campaign_unit, unit_score
+
+
+def racing_budgets(min_timedelta: int, max_timedelta: int, eta: int) -> List[int]:
+    if min_timedelta < 1 or eta < 2:
+        raise ValueError(f'Racing needs min_timedelta >= 1 and eta >= 2, got {min_timedelta} and {eta}')
+    budgets = []
+    budget = min_timedelta
+    while budget < max_timedelta:
+        budgets.append(budget)
+        budget *= eta
+    budgets.append(max_timedelta)
+    return budgets
+
+
+def _check_resolved_budgets(budgets: List[int], models: List[BenchmarkModelTypesEnum]):
+    """The survivors get more time only if the resolved time budgets of the rungs grow strictly."""
+    for model in models:
+        resolved = [resolved_runtime_mins(model, get_models_hyperparameters(timedelta, unscaled=True))
+                    for timedelta in budgets]
+        if resolved[0] is None:
+            continue
+        if any(later <= earlier for earlier, later in zip(resolved, resolved[1:])):
+            raise ValueError(f'Resolved {model.name} budgets {resolved} of the racing rungs are not increasing')
+
+
+def _ranks_by_dataset(rung_results: Dict[str, List[dict]], datasets: List[CampaignDataset]) -> Dict[str, np.ndarray]:
+    frameworks = list(rung_results.keys())
+    scores = np.array([[unit_score(unit, dataset.metric_list[0])
+                        for unit, dataset in zip(rung_results[framework], datasets)]
+                       for framework in frameworks])
+    # rank 1 is the best framework on the dataset, the failed units share the worst rank
+    ranks = np.array([rankdata(-scores[:, dataset_num]) for dataset_num in range(len(datasets))]).T
+    return dict(zip(frameworks, ranks))
+
+
+def _is_dominated(candidate_ranks: np.ndarray, leader_ranks: np.ndarray, alpha: float) -> bool:
+    differences = candidate_ranks - leader_ranks
+    if not np.any(differences):
+        return False
+    try:
+        _, p_value = wilcoxon(differences, alternative='greater')
+    except ValueError:
+        return False
+    return p_value < alpha
+
+
+def successive_halving(datasets: List[CampaignDataset],
+                       models: List[BenchmarkModelTypesEnum] = None,
+                       min_timedelta: int = 2, max_timedelta: int = 30,
+                       eta: int = 3, alpha: float = 0.05) -> dict:
+    """
+    Races the frameworks over the datasets: on every rung all the survivors run with the same time budget,
+    the frameworks with ranks significantly worse than the leader ones (one-sided Wilcoxon signed-rank test)
+    are dropped and at most 1/eta of the rest is promoted to the next rung with an eta times larger budget.
+    """
+    if models is None:
+        models = list(BenchmarkModelTypesEnum)
+
+    survivors = list(models)
+    last_results = {}
+    eliminated = []
+    cpu_secs_spent = 0.0
+    rungs = []
+
+    budgets = racing_budgets(min_timedelta, max_timedelta, eta)
+    # the rung budgets are absolute: scaled by the dataset size and clipped they would collapse into the same one
+    _check_resolved_budgets(budgets, models)
+    for rung_num, timedelta in enumerate(budgets):
+        if len(survivors) == 1 and rung_num < len(budgets) - 1:
+            # the single survivor goes straight to the full budget
+            continue
+        survivor_names = [model.name for model in survivors]
+        print(f'---------\nRACING RUNG {rung_num}: {timedelta} min for {survivor_names}\n---------')
+        rung_results = {model.name: [run_campaign_unit(dataset, model, timedelta, unscaled_budget=True)
+                                     for dataset in datasets]
+                        for model in survivors}
+        for framework, units in rung_results.items():
+            cpu_secs_spent += sum(unit['cpu_secs'] for unit in units)
+            last_results[framework] = (timedelta, units)
+
+        ranks = _ranks_by_dataset(rung_results, datasets)
+        mean_ranks = {framework: float(np.mean(framework_ranks)) for framework, framework_ranks in ranks.items()}
+        ordered = sorted(survivors, key=lambda model: mean_ranks[model.name])
+        rungs.append({'timedelta': timedelta, 'mean_ranks': mean_ranks})
+
+        if rung_num == len(budgets) - 1:
+            survivors = ordered
+            break
+
+        leader = ordered[0]
+        not_dominated = [model for model in ordered
+                         if not _is_dominated(ranks[model.name], ranks[leader.name], alpha)]
+        promoted = not_dominated[:max(1, math.ceil(len(ordered) / eta))]
+        eliminated = [(model.name, rung_num, mean_ranks[model.name])
+                      for model in ordered if model not in promoted] + eliminated
+        survivors = promoted
+
+    ranking = [model.name for model in survivors] + [framework for framework, _, _ in eliminated]
+
+    # the cost of the units that did not reach the last rung is extrapolated linearly by the resolved time budget,
+    # the frameworks without the time budget are expected to cost the same on every rung
+    max_runtime_mins = {model.name: resolved_runtime_mins(model, get_models_hyperparameters(max_timedelta,
+                                                                                            unscaled=True))
+                        for model in models}
+    cpu_secs_full_grid = 0.0
+    for framework, (timedelta, units) in last_results.items():
+        for unit in units:
+            runtime_mins = resolved_runtime_mins(BenchmarkModelTypesEnum[framework], unit['hyperparameters'])
+            ratio = max_runtime_mins[framework] / runtime_mins if runtime_mins else 1.0
+            cpu_secs_full_grid += unit['cpu_secs'] * ratio
+
+    return {'ranking': ranking,
+            'final_mean_ranks': rungs[-1]['mean_ranks'],
+            'eliminated': [{'framework': framework, 'rung': rung, 'mean_rank': mean_rank}
+                           for framework, rung, mean_rank in eliminated],
+            'rungs': rungs,
+            'units': {framework: units for framework, (_, units) in last_results.items()},
+            'cpu_hours_spent': round(cpu_secs_spent / 3600, 3),
+            'cpu_hours_full_grid': round(cpu_secs_full_grid / 3600, 3),
+            'cpu_hours_saved': round(max(cpu_secs_full_grid - cpu_secs_spent, 0) / 3600, 3)}
@@ -0,0 +1,243 @@
+import json
+import sqlite3
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+RESULTS_DB_FILE = 'benchmark_results.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    campaign TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    framework TEXT NOT NULL,
+    seed INTEGER,
+    timedelta INTEGER,
+    status TEXT NOT NULL,
+    error TEXT,
+    details TEXT,
+    created_at REAL NOT NULL,
+    fingerprint TEXT,
+    fidelity REAL
+);
+CREATE INDEX IF NOT EXISTS runs_by_campaign ON runs (campaign, dataset, framework);
+CREATE INDEX IF NOT EXISTS runs_by_dataset ON runs (dataset, framework);
+CREATE INDEX IF NOT EXISTS runs_by_framework ON runs (framework);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    metric TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, metric)
+);
+CREATE INDEX IF NOT EXISTS metrics_by_name ON metrics (metric, run_id);
+CREATE TABLE IF NOT EXISTS timings (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    phase TEXT NOT NULL,
+    wall_secs REAL,
+    cpu_secs REAL,
+    PRIMARY KEY (run_id, phase)
+);
+CREATE TABLE IF NOT EXISTS resources (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (run_id),
+    wall_secs REAL,
+    cpu_secs REAL,
+    strategy_wall_secs REAL,
+    strategy_cpu_secs REAL,
+    time_to_predict_secs REAL,
+    peak_rss_mb REAL
+);
+CREATE TABLE IF NOT EXISTS configs (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (run_id),
+    hyperparameters TEXT
+);
+"""
+
+# the parts of the unit result kept as json in the runs table
+_DETAIL_KEYS = ['anytime', 'inference', 'usage', 'profile']
+
+
+def case_result_to_unit_results(case_result: dict, dataset: str) -> List[dict]:
+    """Splits the result of CaseExecutor into the unit results of every framework (and every seed)."""
+    unit_results = []
+    models = sorted({key[:-len('_metric')] for key in case_result if key.endswith('_metric')})
+    for model in models:
+        if f'{model}_seeds' in case_result:
+            reports = case_result[f'{model}_seeds']
+        else:
+            reports = [{key[len(model) + 1:]: value for key, value in case_result.items()
+                        if key.startswith(f'{model}_')}]
+        for report in reports:
+            unit_result = {'dataset': dataset, 'framework': model, 'seed': report.get('seed'),
+                           'metrics': report.get('metric'), 'timings': report.get('timings'),
+                           'peak_rss_mb': (report.get('memory') or {}).get('peak_rss_mb'),
+                           'hyperparameters': case_result.get('hyperparameters'),
+                           'fingerprint': report.get('fingerprint'), 'cached': report.get('cached', False),
+                           'fidelity': report.get('fidelity')}
+            unit_result.update({key: report[key] for key in _DETAIL_KEYS if key in report})
+            unit_results.append(unit_result)
+    return unit_results
+
+
+class ResultsStore:
+    """
+    Results of the benchmark runs in the SQLite database. Every run is written in a single transaction and
+    the write-ahead log lets the concurrent workers append to the same file while the reports read it.
+    """
+
+    def __init__(self, file_path: str = RESULTS_DB_FILE):
+        self.file_path = file_path
+        self._connection = sqlite3.connect(file_path, timeout=60)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+        # the databases created before the deduplication have no fingerprints of the runs
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(runs)')]
+        if 'fingerprint' not in columns:
+            self._connection.execute('ALTER TABLE runs ADD COLUMN fingerprint TEXT')
+        # the fraction of the training split the run was fitted on, null for the full split
+        if 'fidelity' not in columns:
+            self._connection.execute('ALTER TABLE runs ADD COLUMN fidelity REAL')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS runs_by_fingerprint ON runs (fingerprint, campaign)')
+
+    def close(self):
+        self._connection.close()
+
+    def add_unit_result(self, unit_result: dict, campaign: str = 'default') -> int:
+        """Writes the run, the reused result already written to the campaign is not duplicated."""
+        timings = unit_result.get('timings') or {}
+        details = {key: unit_result[key] for key in _DETAIL_KEYS if unit_result.get(key) is not None}
+        fingerprint = unit_result.get('fingerprint')
+        with self._connection:
+            if unit_result.get('cached'):
+                existing = self._connection.execute('SELECT run_id FROM runs WHERE fingerprint = ? AND campaign = ? '
+                                                    'AND status = \'ok\'', (fingerprint, campaign)).fetchone()
+                if existing:
+                    return existing[0]
+            cursor = self._connection.execute(
+                'INSERT INTO runs (campaign, dataset, framework, seed, timedelta, status, error, details, created_at, '
+                'fingerprint, fidelity) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (campaign, unit_result['dataset'], unit_result['framework'], unit_result.get('seed'),
+                 unit_result.get('timedelta'), 'ok' if unit_result.get('metrics') else 'failed',
+                 unit_result.get('error'), json.dumps(details, default=str) if details else None, time.time(),
+                 fingerprint, unit_result.get('fidelity')))
+            run_id = cursor.lastrowid
+            self._connection.executemany('INSERT INTO metrics VALUES (?, ?, ?)',
+                                         [(run_id, metric_name, value)
+                                          for metric_name, value in (unit_result.get('metrics') or {}).items()])
+            self._connection.executemany('INSERT INTO timings VALUES (?, ?, ?, ?)',
+                                         [(run_id, phase_name, phase['wall_secs'], phase['cpu_secs'])
+                                          for phase_name, phase in timings.get('phases', {}).items()])
+            self._connection.execute('INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                     (run_id, unit_result.get('wall_secs'), unit_result.get('cpu_secs'),
+                                      timings.get('wall_secs'), timings.get('cpu_secs'),
+                                      timings.get('time_to_predict_secs'), unit_result.get('peak_rss_mb')))
+            if unit_result.get('hyperparameters') is not None:
+                self._connection.execute('INSERT INTO configs VALUES (?, ?)',
+                                         (run_id, json.dumps(unit_result['hyperparameters'], default=str)))
+        return run_id
+
+    def add_case_result(self, case_result: dict, dataset: str, campaign: str = 'default') -> List[int]:
+        return [self.add_unit_result(unit_result, campaign)
+                for unit_result in case_result_to_unit_results(case_result, dataset)]
+
+    def add_failed_case(self, dataset: str, frameworks: List[str], error: str, campaign: str = 'default'):
+        for framework in frameworks:
+            self.add_unit_result({'dataset': dataset, 'framework': framework, 'metrics': None, 'error': error},
+                                 campaign)
+
+    def cached_report(self, fingerprint: str) -> Optional[dict]:
+        """Returns the report of the last successful run with the fingerprint in any campaign in the executor format."""
+        row = self._connection.execute('SELECT run_id, details FROM runs WHERE fingerprint = ? AND status = \'ok\' '
+                                       'ORDER BY run_id DESC LIMIT 1', (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        run_id, details = row
+        wall_secs, cpu_secs, time_to_predict_secs, peak_rss_mb = self._connection.execute(
+            'SELECT strategy_wall_secs, strategy_cpu_secs, time_to_predict_secs, peak_rss_mb FROM resources '
+            'WHERE run_id = ?', (run_id,)).fetchone()
+        phases = {phase_name: {'wall_secs': phase_wall_secs, 'cpu_secs': phase_cpu_secs}
+                  for phase_name, phase_wall_secs, phase_cpu_secs in self._connection.execute(
+                      'SELECT phase, wall_secs, cpu_secs FROM timings WHERE run_id = ?', (run_id,))}
+        report = {'metric': dict(self._connection.execute('SELECT metric, value FROM metrics WHERE run_id = ?',
+                                                          (run_id,))),
+                  'timings': {'phases': phases, 'wall_secs': wall_secs, 'cpu_secs': cpu_secs,
+                              'time_to_predict_secs': time_to_predict_secs},
+                  'memory': {'peak_rss_mb': peak_rss_mb}}
+        report.update(json.loads(details) if details else {})
+        return report
+
+    @staticmethod
+    def _filters(campaign: Optional[str] = None, datasets: Optional[Sequence[str]] = None,
+                 frameworks: Optional[Sequence[str]] = None, since_run_id: int = 0,
+                 full_fidelity: bool = False) -> Tuple[str, list]:
+        conditions, params = [], []
+        if full_fidelity:
+            # the runs stopped early on a subsample are not ranked against the ones fitted on the full split
+            conditions.append('(runs.fidelity IS NULL OR runs.fidelity >= 1)')
+        if campaign is not None:
+            conditions.append('runs.campaign = ?')
+            params.append(campaign)
+        if since_run_id:
+            # the run ids grow with every write, so the readers fetch only the runs added after their last read
+            conditions.append('runs.run_id > ?')
+            params.append(since_run_id)
+        for column, values in (('dataset', datasets), ('framework', frameworks)):
+            if values:
+                conditions.append(f'runs.{column} IN ({", ".join("?" * len(values))})')
+                params.extend(values)
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+    def campaigns(self) -> List[str]:
+        return [row[0] for row in self._connection.execute('SELECT DISTINCT campaign FROM runs ORDER BY campaign')]
+
+    def runs(self, campaign: Optional[str] = None, datasets: Optional[Sequence[str]] = None,
+             frameworks: Optional[Sequence[str]] = None, since_run_id: int = 0,
+             full_fidelity: bool = False) -> pd.DataFrame:
+        where, params = self._filters(campaign, datasets, frameworks, since_run_id, full_fidelity)
+        return pd.read_sql_query('SELECT runs.run_id, campaign, dataset, framework, seed, timedelta, fidelity, '
+                                 'status, error, '
+                                 'wall_secs, cpu_secs, strategy_wall_secs, strategy_cpu_secs, time_to_predict_secs, '
+                                 'peak_rss_mb FROM runs LEFT JOIN resources USING (run_id)' + where,
+                                 self._connection, params=params)
+
+    def metric_values(self, metric_name: str, campaign: Optional[str] = None,
+                      datasets: Optional[Sequence[str]] = None,
+                      frameworks: Optional[Sequence[str]] = None, since_run_id: int = 0,
+                      full_fidelity: bool = False) -> pd.DataFrame:
+        """Returns the values of the metric by run with the dataset, framework and seed of the run."""
+        where, params = self._filters(campaign, datasets, frameworks, since_run_id, full_fidelity)
+        where = (where + ' AND' if where else ' WHERE') + ' metrics.metric = ?'
+        return pd.read_sql_query('SELECT runs.run_id, dataset, framework, seed, value '
+                                 'FROM metrics JOIN runs USING (run_id)' + where,
+                                 self._connection, params=params + [metric_name])
+
+    def summary(self, campaign: Optional[str] = None, datasets: Optional[Sequence[str]] = None,
+                frameworks: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Aggregates the metrics and the resources by dataset and framework inside the database."""
+        where, params = self._filters(campaign, datasets, frameworks)
+        metrics = pd.read_sql_query('SELECT dataset, framework, metric, AVG(value) AS mean, '
+                                    'AVG(value * value) - AVG(value) * AVG(value) AS variance, COUNT(value) AS n '
+                                    'FROM metrics JOIN runs USING (run_id)' + where +
+                                    ' GROUP BY dataset, framework, metric', self._connection, params=params)
+        resources = pd.read_sql_query('SELECT dataset, framework, COUNT(*) AS n_runs, '
+                                      'AVG(status = \'failed\') AS failure_rate, AVG(wall_secs) AS wall_secs, '
+                                      'AVG(cpu_secs) AS cpu_secs, AVG(time_to_predict_secs) AS time_to_predict_secs, '
+                                      'MAX(peak_rss_mb) AS peak_rss_mb '
+                                      'FROM runs LEFT JOIN resources USING (run_id)' + where +
+                                      ' GROUP BY dataset, framework', self._connection, params=params)
+        metrics['std'] = metrics['variance'].clip(lower=0) ** 0.5
+        wide_metrics = metrics.pivot_table(index=['dataset', 'framework'], columns='metric', values=['mean', 'std'])
+        wide_metrics.columns = [f'{metric_name}_{statistic}' for statistic, metric_name in wide_metrics.columns]
+        return resources.merge(wide_metrics.reset_index(), on=['dataset', 'framework'], how='left')
+
+    def export_csv(self, file_path: str = 'final_combined.csv', campaign: Optional[str] = None) -> pd.DataFrame:
+        """Writes one row per run with the metrics as columns, the replacement of the combined json stats."""
+        where, params = self._filters(campaign)
+        metrics = pd.read_sql_query('SELECT run_id, metric, value FROM metrics JOIN runs USING (run_id)' + where,
+                                    self._connection, params=params)
+        wide_metrics = metrics.pivot(index='run_id', columns='metric', values='value').reset_index()
+        combined = self.runs(campaign).merge(wide_metrics, on='run_id', how='left')
+        combined.to_csv(file_path, index=False)
+        return combined
@@ -0,0 +1,171 @@
+import heapq
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmark_model_types import BenchmarkModelTypesEnum
+from campaign import CampaignUnit, estimate_unit_cost
+from core_allotment import init_worker_slot
+
+RUNTIME_HISTORY_FILE = 'campaign_runtime_history.json'
+CAMPAIGN_STATUS_FILE = 'campaign_status.json'
+
+
+def _budget_key(unit: CampaignUnit) -> str:
+    return 'default' if unit.timedelta is None else str(unit.timedelta)
+
+
+class RuntimeHistory:
+    """Observed runtimes of the campaign units by (dataset, framework, budget) persisted to the json-file."""
+
+    def __init__(self, file_path: str = RUNTIME_HISTORY_FILE):
+        self.file_path = file_path
+        self.records = []
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as file:
+                self.records = json.load(file)
+
+    def add(self, unit: CampaignUnit, n_rows: Optional[int], n_features: Optional[int], wall_secs: float,
+            peak_rss_mb: Optional[float] = None):
+        self.records.append({'dataset': unit.dataset, 'framework': unit.framework, 'budget': _budget_key(unit),
+                             'n_rows': n_rows, 'n_features': n_features, 'wall_secs': wall_secs,
+                             'peak_rss_mb': peak_rss_mb})
+
+    def save(self):
+        with open(self.file_path, 'w') as file:
+            json.dump(self.records, file, indent=4)
+
+    def predict(self, unit: CampaignUnit, n_rows: Optional[int], n_features: Optional[int]) -> float:
+        """
+        Predicts the runtime of the unit in seconds: the median of the observed runtimes if the unit was seen,
+        else the power law of the dataset size fitted on the same framework and budget,
+        else the estimate by the resolved budget.
+        """
+        budget = _budget_key(unit)
+        same_setup = [record for record in self.records
+                      if record['framework'] == unit.framework and record['budget'] == budget]
+        observed = [record['wall_secs'] for record in same_setup if record['dataset'] == unit.dataset]
+        if observed:
+            return float(np.median(observed))
+
+        sized = [record for record in same_setup if record['n_rows'] and record['n_features']]
+        sizes = np.log([record['n_rows'] * record['n_features'] for record in sized])
+        if n_rows and n_features and len(set(sizes)) > 1:
+            runtimes = np.log([max(record['wall_secs'], 1e-3) for record in sized])
+            slope, intercept = np.polyfit(sizes, runtimes, 1)
+            return float(np.exp(intercept + slope * np.log(n_rows * n_features)))
+
+        return estimate_unit_cost(BenchmarkModelTypesEnum[unit.framework], n_rows, n_features, unit.timedelta) * 60
+
+    def predict_memory(self, unit: CampaignUnit) -> float:
+        """
+        Predicts the peak memory of the unit in MB: the maximum observed for the unit if it was seen,
+        else the maximum observed for the framework, else zero.
+        """
+        framework_peaks = [(record['dataset'], record['peak_rss_mb']) for record in self.records
+                           if record['framework'] == unit.framework and record.get('peak_rss_mb')]
+        unit_peaks = [peak for dataset, peak in framework_peaks if dataset == unit.dataset]
+        if unit_peaks:
+            return max(unit_peaks)
+        return max((peak for _, peak in framework_peaks), default=0.0)
+
+
+class CampaignScheduler:
+    """
+    Runs the campaign units on the worker processes in the longest-processing-time-first order
+    and keeps the estimate of the campaign finish time up to date.
+    If the memory limit is set, the longest pending unit whose predicted peak memory fits
+    into the memory left by the running units is started first.
+    """
+
+    def __init__(self, unit_func: Callable[[CampaignUnit], dict],
+                 unit_sizes: Dict[CampaignUnit, Tuple[Optional[int], Optional[int]]],
+                 n_workers: int = 1, history: RuntimeHistory = None,
+                 status_file: str = CAMPAIGN_STATUS_FILE, status_interval_secs: float = 60,
+                 memory_limit_mb: Optional[float] = None):
+        self.unit_func = unit_func
+        self.unit_sizes = unit_sizes
+        self.n_workers = n_workers
+        self.history = history or RuntimeHistory()
+        self.status_file = status_file
+        self.status_interval_secs = status_interval_secs
+        self.memory_limit_mb = memory_limit_mb
+        self.memory_predictions = {}
+        self.predictions = {}
+        self.pending = []
+        self.running = {}
+        self.start_time = None
+
+    def eta(self) -> float:
+        """Returns the predicted number of seconds left until the last unit is finished."""
+        now = time.monotonic()
+        workers = [max(self.predictions[unit] - (now - start), 0.0) for unit, start in self.running.values()]
+        workers += [0.0] * (self.n_workers - len(workers))
+        heapq.heapify(workers)
+        for unit in self.pending:
+            heapq.heappush(workers, heapq.heappop(workers) + self.predictions[unit])
+        return max(workers)
+
+    def _next_unit(self) -> Optional[CampaignUnit]:
+        if self.memory_limit_mb is None:
+            return self.pending[0]
+        free_memory_mb = self.memory_limit_mb - sum(self.memory_predictions[unit]
+                                                    for unit, _ in self.running.values())
+        for unit in self.pending:
+            if self.memory_predictions[unit] <= free_memory_mb:
+                return unit
+        # the unit larger than the whole limit runs alone instead of blocking the campaign
+        return None if self.running else self.pending[0]
+
+    def _save_status(self, n_done: int):
+        status = {'done': n_done,
+                  'running': [unit.__dict__ for unit, _ in self.running.values()],
+                  'pending': len(self.pending),
+                  'elapsed_secs': round(time.monotonic() - self.start_time, 1),
+                  'eta_secs': round(self.eta(), 1)}
+        with open(self.status_file, 'w') as file:
+            json.dump(status, file, indent=4)
+
+    def run(self, units: List[CampaignUnit], on_result: Callable[[dict], None] = None) -> List[dict]:
+        self.predictions = {unit: self.history.predict(unit, *self.unit_sizes[unit]) for unit in units}
+        self.memory_predictions = {unit: self.history.predict_memory(unit) for unit in units}
+        self.pending = sorted(units, key=lambda unit: -self.predictions[unit])
+        self.start_time = time.monotonic()
+        unit_results = []
+
+        # the slots of the workers separate the cores of the concurrent units if they are pinned
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=init_worker_slot,
+                                 initargs=(multiprocessing.Value('i', 0),)) as pool:
+            while self.pending or self.running:
+                while self.pending and len(self.running) < self.n_workers:
+                    unit = self._next_unit()
+                    if unit is None:
+                        break
+                    self.pending.remove(unit)
+                    self.running[pool.submit(self.unit_func, unit)] = (unit, time.monotonic())
+
+                # the status is refreshed at least once in the interval to keep the ETA live
+                done, _ = wait(list(self.running), timeout=self.status_interval_secs, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit, _ = self.running.pop(future)
+                    unit_result = future.result()
+                    # the reused results of the units say nothing of their runtime
+                    if not unit_result.get('cached'):
+                        self.history.add(unit, *self.unit_sizes[unit], wall_secs=unit_result['wall_secs'],
+                                         peak_rss_mb=unit_result.get('peak_rss_mb'))
+                    unit_results.append(unit_result)
+                    if on_result:
+                        on_result(unit_result)
+
+                self._save_status(len(unit_results))
+                if done:
+                    self.history.save()
+                    print(f'Campaign progress: {len(unit_results)} of {len(units)} units, '
+                          f'ETA {round(self.eta() / 60, 1)} min')
+
+        return unit_results
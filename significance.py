@@ -0,0 +1,233 @@
+import argparse
+import json
+from itertools import combinations
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, f as f_distribution, norm, rankdata
+
+from metrics_direction import LOWER_IS_BETTER_METRICS
+from leaderboard import LEADERBOARD_METRICS
+from results_store import RESULTS_DB_FILE, ResultsStore
+
+# the critical values of the two-tailed Nemenyi test for 2..10 frameworks (Demsar, 2006)
+NEMENYI_CRITICAL_VALUES = {
+    0.05: [1.960, 2.343, 2.569, 2.728, 2.850, 2.949, 3.031, 3.102, 3.164],
+    0.10: [1.645, 2.052, 2.291, 2.459, 2.589, 2.693, 2.780, 2.855, 2.920]
+}
+# the exact distribution of the Wilcoxon statistic is used up to this number of the datasets without ties
+WILCOXON_EXACT_MAX_SIZE = 25
+
+
+def score_matrix(store: ResultsStore, metric_names: Sequence[str] = LEADERBOARD_METRICS,
+                 campaign: Optional[str] = None, datasets: Optional[Sequence[str]] = None,
+                 frameworks: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Returns the scores of the frameworks (columns) on the datasets (rows) averaged over the seeds and oriented
+    so that higher is better. The first of the metrics computed for the dataset is used. Only the datasets
+    with the successful runs of all the frameworks are kept, as the tests compare the complete blocks.
+    """
+    scores = None
+    for metric_name in metric_names:
+        values = store.metric_values(metric_name, campaign, datasets, frameworks, full_fidelity=True)
+        if values.empty:
+            continue
+        metric_scores = values.pivot_table(index='dataset', columns='framework', values='value', aggfunc='mean')
+        if metric_name in LOWER_IS_BETTER_METRICS:
+            metric_scores = -metric_scores
+        if scores is None:
+            scores = metric_scores
+        else:
+            new_datasets = metric_scores.index.difference(scores.index)
+            scores = pd.concat([scores, metric_scores.loc[new_datasets]])
+    if scores is None:
+        return pd.DataFrame()
+    return scores.dropna().sort_index()
+
+
+def _average_ranks(scores: pd.DataFrame) -> pd.Series:
+    ranks = rankdata(-scores.values, axis=1)
+    return pd.Series(ranks.mean(axis=0), index=scores.columns)
+
+
+def friedman_test(scores: pd.DataFrame) -> dict:
+    """Friedman test of the equal average ranks and its Iman-Davenport F-distributed version."""
+    n_datasets, n_frameworks = scores.shape
+    average_ranks = _average_ranks(scores)
+    statistic = 12 * n_datasets / (n_frameworks * (n_frameworks + 1)) * \
+        (np.sum(average_ranks.values ** 2) - n_frameworks * (n_frameworks + 1) ** 2 / 4)
+    # every tied score counts the size of its tie group, so the sum over the scores of t^2 - 1 is the sum of t^3 - t
+    tie_sizes = (scores.values[:, :, None] == scores.values[:, None, :]).sum(axis=2)
+    statistic /= 1 - np.sum(tie_sizes ** 2 - 1) / (n_datasets * n_frameworks * (n_frameworks ** 2 - 1))
+    iman_davenport = (n_datasets - 1) * statistic / (n_datasets * (n_frameworks - 1) - statistic) \
+        if statistic < n_datasets * (n_frameworks - 1) else float('inf')
+    return {'statistic': float(statistic),
+            'p_value': float(chi2.sf(statistic, n_frameworks - 1)),
+            'iman_davenport_statistic': float(iman_davenport),
+            'iman_davenport_p_value': float(f_distribution.sf(iman_davenport, n_frameworks - 1,
+                                                              (n_frameworks - 1) * (n_datasets - 1))),
+            'average_ranks': average_ranks.to_dict(),
+            'n_datasets': n_datasets}
+
+
+def nemenyi_critical_difference(n_frameworks: int, n_datasets: int, alpha: float = 0.05) -> float:
+    if alpha not in NEMENYI_CRITICAL_VALUES:
+        raise ValueError(f'Nemenyi critical values are known for alpha {list(NEMENYI_CRITICAL_VALUES)}')
+    if not 2 <= n_frameworks <= len(NEMENYI_CRITICAL_VALUES[alpha]) + 1:
+        raise ValueError(f'Nemenyi critical values are known for 2 to 10 frameworks, got {n_frameworks}')
+    critical_value = NEMENYI_CRITICAL_VALUES[alpha][n_frameworks - 2]
+    return critical_value * np.sqrt(n_frameworks * (n_frameworks + 1) / (6 * n_datasets))
+
+
+def nemenyi_test(scores: pd.DataFrame, alpha: float = 0.05) -> dict:
+    """Nemenyi post-hoc test: the frameworks differ if their average ranks differ by more than the CD."""
+    average_ranks = _average_ranks(scores)
+    critical_difference = nemenyi_critical_difference(scores.shape[1], scores.shape[0], alpha)
+    rank_differences = pd.DataFrame(np.abs(average_ranks.values[:, None] - average_ranks.values[None, :]),
+                                    index=scores.columns, columns=scores.columns)
+    return {'critical_difference': float(critical_difference),
+            'rank_differences': rank_differences,
+            'significant': rank_differences > critical_difference}
+
+
+def _wilcoxon_exact_cdf(n: int) -> np.ndarray:
+    # the number of the sign assignments of the ranks 1..n giving every sum of the positive ranks
+    counts = np.zeros(n * (n + 1) // 2 + 1)
+    counts[0] = 1
+    for rank in range(1, n + 1):
+        counts[rank:] = counts[rank:] + counts[:-rank].copy()
+    return np.cumsum(counts) / 2 ** n
+
+
+def holm_correction(p_values: np.ndarray) -> np.ndarray:
+    p_values = np.asarray(p_values, dtype=float)
+    order = np.argsort(p_values)
+    adjusted = np.minimum(1, np.maximum.accumulate(p_values[order] * (len(p_values) - np.arange(len(p_values)))))
+    result = np.empty_like(adjusted)
+    result[order] = adjusted
+    return result
+
+
+def wilcoxon_holm(scores: pd.DataFrame, alpha: float = 0.05) -> pd.DataFrame:
+    """
+    Wilcoxon signed-rank tests of all the pairs of the frameworks with the Holm correction of the p-values.
+    The ranks of all the pairs are computed at once, the zero differences are dropped.
+    """
+    pairs = list(combinations(scores.columns, 2))
+    values = scores.values
+    first_columns = [scores.columns.get_loc(first) for first, _ in pairs]
+    second_columns = [scores.columns.get_loc(second) for _, second in pairs]
+    differences = values[:, first_columns] - values[:, second_columns]
+
+    nonzero = differences != 0
+    n_zeros = (~nonzero).sum(axis=0)
+    # the zero differences have the smallest absolute values, so the other ranks are shifted by their number
+    ranks = np.where(nonzero, rankdata(np.abs(differences), axis=0) - n_zeros, 0)
+    positive_sums = np.where(differences > 0, ranks, 0).sum(axis=0)
+    negative_sums = np.where(differences < 0, ranks, 0).sum(axis=0)
+    sizes = nonzero.sum(axis=0)
+
+    records = []
+    for pair_num, (first, second) in enumerate(pairs):
+        size = sizes[pair_num]
+        statistic = min(positive_sums[pair_num], negative_sums[pair_num])
+        pair_ranks = ranks[nonzero[:, pair_num], pair_num]
+        _, tie_counts = np.unique(pair_ranks, return_counts=True)
+        if size == 0:
+            p_value = 1.0
+        elif size <= WILCOXON_EXACT_MAX_SIZE and np.all(tie_counts == 1):
+            p_value = min(1.0, 2 * _wilcoxon_exact_cdf(size)[int(statistic)])
+        else:
+            mean = size * (size + 1) / 4
+            variance = size * (size + 1) * (2 * size + 1) / 24 - np.sum(tie_counts ** 3 - tie_counts) / 48
+            p_value = min(1.0, 2 * norm.cdf((statistic - mean) / np.sqrt(variance)))
+        records.append({'first': first, 'second': second,
+                        'mean_difference': float(differences[:, pair_num].mean()),
+                        'positive_rank_sum': float(positive_sums[pair_num]),
+                        'negative_rank_sum': float(negative_sums[pair_num]),
+                        'p_value': float(p_value)})
+
+    result = pd.DataFrame(records)
+    if not result.empty:
+        result['p_value_holm'] = holm_correction(result['p_value'].values)
+        result['significant'] = result['p_value_holm'] < alpha
+    return result
+
+
+def bayesian_signed_rank(scores: pd.DataFrame, rope: float = 0.01, n_samples: int = 20000,
+                         seed: int = 0) -> pd.DataFrame:
+    """
+    Bayesian signed-rank test (Benavoli et al., 2017) of all the pairs of the frameworks. The differences
+    within the region of practical equivalence (rope, in the metric units) count as ties. The posterior
+    is sampled from the Dirichlet process with the prior pseudo-observation at zero, all the samples of
+    the pair are weighted at once by the matrix products.
+    """
+    random_state = np.random.RandomState(seed)
+    records = []
+    for first, second in combinations(scores.columns, 2):
+        differences = np.append(scores[first].values - scores[second].values, 0)
+        weights = random_state.dirichlet(np.ones(len(differences)), n_samples)
+        pair_sums = differences[:, None] + differences[None, :]
+        first_better = np.einsum('si,ij,sj->s', weights, (pair_sums > 2 * rope).astype(float), weights, optimize=True)
+        second_better = np.einsum('si,ij,sj->s', weights, (pair_sums < -2 * rope).astype(float), weights,
+                                  optimize=True)
+        equivalent = 1 - first_better - second_better
+        winners = np.argmax(np.stack([first_better, equivalent, second_better]), axis=0)
+        records.append({'first': first, 'second': second,
+                        'p_first_better': float(np.mean(winners == 0)),
+                        'p_equivalent': float(np.mean(winners == 1)),
+                        'p_second_better': float(np.mean(winners == 2))})
+    return pd.DataFrame(records)
+
+
+def critical_difference_data(scores: pd.DataFrame, alpha: float = 0.05) -> dict:
+    """
+    Returns the data of the critical difference diagram: the average ranks, the CD of the Nemenyi test and
+    the cliques of the frameworks whose ranks differ by less than the CD (the bars of the diagram).
+    """
+    average_ranks = _average_ranks(scores).sort_values()
+    critical_difference = nemenyi_critical_difference(scores.shape[1], scores.shape[0], alpha)
+    frameworks, ranks = list(average_ranks.index), average_ranks.values
+    cliques = []
+    for start in range(len(frameworks)):
+        end = start
+        while end + 1 < len(frameworks) and ranks[end + 1] - ranks[start] < critical_difference:
+            end += 1
+        # the clique inside the previous one is not drawn
+        if end > start and (not cliques or end > cliques[-1][1]):
+            cliques.append((start, end))
+    return {'average_ranks': average_ranks.to_dict(),
+            'critical_difference': float(critical_difference),
+            'cliques': [frameworks[start:end + 1] for start, end in cliques],
+            'n_datasets': scores.shape[0],
+            'alpha': alpha}
+
+
+def compare_frameworks(store: ResultsStore, campaign: Optional[str] = None,
+                       datasets: Optional[Sequence[str]] = None, frameworks: Optional[Sequence[str]] = None,
+                       metric_names: Sequence[str] = LEADERBOARD_METRICS, alpha: float = 0.05,
+                       rope: float = 0.01) -> dict:
+    """Runs all the tests over the stored results of the subset of the datasets and the frameworks."""
+    scores = score_matrix(store, metric_names, campaign, datasets, frameworks)
+    if scores.shape[0] < 2 or scores.shape[1] < 2:
+        raise ValueError(f'Tests need at least two frameworks on two complete datasets, got {scores.shape}')
+    return {'friedman': friedman_test(scores),
+            'critical_difference': critical_difference_data(scores, alpha),
+            'wilcoxon_holm': wilcoxon_holm(scores, alpha).to_dict('records'),
+            'bayesian_signed_rank': bayesian_signed_rank(scores, rope).to_dict('records')}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Significance of the differences between the frameworks')
+    parser.add_argument('--db', default=RESULTS_DB_FILE, help='results database file')
+    parser.add_argument('--campaign', help='name of the campaign, all the campaigns by default')
+    parser.add_argument('--datasets', nargs='+', help='compare on these datasets only')
+    parser.add_argument('--frameworks', nargs='+', help='compare these frameworks only')
+    parser.add_argument('--alpha', type=float, default=0.05, choices=list(NEMENYI_CRITICAL_VALUES))
+    parser.add_argument('--rope', type=float, default=0.01, help='region of practical equivalence of the metric')
+    args = parser.parse_args()
+
+    report = compare_frameworks(ResultsStore(args.db), args.campaign, args.datasets, args.frameworks,
+                                alpha=args.alpha, rope=args.rope)
+    print(json.dumps(report, indent=4, default=str))
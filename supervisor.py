@@ -0,0 +1,241 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import psutil
+
+from event_log import emit, get_event_log
+from instrumentation import PhaseHook, register_phase_hook
+
+# the supervised strategy and the processes started by it write their heartbeats to this file
+HEARTBEAT_FILE_ENV = 'BENCHMARK_HEARTBEAT_FILE'
+HEARTBEAT_MIN_INTERVAL_SECS = 1.0
+
+
+@dataclass
+class FairnessBudget:
+    """The equal CPU time budget and core allotment of every strategy in the fairness mode."""
+    cpu_secs: float
+    n_cores: int = 1
+    # the data loading and the prediction are not limited by the frameworks, so the tree is killed
+    # only after the budget is exceeded by this share
+    tolerance: float = 0.25
+
+    @property
+    def wall_mins(self) -> float:
+        # the frameworks limit the wall time, so they get the time the allotted cores need to spend the budget
+        return self.cpu_secs / self.n_cores / 60
+
+
+class CpuBudgetExceededError(RuntimeError):
+    pass
+
+
+class StrategyProcessError(RuntimeError):
+    pass
+
+
+class StrategyHungError(RuntimeError):
+    pass
+
+
+_last_heartbeat = (None, 0.0)
+
+
+def heartbeat(stage: str, **fields):
+    """Tells the watchdog of the supervisor that the strategy makes progress (e.g. a generation is completed)."""
+    global _last_heartbeat
+    file_path = os.environ.get(HEARTBEAT_FILE_ENV)
+    now = time.time()
+    # the frequent heartbeats of the same stage are thinned out
+    if not file_path or (stage == _last_heartbeat[0] and now - _last_heartbeat[1] < HEARTBEAT_MIN_INTERVAL_SECS):
+        return
+    _last_heartbeat = (stage, now)
+    with open(file_path, 'w') as file:
+        json.dump(dict(fields, stage=stage, pid=os.getpid(), ts=now), file, default=str)
+
+
+class HeartbeatPhaseHook(PhaseHook):
+    def on_phase_start(self, phase_name: str):
+        heartbeat(f'{phase_name}_start')
+
+    def on_phase_end(self, phase_name: str, timing: Dict[str, float]):
+        heartbeat(f'{phase_name}_end')
+
+
+def _last_heartbeat_stage(file_path: str) -> Optional[str]:
+    try:
+        with open(file_path, 'r') as file:
+            return json.load(file).get('stage')
+    except (OSError, ValueError):
+        return None
+
+
+def process_tree_cpu_secs(process: psutil.Process) -> float:
+    """Returns the CPU time of the process and all its descendants including the finished ones they waited for."""
+    cpu_secs = 0.0
+    for member in [process] + process.children(recursive=True):
+        try:
+            times = member.cpu_times()
+        except psutil.Error:
+            # the descendant has exited between the listing and the sampling
+            continue
+        cpu_secs += times.user + times.system + times.children_user + times.children_system
+    return cpu_secs
+
+
+class ProcessTreeCpuMonitor:
+    """
+    Measures the CPU time of the process and its descendants over the block. The descendants are sampled
+    in the background thread, so the servers started by the frameworks (e.g. the H2O JVM) are counted even if
+    they are shut down before the end of the block and never waited for by this process.
+    Use it as the context manager around the measured code, the result is in cpu_secs.
+    """
+
+    def __init__(self, interval_secs: float = 1.0):
+        self.interval_secs = interval_secs
+        self.cpu_secs = 0.0
+        self._process = psutil.Process()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._start_times = None
+        # (pid, create time) -> the CPU time of the descendant at the start and at its last sample
+        self._start_descendant_secs = {}
+        self._descendant_secs = {}
+
+    def _sample_descendants(self) -> dict:
+        descendant_secs = {}
+        for descendant in self._process.children(recursive=True):
+            try:
+                times = descendant.cpu_times()
+                descendant_secs[(descendant.pid, descendant.create_time())] = times.user + times.system
+            except psutil.Error:
+                # the descendant has exited between the listing and the sampling
+                continue
+        return descendant_secs
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_secs):
+            self._descendant_secs.update(self._sample_descendants())
+
+    def __enter__(self):
+        self._start_times = os.times()
+        self._start_descendant_secs = self._sample_descendants()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop_event.set()
+        self._thread.join()
+        self._descendant_secs.update(self._sample_descendants())
+        times = os.times()
+        own_secs = times.user + times.system - self._start_times.user - self._start_times.system
+        waited_secs = own_secs + times.children_user + times.children_system - \
+            self._start_times.children_user - self._start_times.children_system
+        polled_secs = own_secs + sum(cpu_secs - self._start_descendant_secs.get(key, 0.0)
+                                     for key, cpu_secs in self._descendant_secs.items())
+        # the rusage of the waited children is exact, the samples cover the descendants nobody has waited for
+        self.cpu_secs = max(waited_secs, polled_secs)
+
+
+def kill_process_tree(process: psutil.Process):
+    try:
+        members = process.children(recursive=True) + [process]
+    except psutil.NoSuchProcess:
+        return
+    for member in members:
+        try:
+            member.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(members, timeout=10)
+
+
+def _children_cpu_secs() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def _run_in_child(connection, func: Callable[[], object], heartbeat_file: str):
+    os.environ[HEARTBEAT_FILE_ENV] = heartbeat_file
+    register_phase_hook(HeartbeatPhaseHook())
+    try:
+        connection.send(('ok', func()))
+    except BaseException as ex:
+        connection.send(('error', f'{ex!r}\n{traceback.format_exc()}'))
+    finally:
+        # the forked child exits without the exit handlers, so its buffered events are written here
+        event_log = get_event_log()
+        if event_log is not None:
+            event_log.flush()
+        connection.close()
+
+
+def run_supervised(func: Callable[[], object], budget: Optional[FairnessBudget] = None,
+                   heartbeat_timeout_secs: Optional[float] = None,
+                   poll_interval_secs: float = 1.0) -> Tuple[object, dict]:
+    """
+    Runs the function in the child process and kills the whole process tree once its CPU time exceeds the budget
+    or the watchdog gets no heartbeat from it for the timeout. The phases of the strategy send the heartbeats,
+    the frameworks send them on their own progress (generations, trials, epochs) with the heartbeat function.
+    Returns the result of the function and the CPU and wall time consumed by the tree.
+    """
+    file_descriptor, heartbeat_file = tempfile.mkstemp(prefix='heartbeat_', suffix='.json')
+    os.close(file_descriptor)
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    child = context.Process(target=_run_in_child, args=(sender, func, heartbeat_file))
+    start_wall, start_children_cpu = time.perf_counter(), _children_cpu_secs()
+    child.start()
+    sender.close()
+    process = psutil.Process(child.pid)
+    cpu_limit_secs = budget.cpu_secs * (1 + budget.tolerance) if budget else None
+
+    message, status, polled_cpu_secs, silence_secs = None, 'ok', 0.0, 0.0
+    while message is None:
+        if receiver.poll(poll_interval_secs):
+            try:
+                message = receiver.recv()
+            except EOFError:
+                message = ('error', f'Strategy process has exited with the code {child.exitcode}')
+            break
+        try:
+            polled_cpu_secs = max(polled_cpu_secs, process_tree_cpu_secs(process))
+        except psutil.NoSuchProcess:
+            pass
+        if cpu_limit_secs is not None and polled_cpu_secs > cpu_limit_secs:
+            status = 'cpu_budget_exceeded'
+            kill_process_tree(process)
+            break
+        silence_secs = time.time() - os.path.getmtime(heartbeat_file)
+        if heartbeat_timeout_secs is not None and silence_secs > heartbeat_timeout_secs:
+            status = 'hung'
+            kill_process_tree(process)
+            break
+    child.join()
+    last_stage = _last_heartbeat_stage(heartbeat_file)
+    os.remove(heartbeat_file)
+
+    # the rusage of the joined child is exact, the polled one covers the descendants it has not waited for
+    usage = {'status': status,
+             'cpu_secs': round(max(_children_cpu_secs() - start_children_cpu, polled_cpu_secs), 3),
+             'wall_secs': round(time.perf_counter() - start_wall, 3),
+             'cpu_budget_secs': budget.cpu_secs if budget else None,
+             'n_cores': budget.n_cores if budget else None}
+    if status == 'cpu_budget_exceeded':
+        raise CpuBudgetExceededError(f'Strategy has used {usage["cpu_secs"]} CPU-seconds '
+                                     f'of the {budget.cpu_secs} budget')
+    if status == 'hung':
+        emit('watchdog_kill', silence_secs=round(silence_secs, 1), last_stage=last_stage, flush=True, **usage)
+        raise StrategyHungError(f'Strategy has sent no heartbeat for {round(silence_secs)} s '
+                                f'after {last_stage or "the start"}, its process tree is killed')
+    if message[0] == 'error':
+        raise StrategyProcessError(message[1])
+    return message[1], usage
@@ -1,15 +1,31 @@
+import argparse
+import json
+import traceback
+from functools import partial
 from pathlib import Path
+from typing import Dict, List, Optional
 
 import pandas as pd
 from pmlb import classification_dataset_names, fetch_data, regression_dataset_names
 from pmlb.update_dataset_files import compute_imbalance
 
 from benchmark_model_types import BenchmarkModelTypesEnum
-from benchmark_utils import \
-    (convert_json_stats_to_csv, get_models_hyperparameters,
-     get_penn_case_data_paths, save_metrics_result_file)
+from benchmark_utils import get_dataset_shape, get_penn_case_data_paths, project_root
+from campaign import CampaignDataset, CampaignUnit, assign_shards, estimate_unit_cost, merge_shard_results, \
+    parse_shard_spec, run_campaign_unit, save_shard_results
+from event_log import configure_event_log, emit
 from executor import CaseExecutor, ExecutionParams
 from fedot.core.repository.tasks import TaskTypesEnum
+from leaderboard import Leaderboard
+from profiling import ProfilerTypeEnum
+from racing import successive_halving
+from results_store import ResultsStore
+from scheduler import CampaignScheduler
+from supervisor import FairnessBudget
+
+CAMPAIGN_MODELS = [BenchmarkModelTypesEnum.baseline,
+                   BenchmarkModelTypesEnum.fedot,
+                   BenchmarkModelTypesEnum.tpot]
 
 
 def _problem_and_metric_for_dataset(name_of_dataset: str, num_classes: int):
@@ -23,7 +39,7 @@ def _problem_and_metric_for_dataset(name_of_dataset: str, num_classes: int):
         return None, None
 
 
-if __name__ == '__main__':
+def get_campaign_dataset_names() -> List[str]:
     penn_data = Path('./datasets.csv')
     dataset = []
     if penn_data.is_file():
@@ -34,40 +50,215 @@ if __name__ == '__main__':
 
     if len(dataset) == 0:
         dataset = classification_dataset_names + regression_dataset_names
+    return list(dataset)
+
+
+def prepare_campaign_dataset(name_of_dataset: str) -> Optional[CampaignDataset]:
+    try:
+        pmlb_data = fetch_data(name_of_dataset)
+    except ValueError as ex:
+        print(ex)
+        return None
+    imbalance_report = compute_imbalance(pmlb_data['target'].values.tolist())
+    num_classes = imbalance_report[0]
+    problem_class, metric_names = _problem_and_metric_for_dataset(name_of_dataset, num_classes)
+    if not problem_class or not metric_names:
+        print(f'Incorrect dataset: {name_of_dataset}')
+        return None
+
+    train_file, test_file = get_penn_case_data_paths(name_of_dataset)
+    n_rows, n_features = get_dataset_shape(train_file)
+    return CampaignDataset(name=name_of_dataset, train_file=train_file, test_file=test_file,
+                           task=problem_class, metric_list=metric_names,
+                           n_rows=n_rows, n_features=n_features)
+
+
+def run_racing_campaign(dataset: List[str], min_timedelta: int, max_timedelta: int, eta: int):
+    campaign_datasets = [prepared for prepared in map(prepare_campaign_dataset, dataset) if prepared]
+    racing_result = successive_halving(campaign_datasets, min_timedelta=min_timedelta,
+                                       max_timedelta=max_timedelta, eta=eta)
+    print(f'Final ranking: {racing_result["ranking"]}')
+    print(f'CPU-hours spent: {racing_result["cpu_hours_spent"]}, '
+          f'saved compared with the full grid: {racing_result["cpu_hours_saved"]}')
+    with open('penn_ml_racing_result.json', 'w') as file:
+        json.dump(racing_result, file, indent=4)
+
+
+def load_pmlb_metadata() -> pd.DataFrame:
+    summary_stats_path = Path(project_root(), 'test_cases', 'penn_ml', 'datasets', 'all_summary_stats.tsv')
+    return pd.read_csv(summary_stats_path, sep='\t').set_index('dataset')
+
+
+def get_unit_costs(units: List[CampaignUnit], metadata: pd.DataFrame) -> Dict[CampaignUnit, float]:
+    costs = {}
+    for unit in units:
+        if unit.dataset in metadata.index:
+            # the half of the instances goes to the train split
+            n_rows = int(metadata.loc[unit.dataset, 'n_instances']) // 2
+            n_features = int(metadata.loc[unit.dataset, 'n_features'])
+        else:
+            n_rows, n_features = None, None
+        costs[unit] = estimate_unit_cost(BenchmarkModelTypesEnum[unit.framework], n_rows, n_features)
+    return costs
+
+
+def _run_prepared_unit(campaign_datasets: Dict[str, CampaignDataset], unit: CampaignUnit,
+                       profiler: Optional[ProfilerTypeEnum] = None,
+                       profiled_models: Optional[List[BenchmarkModelTypesEnum]] = None,
+                       measure_inference: bool = False, fairness: Optional[FairnessBudget] = None,
+                       cores_per_strategy: Optional[int] = None, pin_cores: bool = False,
+                       heartbeat_timeout_secs: Optional[float] = None, results_db: Optional[str] = None,
+                       force_rerun: bool = False) -> dict:
+    model_type = BenchmarkModelTypesEnum[unit.framework]
+    if profiled_models and model_type not in profiled_models:
+        profiler = None
+    return run_campaign_unit(campaign_datasets[unit.dataset], model_type, timedelta=unit.timedelta, seed=unit.seed,
+                             profiler=profiler, measure_inference=measure_inference, fairness=fairness,
+                             cores_per_strategy=cores_per_strategy, pin_cores=pin_cores,
+                             heartbeat_timeout_secs=heartbeat_timeout_secs, results_db=results_db,
+                             force_rerun=force_rerun)
+
+
+def run_unit_campaign(dataset: List[str], shard_spec: str = '1/1', seeds: Optional[List[int]] = None,
+                      n_workers: int = 1, memory_limit_mb: Optional[float] = None,
+                      profiler: Optional[ProfilerTypeEnum] = None,
+                      profiled_models: Optional[List[BenchmarkModelTypesEnum]] = None,
+                      measure_inference: bool = False, fairness: Optional[FairnessBudget] = None,
+                      cores_per_strategy: Optional[int] = None, pin_cores: bool = False,
+                      heartbeat_timeout_secs: Optional[float] = None, campaign: str = 'default',
+                      force_rerun: bool = False):
+    shard_index, n_shards = parse_shard_spec(shard_spec)
+    units = [CampaignUnit(dataset=name_of_dataset, framework=model_type.name, seed=seed)
+             for name_of_dataset in dataset for model_type in CAMPAIGN_MODELS for seed in (seeds or [None])]
+    shard_units = assign_shards(units, get_unit_costs(units, load_pmlb_metadata()), n_shards)[shard_index]
+    print(f'Shard {shard_spec}: {len(shard_units)} of {len(units)} units')
 
+    # the datasets are split once before the workers start to share the files
+    campaign_datasets = {}
+    for name_of_dataset in sorted({unit.dataset for unit in shard_units}):
+        campaign_dataset = prepare_campaign_dataset(name_of_dataset)
+        if campaign_dataset:
+            campaign_datasets[name_of_dataset] = campaign_dataset
+    shard_units = [unit for unit in shard_units if unit.dataset in campaign_datasets]
+    unit_sizes = {unit: (campaign_datasets[unit.dataset].n_rows, campaign_datasets[unit.dataset].n_features)
+                  for unit in shard_units}
+
+    results_file_name = f'penn_ml_shard_{shard_index + 1}_of_{n_shards}.json'
+    unit_results = []
+    store = ResultsStore()
+    leaderboard = Leaderboard()
+
+    def _save_unit_result(unit_result: dict):
+        # the file is rewritten after every unit to keep the progress of the interrupted shard
+        unit_results.append(unit_result)
+        save_shard_results(unit_results, results_file_name)
+        store.add_unit_result(unit_result, campaign)
+        leaderboard.add_unit_result(unit_result)
+        leaderboard.table().to_csv(f'penn_ml_live_leaderboard_{shard_index + 1}_of_{n_shards}.csv', index=False)
+
+    unit_func = partial(_run_prepared_unit, campaign_datasets, profiler=profiler, profiled_models=profiled_models,
+                        measure_inference=measure_inference, fairness=fairness,
+                        cores_per_strategy=cores_per_strategy, pin_cores=pin_cores,
+                        heartbeat_timeout_secs=heartbeat_timeout_secs, results_db=store.file_path,
+                        force_rerun=force_rerun)
+    scheduler = CampaignScheduler(unit_func, unit_sizes, n_workers=n_workers, memory_limit_mb=memory_limit_mb)
+    scheduler.run(shard_units, on_result=_save_unit_result)
+    store.close()
+
+
+def run_full_campaign(dataset: List[str], seeds: Optional[List[int]] = None, n_workers: int = 1,
+                      profiler: Optional[ProfilerTypeEnum] = None,
+                      profiled_models: Optional[List[BenchmarkModelTypesEnum]] = None,
+                      measure_inference: bool = False, fairness: Optional[FairnessBudget] = None,
+                      cores_per_strategy: Optional[int] = None, pin_cores: bool = False,
+                      heartbeat_timeout_secs: Optional[float] = None, campaign: str = 'default',
+                      force_rerun: bool = False):
+    store = ResultsStore()
     for name_of_dataset in dataset:
-        try:
-            pmlb_data = fetch_data(name_of_dataset)
-        except ValueError as ex:
-            print(ex)
-            continue
-        imbalance_report = compute_imbalance(pmlb_data['target'].values.tolist())
-        num_classes = imbalance_report[0]
-        problem_class, metric_names = _problem_and_metric_for_dataset(name_of_dataset, num_classes)
-        if not problem_class or not metric_names:
-            print(f'Incorrect dataset: {name_of_dataset}')
+        campaign_dataset = prepare_campaign_dataset(name_of_dataset)
+        if not campaign_dataset:
             continue
 
-        train_file, test_file = get_penn_case_data_paths(name_of_dataset)
-        config_models_data = get_models_hyperparameters()
-        case_name = f'penn_ml_{name_of_dataset}'
-
         try:
-            result_metrics = CaseExecutor(params=ExecutionParams(train_file=train_file,
-                                                                 test_file=test_file,
-                                                                 task=problem_class,
+            result_metrics = CaseExecutor(params=ExecutionParams(train_file=campaign_dataset.train_file,
+                                                                 test_file=campaign_dataset.test_file,
+                                                                 task=campaign_dataset.task,
                                                                  target_name='target',
-                                                                 case_label=case_name),
-                                          models=[BenchmarkModelTypesEnum.baseline,
-                                                  BenchmarkModelTypesEnum.fedot,
-                                                  BenchmarkModelTypesEnum.tpot],
-                                          metric_list=metric_names).execute()
+                                                                 case_label=campaign_dataset.case_label),
+                                          models=CAMPAIGN_MODELS,
+                                          metric_list=campaign_dataset.metric_list,
+                                          seeds=seeds, n_workers=n_workers,
+                                          profiler=profiler, profiled_models=profiled_models,
+                                          measure_inference=measure_inference, fairness=fairness,
+                                          cores_per_strategy=cores_per_strategy, pin_cores=pin_cores,
+                                          heartbeat_timeout_secs=heartbeat_timeout_secs,
+                                          results_db=store.file_path, force_rerun=force_rerun).execute()
         except Exception as ex:
             print(f'Exception on {name_of_dataset}: {ex}')
+            emit('failure', dataset=name_of_dataset, error=repr(ex), traceback=traceback.format_exc(), flush=True)
+            store.add_failed_case(name_of_dataset, [model_type.name for model_type in CAMPAIGN_MODELS], repr(ex),
+                                  campaign)
             continue
 
-        result_metrics['hyperparameters'] = config_models_data
+        store.add_case_result(result_metrics, name_of_dataset, campaign)
+
+    store.export_csv(campaign=campaign)
+    store.close()
 
-        save_metrics_result_file(result_metrics, file_name=f'penn_ml_metrics_for_{name_of_dataset}')
 
-    convert_json_stats_to_csv(dataset)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PMLB benchmark campaign')
+    parser.add_argument('--racing', action='store_true',
+                        help='race all the frameworks with successive halving of the time budget')
+    parser.add_argument('--min-timedelta', type=int, default=2, help='budget of the first racing rung, min')
+    parser.add_argument('--max-timedelta', type=int, default=30, help='budget of the last racing rung, min')
+    parser.add_argument('--eta', type=int, default=3, help='budget growth and survivors reduction factor')
+    parser.add_argument('--seeds', type=int, nargs='+', help='run every framework once per seed')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes for the seeded runs or the campaign units')
+    parser.add_argument('--schedule', action='store_true',
+                        help='run the campaign units on the workers in the longest-processing-time-first order')
+    parser.add_argument('--memory-limit', type=float,
+                        help='memory of the node in MB to pack the scheduled units by their observed peak memory')
+    parser.add_argument('--shard', help='run only the shard i of N of the campaign units, i.e. 2/4')
+    parser.add_argument('--merge', nargs='+', help='combine the result files of the shards into the leaderboard')
+    parser.add_argument('--trace-dir', help='directory for the jsonl event traces of the workers')
+    parser.add_argument('--profile', choices=[profiler_type.value for profiler_type in ProfilerTypeEnum],
+                        help='run the strategies under the profiler and save the profiles to the profiles directory')
+    parser.add_argument('--profile-models', nargs='+', choices=[model_type.name for model_type in CAMPAIGN_MODELS],
+                        help='profile only these frameworks')
+    parser.add_argument('--inference', action='store_true',
+                        help='measure the prediction latency, throughput, load time and size of the fitted models')
+    parser.add_argument('--cpu-budget', type=float,
+                        help='fairness mode: equal budget of CPU-seconds for every framework run')
+    parser.add_argument('--cores', type=int,
+                        help='cores allotted to every framework run to limit the threads of all the libraries')
+    parser.add_argument('--pin-cores', action='store_true',
+                        help='pin the concurrent framework runs to the separate cores of their allotments')
+    parser.add_argument('--heartbeat-timeout', type=float,
+                        help='kill the framework runs that send no heartbeat for this number of seconds')
+    parser.add_argument('--campaign', default='default', help='name of the campaign in the results database')
+    parser.add_argument('--force-rerun', action='store_true',
+                        help='run the units again even if their results are already in the results database')
+    args = parser.parse_args()
+
+    fairness = FairnessBudget(cpu_secs=args.cpu_budget, n_cores=args.cores or 1) if args.cpu_budget else None
+    profiler = ProfilerTypeEnum(args.profile) if args.profile else None
+    profiled_models = [BenchmarkModelTypesEnum[name] for name in args.profile_models or []]
+
+    if args.trace_dir:
+        configure_event_log(args.trace_dir)
+
+    if args.merge:
+        print(merge_shard_results(args.merge))
+    elif args.shard or args.schedule:
+        run_unit_campaign(get_campaign_dataset_names(), args.shard or '1/1', args.seeds, args.workers,
+                          args.memory_limit, profiler, profiled_models, args.inference, fairness,
+                          args.cores, args.pin_cores, args.heartbeat_timeout, args.campaign,
+                          args.force_rerun)
+    elif args.racing:
+        run_racing_campaign(get_campaign_dataset_names(), args.min_timedelta, args.max_timedelta, args.eta)
+    else:
+        run_full_campaign(get_campaign_dataset_names(), args.seeds, args.workers, profiler, profiled_models,
+                          args.inference, fairness, args.cores, args.pin_cores, args.heartbeat_timeout,
+                          args.campaign, args.force_rerun)
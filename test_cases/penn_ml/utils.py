@@ -1,15 +1,17 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import json
 import os
 import seaborn as sns
-from typing import Tuple
-from experiments.viz import viz_hv_comparison, viz_pareto_fronts_comparison
+from typing import List, Optional, Sequence, Tuple
+from experiments.history_columns import columns_mtime, export_history_columns, history_columns_dir, \
+    open_history_columns
+from experiments.history_log import composer_generations
+from experiments.viz import viz_hv_by_archive_fitness, viz_pareto_fronts_comparison
 from experiments.gp_operators_experiment import results_preprocess_and_quality_visualisation
 from fedot.core.repository.tasks import Task, TaskTypesEnum
-from fedot.core.composer.optimisers.multi_objective_fitness import MultiObjFitness
 from fedot.core.composer.visualisation import ComposerVisualiser
-from experiments.multi_objective_schemes_experiment import extract_quality_list
 
 
 def viz_pareto_fronts_by_iteration(fronts, labels, objectives_order=(1, 0),
@@ -41,16 +43,72 @@ def viz_pareto_fronts_by_iteration(fronts, labels, objectives_order=(1, 0),
     plt.show()
 
 
+class ExperimentSummary(Sequence):
+    """
+    The summaries of the runs of the experiment: the last Pareto front, the quality history and the archive
+    fitness. The summary of a run is computed from the memory-mapped columns only when it is requested.
+    With the cache file the summaries are kept on disk until the columns are exported again, the computed
+    summaries are written to it by write_cache.
+    """
+
+    def __init__(self, columns_dir: str, runs: int, task: Task, cache_file: Optional[str] = None):
+        self.columns_dir = columns_dir
+        self.runs = runs
+        self.task = task
+        self.cache_file = cache_file
+        self.mtime = columns_mtime(columns_dir)
+        self._cache_key = [self.mtime, str(task.task_type)]
+        self._summaries = self._read_cache()
+        self._is_cache_stale = False
+
+    def _read_cache(self) -> dict:
+        if self.cache_file and os.path.isfile(self.cache_file):
+            with open(self.cache_file) as file:
+                cache = json.load(file)
+            if cache['key'] == self._cache_key:
+                return {int(run): summary for run, summary in cache['runs'].items()}
+        return {}
+
+    def write_cache(self):
+        if self.cache_file and self._is_cache_stale:
+            with open(self.cache_file, 'w') as file:
+                json.dump({'key': self._cache_key, 'runs': self._summaries}, file)
+            self._is_cache_stale = False
+
+    def __len__(self):
+        return self.runs
+
+    def __getitem__(self, index: int) -> dict:
+        if not isinstance(index, (int, np.integer)) or isinstance(index, bool):
+            raise TypeError(f'Run summaries are indexed by int, not {type(index).__name__}')
+        run = range(1, self.runs + 1)[index]
+        if run not in self._summaries:
+            run_history = open_history_columns(self.columns_dir).run_history(run)
+            self._summaries[run] = {'pareto_front': run_history.last_pareto_front(task=self.task),
+                                    'quality_history': run_history.quality_history(
+                                        task=self.task, with_archive=run_history.has_archive),
+                                    'archive_fitness': run_history.archive_fitness()}
+            self._is_cache_stale = True
+        return self._summaries[run]
+
+
 class PMLB_report():
 
     def __init__(self,
                  labels: list,
                  runs: int,
-                 datasets: list, task: Task):
+                 datasets: list, task: Task, summary_cache_dir: Optional[str] = None,
+                 history_dir: Optional[str] = None):
         self.labels = labels
         self.runs = runs
         self.datasets = datasets
         self.task = task
+        self.summary_cache_dir = summary_cache_dir
+        # the directory of the columns exported by run_multi_obj_exp, by default the one it exports to
+        self.history_dir = history_dir
+        # the summaries and the rendered Pareto plots are reused while the columns of the experiment are not changed
+        self._summaries = {}
+        self._rendered_paretos = set()
 
     def choose_clf_datasets(self):
         summary_stats = pd.read_csv(r'./datasets/all_summary_stats.tsv', sep='\t')
@@ -63,47 +121,61 @@ class PMLB_report():
         df = pd.read_csv(path, names=names, sep=',')
         return df
 
-    def get_experiment_report(self):
-        composers = []
+    def get_experiment_report(self) -> List[ExperimentSummary]:
+        experiment_summaries = []
         for name_of_dataset in self.datasets:
             for label in self.labels:
-                composer_list = []
-                for i in range(self.runs):
-                    tmp_folder = str(i + 1) + '_experiment'
-                    path = f'D:\результаты экспериментов\{name_of_dataset}\{tmp_folder}\{name_of_dataset}_{label}_run_number_{i + 1}_composer_history.npy'
-                    massive = np.load(path, allow_pickle=True)
-                    composer = massive[0]
-                    composer_list.append(composer)
-
-                self.viz_pareto(composer_list, name_of_dataset, self.runs, label)
-                composers.append(composer_list)
-        return composers
+                summary = self.experiment_summary(name_of_dataset, label)
+                if (summary.columns_dir, summary.mtime) not in self._rendered_paretos:
+                    self.viz_pareto(summary, name_of_dataset, self.runs, label)
+                    self._rendered_paretos.add((summary.columns_dir, summary.mtime))
+                experiment_summaries.append(summary)
+        # the summaries computed for the plots are written once per experiment
+        for summary in experiment_summaries:
+            summary.write_cache()
+        return experiment_summaries
+
+    def load_composer(self, name_of_dataset: str, label: str, run: int):
+        tmp_folder = str(run) + '_experiment'
+        file_name = f'{name_of_dataset}_{label}_run_number_{run}_composer_history.npy'
+        path = f'D:\результаты экспериментов\{name_of_dataset}\{tmp_folder}\{file_name}'
+        massive = np.load(path, allow_pickle=True)
+        return massive[0]
+
+    def experiment_summary(self, name_of_dataset: str, label: str) -> ExperimentSummary:
+        columns_dir = history_columns_dir(name_of_dataset, label, self.history_dir)
+        if not os.path.isdir(columns_dir):
+            # the pickled composers are read once and exported to the columns, which are read by the next reports
+            runs = ((run, composer_generations(self.load_composer(name_of_dataset, label, run)))
+                    for run in range(1, self.runs + 1))
+            export_history_columns(columns_dir, runs)
+        key = (columns_dir, columns_mtime(columns_dir))
+        if key not in self._summaries:
+            cache_file = None
+            if self.summary_cache_dir:
+                os.makedirs(self.summary_cache_dir, exist_ok=True)
+                cache_file = os.path.join(self.summary_cache_dir, f'{name_of_dataset}_{label}_summary.json')
+            self._summaries[key] = ExperimentSummary(columns_dir, self.runs, self.task, cache_file=cache_file)
+        return self._summaries[key]
 
     def viz_pareto(self,
-                   composer_list: list,
+                   summary: ExperimentSummary,
                    name_of_dataset: str,
                    runs: int,
                    label: str, relative_complexity: bool = False):
 
         runs = [str(i) + '_iteration' for i in range(1, runs + 1)]
-        pareto_fronts_metrics = self.get_pareto_data(selected_composers=composer_list,
+        pareto_fronts_metrics = self.get_pareto_data(selected_runs=summary,
                                                      relative_complexity=relative_complexity)
         viz_pareto_fronts_by_iteration(pareto_fronts_metrics, labels=runs,
                                        name_of_dataset=name_of_dataset + "_" + label)
 
-    def get_pareto_data(self, selected_composers, relative_complexity):
+    def get_pareto_data(self, selected_runs: Sequence[dict], relative_complexity):
         pareto_fronts_metrics = []
         compl_metrics = []
         quality_metrics = []
-        for comp_num, composer in enumerate(selected_composers):
-            archive_len = len(composer.history.archive_history)
-            pareto_front = composer.history.archive_history[archive_len - 1]
-            if type(composer.history.individuals[0][0].fitness) is MultiObjFitness:
-                quality_list = extract_quality_list(task=self.task, pop=pareto_front)
-                complexity_list = [ind.fitness.values[1] for ind in pareto_front]
-            else:
-                quality_list = extract_quality_list(task=self.task, pop=pareto_front)
-                complexity_list = [ind.computation_time for ind in pareto_front]
+        for run_summary in selected_runs:
+            quality_list, complexity_list = run_summary['pareto_front']
 
             if not relative_complexity:
                 pareto_fronts_metrics.append([quality_list, complexity_list])
@@ -127,15 +199,19 @@ class PMLB_report():
         if pareto_run_numbers is None:
             pareto_run_numbers = tuple([1 for _ in range(len(self.labels))])
         all_history_report = self.get_experiment_report()
-        selected_composers = [all_history_report[exp_num][front_num] for exp_num, front_num in
-                              enumerate(pareto_run_numbers)]
+        selected_runs = [all_history_report[exp_num][front_num] for exp_num, front_num in
+                         enumerate(pareto_run_numbers)]
 
-        pareto_fronts_metrics = self.get_pareto_data(selected_composers=selected_composers,
+        pareto_fronts_metrics = self.get_pareto_data(selected_runs=selected_runs,
                                                      relative_complexity=relative_complexity)
 
         if print_pareto_chains:
             if not relative_complexity:
                 max_compl = None
+            # only the pickled composers hold the chains to draw
+            experiments = [(dataset, label) for dataset in self.datasets for label in self.labels]
+            selected_composers = [self.load_composer(*experiments[exp_num], front_num + 1) for exp_num, front_num in
+                                  enumerate(pareto_run_numbers)]
             self.pareto_chains_viz(selected_composers=selected_composers, relative_complexity=relative_complexity,
                                    max_compl=max_compl)
 
@@ -160,26 +236,17 @@ class PMLB_report():
 
     def viz_hv(self, iterations: int, labels: Tuple, color_pallete=sns.color_palette('Dark2'), name_of_dataset='None'):
         all_history_report = self.get_experiment_report()
+        archive_fitness = [[run_summary['archive_fitness'] for run_summary in exp] for exp in all_history_report]
 
-        viz_hv_comparison(labels=labels, all_history_report=all_history_report, name_of_dataset=name_of_dataset,
-                          color_pallete=color_pallete, iterations=iterations)
+        viz_hv_by_archive_fitness(labels=labels, archive_fitness=archive_fitness, name_of_dataset=name_of_dataset,
+                                  color_pallete=color_pallete, iterations=iterations)
 
     def viz_best_quality_comparison(self, iterations, xy_labels: Tuple, name_of_dataset='None'):
         all_history_report = self.get_experiment_report()
         history_quality_gp = [[] for _ in range(len(self.labels))]
         for exp_num, exp in enumerate(all_history_report):
-            for comp_num, composer in enumerate(exp):
-                if all_history_report[exp_num][comp_num].history.archive_history:
-                    historical_quality = [extract_quality_list(pop=pop, task=self.task) + extract_quality_list(
-                        pop=composer.history.archive_history[i], task=self.task) for i, pop in
-                                          enumerate(composer.history.individuals)]
-                    history_quality_gp[exp_num].append(historical_quality)
-
-                else:
-                    historical_quality = [
-                        [chain.fitness if self.task.task_type == TaskTypesEnum.regression else -chain.fitness for chain
-                         in pop] for pop in composer.history.individuals]
-                    history_quality_gp[exp_num].append(historical_quality)
+            for run_summary in exp:
+                history_quality_gp[exp_num].append(run_summary['quality_history'])
         results_preprocess_and_quality_visualisation(history_gp=history_quality_gp, labels=self.labels,
                                                      iterations=iterations, name_of_dataset=name_of_dataset,
                                                      task=self.task)
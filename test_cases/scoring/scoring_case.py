@@ -1,9 +1,19 @@
+import argparse
+
 from benchmark_model_types import BenchmarkModelTypesEnum
-from benchmark_utils import get_models_hyperparameters, save_metrics_result_file, get_scoring_case_data_paths
+from benchmark_utils import save_metrics_result_file, get_scoring_case_data_paths
 from executor import CaseExecutor, ExecutionParams
 from fedot.core.repository.tasks import TaskTypesEnum
+from results_store import RESULTS_DB_FILE, ResultsStore
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seeds', type=int, nargs='+', help='run every framework once per seed')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes for the seeded runs')
+    parser.add_argument('--force-rerun', action='store_true',
+                        help='run the frameworks again even if their results are already in the results database')
+    args = parser.parse_args()
+
     train_file, test_file = get_scoring_case_data_paths()
 
     result_metrics = CaseExecutor(params=ExecutionParams(train_file=train_file,
@@ -14,8 +24,11 @@ if __name__ == '__main__':
                                   models=[BenchmarkModelTypesEnum.baseline,
                                           BenchmarkModelTypesEnum.tpot,
                                           BenchmarkModelTypesEnum.fedot],
-                                  metric_list=['roc_auc', 'f1']).execute()
-
-    result_metrics['hyperparameters'] = get_models_hyperparameters()
+                                  metric_list=['roc_auc', 'f1'],
+                                  seeds=args.seeds, n_workers=args.workers,
+                                  results_db=RESULTS_DB_FILE, force_rerun=args.force_rerun).execute()
 
     save_metrics_result_file(result_metrics, file_name='scoring_metrics')
+    results_store = ResultsStore()
+    results_store.add_case_result(result_metrics, dataset='scoring', campaign='scoring')
+    results_store.close()
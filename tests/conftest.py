@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# the benchmark modules are imported from the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_store import ResultsStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    results_store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    yield results_store
+    results_store.close()
+
+
+def add_scores(store: ResultsStore, campaign: str, scores: dict, metric_name: str = 'roc_auc', **fields):
+    """Writes a run per (dataset, framework, seed) key of the scores, the None score is a failed run."""
+    for (dataset, framework, seed), score in scores.items():
+        store.add_unit_result(dict({'dataset': dataset, 'framework': framework, 'seed': seed,
+                                    'metrics': None if score is None else {metric_name: score}}, **fields), campaign)
@@ -0,0 +1,48 @@
+from campaign_diff import diff_campaigns
+from conftest import add_scores
+
+DATASETS = ['first', 'second', 'third']
+FRAMEWORKS = ['fedot', 'tpot', 'baseline']
+SEEDS = [0, 1, 2]
+
+
+def campaign_scores(noise: float = 0.01) -> dict:
+    return {(dataset, framework, seed): 0.8 + noise * ((seed + dataset_num + framework_num) % 3 - 1)
+            for dataset_num, dataset in enumerate(DATASETS)
+            for framework_num, framework in enumerate(FRAMEWORKS)
+            for seed in SEEDS}
+
+
+def store_with(store, before: dict, after: dict):
+    add_scores(store, 'before', before)
+    add_scores(store, 'after', after)
+    return store
+
+
+def test_no_significant_change_gives_empty_metric_changes(store):
+    diff = diff_campaigns(store_with(store, campaign_scores(), campaign_scores()), 'before', 'after')
+
+    assert diff['n_aligned_units'] == 27
+    assert diff['metric_changes'].empty
+    assert diff['new_failures'].empty
+
+
+def test_significant_drop_is_reported(store):
+    before = campaign_scores()
+    after = campaign_scores()
+    for seed in SEEDS:
+        after[('first', 'fedot', seed)] -= 0.2
+
+    changes = diff_campaigns(store_with(store, before, after), 'before', 'after')['metric_changes']
+
+    assert changes[['dataset', 'framework']].values.tolist() == [['first', 'fedot']]
+    assert changes['difference'].iloc[0] < 0
+
+
+def test_new_failure_is_reported(store):
+    after = campaign_scores()
+    after[('second', 'tpot', 0)] = None
+
+    failures = diff_campaigns(store_with(store, campaign_scores(), after), 'before', 'after')['new_failures']
+
+    assert failures[['dataset', 'framework', 'seed']].values.tolist() == [['second', 'tpot', 0]]
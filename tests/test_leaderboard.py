@@ -0,0 +1,51 @@
+from conftest import add_scores
+from leaderboard import Leaderboard, TABLE_COLUMNS
+
+
+def test_empty_leaderboard_has_columns_and_no_rows(store):
+    leaderboard = Leaderboard()
+    leaderboard.refresh(store, 'nope')
+
+    table = leaderboard.table()
+
+    assert table.empty
+    assert list(table.columns) == TABLE_COLUMNS
+
+
+def test_ranks_wins_and_failures(store):
+    add_scores(store, 'campaign', {('first', 'fedot', 0): 0.9, ('first', 'baseline', 0): 0.8,
+                                   ('second', 'fedot', 0): None, ('second', 'baseline', 0): 0.7})
+    leaderboard = Leaderboard()
+    leaderboard.refresh(store, 'campaign')
+
+    table = leaderboard.table().set_index('framework')
+
+    assert table.loc['fedot', 'average_rank'] == 1.5
+    assert table.loc['baseline', 'average_rank'] == 1.5
+    assert table.loc['fedot', ['wins', 'ties', 'losses']].tolist() == [1, 0, 1]
+    assert table.loc['fedot', 'failure_rate'] == 0.5
+    assert table.loc['fedot', 'normalised_score'] == (0.9 - 0.8) / 0.8
+
+
+def test_refresh_adds_only_new_runs(store):
+    leaderboard = Leaderboard()
+    add_scores(store, 'campaign', {('first', 'fedot', 0): 0.9, ('first', 'baseline', 0): 0.8})
+    leaderboard.refresh(store, 'campaign')
+    add_scores(store, 'campaign', {('first', 'fedot', 1): 0.5})
+    leaderboard.refresh(store, 'campaign')
+
+    incremental = leaderboard.table()
+    rebuilt = Leaderboard()
+    rebuilt.refresh(store, 'campaign')
+
+    assert incremental.equals(rebuilt.table())
+    assert incremental.set_index('framework').loc['baseline', 'average_rank'] == 1
+
+
+def test_subsample_runs_are_not_ranked(store):
+    add_scores(store, 'campaign', {('first', 'fedot', 0): 0.99}, fidelity=0.25)
+    add_scores(store, 'campaign', {('first', 'baseline', 0): 0.8})
+    leaderboard = Leaderboard()
+    leaderboard.refresh(store, 'campaign')
+
+    assert leaderboard.frameworks() == ['baseline']
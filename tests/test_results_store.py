@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from results_store import ResultsStore, case_result_to_unit_results
+
+CASE_RESULT = {'hyperparameters': {'TPOT': {'MAX_RUNTIME_MINS': 2}},
+               'tpot_metric': {'roc_auc': 0.9},
+               'tpot_timings': {'wall_secs': 10.0, 'cpu_secs': 20.0, 'time_to_predict_secs': 1.0,
+                                'phases': {'fitting': {'wall_secs': 9.0, 'cpu_secs': 19.0}}},
+               'tpot_memory': {'peak_rss_mb': 300.0},
+               'tpot_fingerprint': 'abc',
+               'fedot_metric': {'roc_auc': 0.8},
+               'fedot_seeds': [{'seed': 0, 'metric': {'roc_auc': 0.7}}, {'seed': 1, 'metric': {'roc_auc': 0.9}}]}
+
+
+def test_case_result_is_split_into_units():
+    units = {(unit['framework'], unit['seed']): unit for unit in case_result_to_unit_results(CASE_RESULT, 'first')}
+
+    assert sorted(units) == [('fedot', 0), ('fedot', 1), ('tpot', None)]
+    assert units[('tpot', None)]['peak_rss_mb'] == 300.0
+    assert units[('fedot', 1)]['metrics'] == {'roc_auc': 0.9}
+
+
+def test_stored_run_is_reported_back(store):
+    store.add_case_result(CASE_RESULT, 'first', campaign='campaign')
+
+    report = store.cached_report('abc')
+
+    assert report['metric'] == {'roc_auc': 0.9}
+    assert report['timings']['phases'] == {'fitting': {'wall_secs': 9.0, 'cpu_secs': 19.0}}
+    assert report['memory'] == {'peak_rss_mb': 300.0}
+    assert store.cached_report('missing') is None
+
+
+def test_reused_result_is_not_duplicated(store):
+    unit_result = {'dataset': 'first', 'framework': 'tpot', 'metrics': {'roc_auc': 0.9}, 'fingerprint': 'abc'}
+    run_id = store.add_unit_result(unit_result, 'campaign')
+
+    assert store.add_unit_result(dict(unit_result, cached=True), 'campaign') == run_id
+    assert store.add_unit_result(dict(unit_result, cached=True), 'other') != run_id
+    assert len(store.runs()) == 2
+
+
+def test_filters_by_campaign_fidelity_and_run_id(store):
+    first_id = store.add_unit_result({'dataset': 'first', 'framework': 'tpot', 'metrics': {'roc_auc': 0.9}}, 'a')
+    store.add_unit_result({'dataset': 'first', 'framework': 'tpot', 'metrics': {'roc_auc': 0.7}, 'fidelity': 0.1},
+                          'a')
+    store.add_failed_case('second', ['tpot', 'fedot'], 'error', campaign='b')
+
+    assert store.campaigns() == ['a', 'b']
+    assert len(store.runs('a')) == 2
+    assert store.metric_values('roc_auc', 'a', full_fidelity=True)['value'].tolist() == [0.9]
+    assert store.runs('b')['status'].tolist() == ['failed', 'failed']
+    assert len(store.runs(since_run_id=first_id)) == 3
+
+
+def test_summary_and_export(store, tmp_path):
+    for seed, value in enumerate((0.7, 0.9)):
+        store.add_unit_result({'dataset': 'first', 'framework': 'tpot', 'seed': seed, 'metrics': {'roc_auc': value},
+                               'wall_secs': 10.0 * (seed + 1)}, 'campaign')
+
+    summary = store.summary('campaign').iloc[0]
+    exported = store.export_csv(str(tmp_path / 'combined.csv'), 'campaign')
+
+    assert summary['roc_auc_mean'] == pytest.approx(0.8)
+    # the standard deviation of the population is computed in the database
+    assert summary['roc_auc_std'] == pytest.approx(0.1)
+    assert summary['wall_secs'] == 15.0
+    assert pd.read_csv(tmp_path / 'combined.csv')['roc_auc'].tolist() == exported['roc_auc'].tolist() == [0.7, 0.9]
+
+
+def test_database_is_shared_by_connections(store):
+    other = ResultsStore(store.file_path)
+    other.add_unit_result({'dataset': 'first', 'framework': 'tpot', 'metrics': {'roc_auc': 0.9}}, 'campaign')
+    other.close()
+
+    assert len(store.runs('campaign')) == 1
@@ -0,0 +1,56 @@
+import pytest
+
+# the scheduler imports the campaign and through it the executor with all the frameworks
+pytest.importorskip('scheduler')
+
+from campaign import CampaignUnit  # noqa: E402
+from scheduler import CampaignScheduler, RuntimeHistory  # noqa: E402
+
+
+@pytest.fixture
+def history(tmp_path) -> RuntimeHistory:
+    return RuntimeHistory(str(tmp_path / 'history.json'))
+
+
+def test_observed_runtime_is_the_median(history):
+    unit = CampaignUnit('first', 'fedot')
+    for wall_secs in (10, 30, 20):
+        history.add(unit, 100, 10, wall_secs)
+
+    assert history.predict(unit, 100, 10) == 20
+
+
+def test_unseen_dataset_follows_the_power_law(history):
+    history.add(CampaignUnit('small', 'fedot'), 100, 10, 10)
+    history.add(CampaignUnit('large', 'fedot'), 10000, 10, 100)
+
+    assert history.predict(CampaignUnit('medium', 'fedot'), 1000, 10) == pytest.approx(10 ** 1.5)
+
+
+def test_fallback_of_the_untimed_framework_is_the_configured_runtime(history):
+    # the dataset of four reference sizes doubles the runtime
+    assert history.predict(CampaignUnit('first', 'baseline'), 40000, 10) == pytest.approx(2 * 60)
+    assert history.predict(CampaignUnit('first', 'autokeras'), 40000, 10) == pytest.approx(2 * 3600)
+
+
+def test_fallback_of_the_time_limited_framework_is_its_budget(history):
+    assert history.predict(CampaignUnit('first', 'tpot'), 10000, 10) == pytest.approx(30 * 60)
+
+
+def test_history_is_saved_and_loaded(history):
+    history.add(CampaignUnit('first', 'fedot'), 100, 10, 42, peak_rss_mb=512)
+    history.save()
+
+    loaded = RuntimeHistory(history.file_path)
+
+    assert loaded.predict(CampaignUnit('first', 'fedot'), 100, 10) == 42
+    assert loaded.predict_memory(CampaignUnit('second', 'fedot')) == 512
+
+
+def test_eta_spreads_the_pending_units_over_the_workers(history):
+    units = [CampaignUnit(f'dataset_{num}', 'fedot') for num in range(3)]
+    campaign_scheduler = CampaignScheduler(lambda unit: {}, {}, n_workers=2, history=history)
+    campaign_scheduler.predictions = dict(zip(units, (30, 20, 10)))
+    campaign_scheduler.pending = units
+
+    assert campaign_scheduler.eta() == 30
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import friedmanchisquare, wilcoxon
+
+from conftest import add_scores
+from significance import compare_frameworks, critical_difference_data, friedman_test, holm_correction, \
+    score_matrix, wilcoxon_holm
+
+
+@pytest.fixture
+def scores() -> pd.DataFrame:
+    random_state = np.random.RandomState(0)
+    values = random_state.rand(12, 3) + np.array([0.0, 0.3, 0.6])
+    return pd.DataFrame(values, index=[f'dataset_{num}' for num in range(12)], columns=['first', 'second', 'third'])
+
+
+def test_friedman_matches_scipy(scores):
+    # the ties are corrected in both
+    scores.iloc[0] = 0.5
+    expected = friedmanchisquare(*scores.values.T)
+
+    result = friedman_test(scores)
+
+    assert result['statistic'] == pytest.approx(expected.statistic)
+    assert result['p_value'] == pytest.approx(expected.pvalue)
+
+
+def test_wilcoxon_matches_scipy(scores):
+    result = wilcoxon_holm(scores).set_index(['first', 'second'])
+
+    for first, second in [('first', 'second'), ('first', 'third'), ('second', 'third')]:
+        expected = wilcoxon(scores[first], scores[second], method='exact').pvalue
+        assert result.loc[(first, second), 'p_value'] == pytest.approx(expected)
+
+
+def test_holm_correction():
+    assert holm_correction([0.01, 0.04, 0.03]).tolist() == pytest.approx([0.03, 0.06, 0.06])
+
+
+def test_critical_difference_cliques():
+    scores = pd.DataFrame({'best': np.arange(10) + 2.0, 'close': np.arange(10) + 1.5, 'worst': np.arange(10)})
+
+    result = critical_difference_data(scores)
+
+    assert result['average_ranks'] == {'best': 1.0, 'close': 2.0, 'worst': 3.0}
+    assert result['cliques'] == [['best', 'close'], ['close', 'worst']]
+
+
+def test_score_matrix_orients_and_keeps_complete_datasets(store):
+    add_scores(store, 'campaign', {('first', 'fedot', 0): 1.0, ('first', 'tpot', 0): 2.0,
+                                   ('second', 'fedot', 0): 3.0}, metric_name='mse')
+    add_scores(store, 'campaign', {('third', 'fedot', 0): 0.1, ('third', 'tpot', 0): 0.5}, fidelity=0.5)
+
+    matrix = score_matrix(store, campaign='campaign')
+
+    assert matrix.to_dict('index') == {'first': {'fedot': -1.0, 'tpot': -2.0}}
+
+
+def test_compare_needs_two_complete_datasets(store):
+    add_scores(store, 'campaign', {('first', 'fedot', 0): 0.9, ('first', 'tpot', 0): 0.8})
+
+    with pytest.raises(ValueError):
+        compare_frameworks(store, 'campaign')
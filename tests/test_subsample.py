@@ -0,0 +1,45 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+# benchmark_utils imports the dataset helpers of pmlb and FEDOT
+pytest.importorskip('pmlb')
+pytest.importorskip('fedot')
+
+from benchmark_utils import get_subsample_path  # noqa: E402
+
+
+@pytest.fixture
+def train_file(tmp_path) -> str:
+    file_path = str(tmp_path / 'train.csv')
+    pd.DataFrame({'feature': range(200), 'target': [0] * 180 + [1] * 20}).to_csv(file_path, index=False)
+    return file_path
+
+
+def test_full_fraction_is_the_dataset(train_file):
+    assert get_subsample_path(train_file, 1.0) == train_file
+
+
+def test_stratified_subsample_keeps_the_classes(train_file):
+    subsample = pd.read_csv(get_subsample_path(train_file, 0.1))
+
+    assert subsample['target'].value_counts().to_dict() == {0: 18, 1: 2}
+
+
+def test_subsample_is_cached_without_temporary_files(train_file):
+    first_path = get_subsample_path(train_file, 0.1)
+    first_mtime = os.path.getmtime(first_path)
+
+    assert get_subsample_path(train_file, 0.1) == first_path
+    assert os.path.getmtime(first_path) == first_mtime
+    assert os.listdir(os.path.dirname(first_path)) == [os.path.basename(first_path)]
+
+
+def test_parallel_workers_read_the_same_subsample(train_file):
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(get_subsample_path, [train_file] * 8, [0.5] * 8))
+
+    assert len(set(paths)) == 1
+    assert len(pd.read_csv(paths[0])) == 100
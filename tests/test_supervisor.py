@@ -0,0 +1,24 @@
+import subprocess
+import sys
+import time
+
+from supervisor import ProcessTreeCpuMonitor
+
+BUSY_CHILD = 'import time\nstart = time.time()\nwhile time.time() - start < 1: pass\ntime.sleep(0.5)'
+
+
+def test_cpu_of_the_child_not_waited_for_is_counted():
+    with ProcessTreeCpuMonitor(interval_secs=0.1) as cpu_monitor:
+        # the child is not reaped inside the block as the H2O server shut down by the strategy
+        child = subprocess.Popen([sys.executable, '-c', BUSY_CHILD])
+        time.sleep(1.5)
+    child.wait()
+
+    assert cpu_monitor.cpu_secs >= 0.8
+
+
+def test_cpu_of_the_waited_child_is_counted_once():
+    with ProcessTreeCpuMonitor(interval_secs=0.1) as cpu_monitor:
+        subprocess.run([sys.executable, '-c', BUSY_CHILD], check=True)
+
+    assert 0.8 <= cpu_monitor.cpu_secs < 1.6
@@ -0,0 +1,105 @@
+import multiprocessing
+import traceback
+from multiprocessing.connection import wait
+from typing import Callable, Iterable, Iterator, Optional
+
+import psutil
+
+from event_log import emit
+
+
+class WorkerTaskError(RuntimeError):
+    pass
+
+
+def _worker_loop(connection, func: Callable, max_tasks: Optional[int], max_rss_mb: Optional[float]):
+    n_tasks = 0
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        task_num, task = message
+        try:
+            result = ('ok', func(task))
+        except Exception as ex:
+            result = ('error', f'{ex!r}\n{traceback.format_exc()}')
+        n_tasks += 1
+        rss_mb = psutil.Process().memory_info().rss / 2 ** 20
+        # the leaked memory of the frameworks is freed only with the process
+        recycle = (max_tasks is not None and n_tasks >= max_tasks) or (max_rss_mb is not None and rss_mb > max_rss_mb)
+        connection.send((task_num, result, rss_mb, recycle))
+        if recycle:
+            break
+    connection.close()
+
+
+class RecyclingWorkerPool:
+    """
+    Runs the tasks in the worker processes replaced by the fresh ones after max_tasks_per_worker tasks
+    or once their memory exceeds max_rss_mb, so a long loop of the experiments runs in flat memory.
+    The results are streamed back to the parent in the order of the tasks as soon as they are ready.
+    """
+
+    def __init__(self, func: Callable, n_workers: int = 1, max_tasks_per_worker: Optional[int] = 1,
+                 max_rss_mb: Optional[float] = None):
+        self.func = func
+        self.n_workers = n_workers
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_rss_mb = max_rss_mb
+        self._context = multiprocessing.get_context('fork')
+        self.n_recycled = 0
+
+    def _start_worker(self):
+        receiver, sender = self._context.Pipe()
+        process = self._context.Process(target=_worker_loop,
+                                        args=(sender, self.func, self.max_tasks_per_worker, self.max_rss_mb))
+        process.start()
+        sender.close()
+        return receiver, process
+
+    def imap(self, tasks: Iterable) -> Iterator:
+        tasks = list(tasks)
+        workers = {}
+        next_task_num, next_result_num, ready_results = 0, 0, {}
+        try:
+            while next_result_num < len(tasks):
+                # the idle workers get the next tasks, the recycled ones are replaced before
+                while len(workers) < self.n_workers and next_task_num < len(tasks):
+                    connection, process = self._start_worker()
+                    connection.send((next_task_num, tasks[next_task_num]))
+                    workers[connection] = (process, next_task_num)
+                    next_task_num += 1
+
+                for connection in wait(list(workers)):
+                    process, task_num = workers.pop(connection)
+                    try:
+                        _, result, rss_mb, recycle = connection.recv()
+                    except EOFError:
+                        result, rss_mb, recycle = ('error', f'Worker has exited with the code {process.exitcode}'), \
+                                                  None, True
+                    ready_results[task_num] = result
+                    if recycle:
+                        self.n_recycled += 1
+                        emit('worker_recycled', pid=process.pid, rss_mb=rss_mb and round(rss_mb, 1))
+                        process.join()
+                        connection.close()
+                    elif next_task_num < len(tasks):
+                        connection.send((next_task_num, tasks[next_task_num]))
+                        workers[connection] = (process, next_task_num)
+                        next_task_num += 1
+                    else:
+                        connection.send(None)
+                        process.join()
+                        connection.close()
+
+                while next_result_num in ready_results:
+                    status, result = ready_results.pop(next_result_num)
+                    if status == 'error':
+                        raise WorkerTaskError(result)
+                    yield result
+                    next_result_num += 1
+        finally:
+            for connection, (process, _) in workers.items():
+                process.terminate()
+                process.join()
+                connection.close()